@@ -31,3 +31,18 @@ rsa_keylength = 512
 
 # Settings for ElGamal algorithm
 elgamal_keylength = 512
+
+
+# Number of parsed key objects kept in memory (see keycache) - should be more than the number of peers
+key_cache_size = 200
+
+
+# Settings for session keys (hybrid encryption)
+# Messages are encrypted with AES using a session key per receiving credential; only the session key
+# itself is encrypted with the public key algorithm above. Only used for members supporting it.
+session_keys_enabled = 1
+# replace the session key for sending after this number of seconds / bytes (None for no limit)
+session_key_lifetime = 3600
+session_key_max_bytes = 64 * 1024 * 1024
+# number of decrypted session keys remembered for incoming messages
+session_key_cache_size = 1000
@@ -5,15 +5,27 @@ Grid for Digital Security (G4DS)
 
 Based on the libraries of PyCrypto. Accessed through the site package ezPyCrypto.
 
+Key objects are taken from the L{keycache} rather than being parsed from their string 
+representation for each operation.
+
 @author: Michael Pilgermann
 @contact: mailto:mpilgerm@glam.ac.uk
 @license: GPL (General Public License)
 """
 
 from algorithminterface import AlgorithmInterface
+from keycache import getKeyCache
 import config
 import ezPyCrypto
 
+def _loadPrivateKey(keyst):
+    return ezPyCrypto.key(keyst)
+    
+def _loadPublicKey(keyst):
+    key = ezPyCrypto.key()
+    key.importKey(keyst)
+    return key
+
 class AlgorithmImplementation(AlgorithmInterface):
     """
     Algorithm implementation for G4DS for the ElGamal algorithm.
@@ -51,8 +63,8 @@ class AlgorithmImplementation(AlgorithmInterface):
         """
         if keyst == None:
             keyst = self._privateKey
-        key = ezPyCrypto.key(keyst)
-        plain = key.decStringFromAscii(ciphertext)
+        plain = getKeyCache().useKey(self.getName(), 'private', keyst, _loadPrivateKey, 
+            lambda key: key.decStringFromAscii(ciphertext))
         return plain
 
     def encrypt(self, plaintext, keyst):
@@ -66,9 +78,8 @@ class AlgorithmImplementation(AlgorithmInterface):
         @return: The corresponding cipher text
         @rtype: C{String}
         """
-        key = ezPyCrypto.key()
-        key.importKey(keyst)
-        cipher = key.encStringToAscii(plaintext)
+        cipher = getKeyCache().useKey(self.getName(), 'public', keyst, _loadPublicKey, 
+            lambda key: key.encStringToAscii(plaintext))
         return cipher
         
     def createKeyPair(self, bitlength = None):
@@ -89,8 +100,8 @@ class AlgorithmImplementation(AlgorithmInterface):
             privateKeySt = self._privateKey
         if privateKeySt == None:
             return None
-        key = ezPyCrypto.key(privateKeySt)
-        return key.exportKey()
+        return getKeyCache().useKey(self.getName(), 'private', privateKeySt, _loadPrivateKey, 
+            lambda key: key.exportKey())
 
     def signMessage(self, message, keyst = None):
         """
@@ -105,8 +116,8 @@ class AlgorithmImplementation(AlgorithmInterface):
         """
         if keyst == None:
             keyst = self._privateKey
-        key = ezPyCrypto.key(keyst)
-        signature = key.signString(message)
+        signature = getKeyCache().useKey(self.getName(), 'private', keyst, _loadPrivateKey, 
+            lambda key: key.signString(message))
         return signature
         
     def validate(self, message, signature, keyst):
@@ -122,6 +133,5 @@ class AlgorithmImplementation(AlgorithmInterface):
         @return: True, if this message has produced exactly this signature if the corresponding private key was used, otherwise false
         @rtype: C{Boolean}
         """
-        key = ezPyCrypto.key()
-        key.importKey(keyst)
-        return key.verifyString(message, signature)
+        return getKeyCache().useKey(self.getName(), 'public', keyst, _loadPublicKey, 
+            lambda key: key.verifyString(message, signature))
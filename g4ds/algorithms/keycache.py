@@ -0,0 +1,154 @@
+"""
+Cache for parsed key objects of the algorithm implementations.
+
+Grid for Digital Security (G4DS)
+
+Keys are passed around as strings; turning such a string into a key object of the crypto library
+is expensive and used to be done for every single message. The cache in here keeps the key objects
+for the most recently used keys (least recently used ones are dropped first). Entries are found by
+a digest of the key string, the name of the algorithm and the kind of import.
+
+Key objects of the crypto library may keep state while in use (e.g. random pools); hence, each entry
+comes with a lock, which must be held while the key object is used (see L{KeyCache.useKey}).
+
+@author: Michael Pilgermann
+@contact: mailto:mpilgerm@glam.ac.uk
+@license: GPL (General Public License)
+
+@var _keyCache: Singleton - the only instance ever of the KeyCache class
+@type _keyCache: L{KeyCache}
+"""
+
+import threading
+
+# "singleton"
+_keyCache = None
+def getKeyCache():
+    """
+    Singleton implementation.
+
+    The size of the cache is taken from the config module for algorithms.
+
+    @return: The instance for the key cache
+    @rtype: L{KeyCache}
+    """
+    global _keyCache
+    if not _keyCache:
+        import config
+        _keyCache = KeyCache(config.key_cache_size)
+    return _keyCache
+
+class KeyCache:
+    """
+    Size bounded LRU cache for key objects.
+
+    @ivar _entries: Key objects and their locks by digest
+    @type _entries: C{Dict} (C{String} : C{List} [key object, C{threading.Lock}])
+    @ivar _order: Digests in the order of their last use (least recently used first)
+    @type _order: C{List} of C{String}
+    """
+
+    def __init__(self, maxSize = 100):
+        """
+        Initialises the empty cache.
+
+        @param maxSize: Maximum number of key objects kept
+        @type maxSize: C{int}
+        """
+        self._maxSize = maxSize
+        self._entries = {}
+        self._order = []
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _getDigest(self, algName, kind, keyst):
+        from Crypto.Hash import SHA
+        return SHA.new('%s:%s:%s' %(algName, kind, keyst)).digest()
+
+    def getEntry(self, algName, kind, keyst, loader):
+        """
+        Looks up the key object for the given key string; it is created with the loader if not in the cache yet.
+
+        @param algName: Name of the algorithm the key is used with
+        @type algName: C{String}
+        @param kind: Kind of import (e.g. 'private' or 'public'), since the same string may be imported differently
+        @type kind: C{String}
+        @param keyst: Key in string representation
+        @type keyst: C{String}
+        @param loader: Function creating the key object from the key string
+        @type loader: C{Function}
+        @return: Key object and the lock to hold while using it
+        @rtype: C{List} [key object, C{threading.Lock}]
+        """
+        digest = self._getDigest(algName, kind, keyst)
+        self._lock.acquire()
+        try:
+            if self._entries.has_key(digest):
+                self._hits += 1
+                self._order.remove(digest)
+                self._order.append(digest)
+                return self._entries[digest]
+            self._misses += 1
+        finally:
+            self._lock.release()
+
+        # parse outside the lock - this is the expensive bit
+        entry = [loader(keyst), threading.Lock()]
+        self._lock.acquire()
+        try:
+            if self._entries.has_key(digest):
+                return self._entries[digest]
+            self._entries[digest] = entry
+            self._order.append(digest)
+            while len(self._order) > self._maxSize:
+                del self._entries[self._order.pop(0)]
+            return entry
+        finally:
+            self._lock.release()
+
+    def useKey(self, algName, kind, keyst, loader, operation):
+        """
+        Applies the operation to the (cached) key object for the given key string.
+
+        The lock of the entry is held during the operation.
+
+        @param operation: Function taking the key object as only parameter
+        @type operation: C{Function}
+        @return: Return value of the operation
+        """
+        key, lock = self.getEntry(algName, kind, keyst, loader)
+        lock.acquire()
+        try:
+            return operation(key)
+        finally:
+            lock.release()
+
+    def clear(self):
+        """
+        Removes all key objects from the cache.
+        """
+        self._lock.acquire()
+        try:
+            self._entries = {}
+            self._order = []
+        finally:
+            self._lock.release()
+
+    def getStatistics(self):
+        """
+        Assembles the metrics of the cache.
+
+        @return: Dictionary with the current statistics values
+        @rtype: C{Dict}
+        """
+        self._lock.acquire()
+        try:
+            stats = {}
+            stats['size'] = len(self._entries)
+            stats['max_size'] = self._maxSize
+            stats['hits'] = self._hits
+            stats['misses'] = self._misses
+            return stats
+        finally:
+            self._lock.release()
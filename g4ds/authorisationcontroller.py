@@ -26,6 +26,11 @@ to a permission matrix. The  policy files have to be placed on the location as d
 (L{config.POLICY_DIRECTORY}). By default the files are loaded which are defined in the config file (L{config.POLICY_FILES}).
 
 The access matrix is two dimensional. Each entry inside the matrix contains an ordered list of couples (action | reaction). 
+The matrix is not expanded for each couple of actor / target though; instead, it is kept as one ordered list of rules, each
+one with the set of couples it applies to in symbolic form (e.g. "all members of community C001 -> service S0001", see
+L{ProductCouples} and L{AuthorityCouples}). Membership of actors and targets in such sets is resolved when a request is
+validated, using the membership indexes of the communities and services. This way, the memory required scales with the
+number of rules rather than with the number of members squared.
 
 For building the matrix the following steps are performed:
 
@@ -33,18 +38,29 @@ All requested policy files are loaded into memory using dictionaries. Afterwards
 order starting with the ruleset defined in the config file with value L{config.POLICY_MAJOR_RULESET_ID}. Hence, the
 order of the policy files does not matter (at least as long as no result set id is used severeal times). The processor
 iterates the list of rules in the major ruleset ordered by rule id (so keep your rules in order!!!). Whenever a rule has
-the reaction type 'direct', the value is put directly into the access matrix. (In fact, for each possible combination of the
-rule for actor / target one item is appended to the list of rules for the corrosponding couple.) Whenever the rule has
+the reaction type 'direct', the value is put directly into the access matrix. (In fact, the rule is appended to the list of 
+rules along with its couples of actor / target - and the couples of all the rules redirecting to it.) Whenever the rule has
 the reaction type 'redirect', the processing is continued with this list immedeately and, after finishing the redirected list,
 continued after the redirected reaction. Redirection are allowed in all rulesets; hence they may be cascaded.
 
 For validating one request, the following steps are performed:
 
 The authorisation controller is performing a lookup in the access matrix and this way loading the list for the
-requested couple of actor / target. This list is then iterated (by order as established at bootup time) and the first rule
-hitting the requested action is taken. Regarding the action stored for this rule the the function will return
+requested couple of actor / target (the rules applying to the couple are picked from the list of all rules once and 
+remembered for up to L{config.POLICY_COUPLE_CACHE_SIZE} couples). This list is then iterated (by order as established at
+bootup time) and the first rule hitting the requested action is taken. Regarding the action stored for this rule the the function will return
 the value.
 
+For speeding up validation, the list for each couple of actor / target is compiled into a prefix tree of the action
+strings of its rules (see L{CompiledRules}); this way, all the rules hitting an action are
+found in one walk along the action string. Furthermore, the decisions are remembered for each triple of actor / target /
+action (up to L{config.POLICY_DECISION_CACHE_SIZE} of them) until the matrix is recalculated.
+
+Changes of communities, members and services do not require recalculating the matrix: the controller is registered 
+as listener with the managers and only drops the compiled rules and decisions for the couples involving the ids 
+affected by a change (see L{AuthorisationController.membershipChanged}). Recalculating the matrix is only needed 
+for changes of the policy files; files not modified since the last calculation are not parsed again.
+
 For the roles inside the rules you may use wildcards. Supported wildcards are:
     - '*' - all possible values
     - 'authorities_communities' - All authorities for a community
@@ -71,6 +87,22 @@ REACTION_DICT = {}
 REACTION_DICT[REACTION_POS] = 1
 REACTION_DICT[REACTION_NEG] = 0
 
+# kinds of sets of ids (see L{IdSet})
+IDSET_IDS = 'ids'
+IDSET_ALL_MEMBERS = 'members'
+IDSET_COMMUNITY_MEMBERS = 'community members'
+IDSET_SERVICE_MEMBERS = 'service members'
+IDSET_ALL_COMMUNITIES = 'communities'
+IDSET_ALL_SERVICES = 'services'
+
+IDSET_KINDS = [IDSET_IDS, IDSET_ALL_MEMBERS, IDSET_COMMUNITY_MEMBERS, IDSET_SERVICE_MEMBERS, IDSET_ALL_COMMUNITIES,
+    IDSET_ALL_SERVICES]
+
+from collections import deque
+
+# marker for reactions not determined yet in the nodes of L{CompiledRules}
+_UNKNOWN = []
+
 # "singleton"
 _authorisationController = None
 def getAuthorisationController():
@@ -83,11 +115,25 @@ def getAuthorisationController():
     if not _authorisationController:
         _authorisationController = AuthorisationController()
         _authorisationController.recalculateMatrix()
+        from communitymanager import getCommunityManager, getMemberManager
+        from servicerepository import getServiceManager
+        getCommunityManager().addChangeListener(_authorisationController.membershipChanged)
+        getMemberManager().addChangeListener(_authorisationController.membershipChanged)
+        getServiceManager().addChangeListener(_authorisationController.membershipChanged)
     return _authorisationController
 
 class AuthorisationController:
     """
     Handles all stuff about permissions.
+    
+    @ivar _rules: Ordered list of all rules - each one with its couples of actor / target, action filters and reaction
+    @type _rules: C{List} of C{Tuple}
+    @ivar _couples: Compiled rules by couple of actor / target (None if no rule applies to the couple)
+    @type _couples: C{Dict} (C{Tuple} | L{CompiledRules})
+    @ivar _generation: Counter for the changes dropping cached entries - entries determined before a change are not cached
+    @type _generation: C{int}
+    @ivar _policyFiles: Modification time, size and parsed contents by name of policy file
+    @type _policyFiles: C{Dict} (C{String} | C{Tuple})
     """
     
     def __init__(self):
@@ -96,21 +142,29 @@ class AuthorisationController:
         
         Call function L{recalculateMatrix} for processing policies.
         """
-        self._matrix = {}
+        import threading
+        self._rules = []
+        self._couples = {}
+        self._coupleOrder = deque()
+        self._shared = {}
+        self._decisions = {}
+        self._decisionOrder = deque()
+        self._generation = 0
+        self._cacheLock = threading.Lock()
+        self._policyFiles = {}
 
     
     def recalculateMatrix(self):
         """
         Loads the permissions information from files and databases into the memory.
         
-        Creates the permission matrix. The matrix itself is implemented using nested
-        dictionaries.
+        Creates the permission matrix. The matrix itself is implemented as ordered list of rules
+        with their couples of actor / target in symbolic form.
         """
         from config import POLICY_DIRECTORY, POLICY_FILES, POLICY_MAJOR_RULESET_ID
         import os.path
-        from messagewrapper import getPolicyFileWrapper
 
-        self._matrix = {}
+        self._rules = []
 
         
         all_rolesets = []
@@ -122,18 +176,11 @@ class AuthorisationController:
             filelist.append(os.path.join(POLICY_DIRECTORY, filename))
         
         for filename in filelist:
-            file = open(filename)
-            content = file.read()
-            file.close()
-            try:
-                rolesets, groups, rulesets = getPolicyFileWrapper().parsePolicyString(content)
-                all_rolesets += rolesets
-                all_rulesets += rulesets
-                all_groups += groups
-##                print '\n', rolesets, '\n', groups, '\n', rulesets
-            except Exception, msg:
-                from errorhandling import G4dsException
-                raise G4dsException('%s: %s' %(filename, msg))
+            rolesets, groups, rulesets = self._loadPolicyFile(filename)
+            all_rolesets += rolesets
+            all_rulesets += rulesets
+            all_groups += groups
+##            print '\n', rolesets, '\n', groups, '\n', rulesets
             
 ##        print '\n', all_rolesets, '\n', all_groups, '\n', all_rulesets
             
@@ -141,30 +188,56 @@ class AuthorisationController:
         d_rulesets, d_groups, d_rolesets, d_roles = self._createDictionaries(all_rolesets, all_groups, all_rulesets)
 ##        print d_rulesets, "\n", d_groups, "\n", d_roles
         self._assembleMatrix(d_rulesets, d_groups, POLICY_MAJOR_RULESET_ID)
+        self._resetCaches()
+
+    def _loadPolicyFile(self, filename):
+        """
+        Parses one policy file.
+        
+        The contents are kept; the file is only parsed again once its modification time or size changed.
+        
+        @return: The extracted Rolesets / Groups / Rulesets (as from L{messagewrapper.PolicyFileWrapper.parsePolicyString})
+        @rtype: C{List} of C{Dict} / C{List} of C{Dict} / C{List} of C{Dict}
+        """
+        import os
+        stat = os.stat(filename)
+        version = (stat.st_mtime, stat.st_size)
+        if self._policyFiles.has_key(filename) and self._policyFiles[filename][0] == version:
+            return self._policyFiles[filename][1]
+        
+        from messagewrapper import getPolicyFileWrapper
+        file = open(filename)
+        content = file.read()
+        file.close()
+        try:
+            contents = getPolicyFileWrapper().parsePolicyString(content)
+        except Exception, msg:
+            from errorhandling import G4dsException
+            raise G4dsException('%s: %s' %(filename, msg))
+        self._policyFiles[filename] = (version, contents)
+        return contents
 
     def printMatrix(self):
-        for x in self._matrix.keys():
-            print "%s" %(x)
-            for y in self._matrix[x].keys():
-                print "  %s" %(y)
-                a = 1
-                for z1, z2  in self._matrix[x][y]:
-                    print "    Rule %d - %s" %(a, z2) + ""
-                    b = 1
-                    for zand in z1:
-                        c = 1
-                        print "      ",
-                        for tmp, zor in zand:
-                            print "%s" %(zor) + "",
-                            if len(zand) > c:
-                                print "OR",
-                            c += 1
-                        if len(z1) > b:
-                            print "AND"
-                        else:
-                            print 
-                        b += 1
-                    a+=1
+        a = 1
+        for couples, z1, z2 in self._rules:
+            print "Rule %d - %s" %(a, z2)
+            for union in couples:
+                print "  couples: " + " OR ".join([str(spec) for spec in union])
+            b = 1
+            for zand in z1:
+                c = 1
+                print "    ",
+                for tmp, zor in zand:
+                    print "%s" %(zor) + "",
+                    if len(zand) > c:
+                        print "OR",
+                    c += 1
+                if len(z1) > b:
+                    print "AND"
+                else:
+                    print 
+                b += 1
+            a+=1
         
     def _createDictionaries(self, rolesets, groups, rulesets):
         """
@@ -175,7 +248,9 @@ class AuthorisationController:
         d_rolesets = {}
         d_roles = {}
 
+        # the dictionaries are copied where changed - the parsed policy files are kept for the next calculation
         for ruleset in rulesets:
+            ruleset = ruleset.copy()
             d_rulesets[ruleset['id']] = ruleset
             # also transform the rules list into a rules dictionary
             rules = ruleset['rules']
@@ -184,6 +259,7 @@ class AuthorisationController:
                 ruleset['rules'][rule['id']] = rule
         
         for roleset in rolesets:
+            roleset = roleset.copy()
             d_rolesets[roleset['type']] = roleset
             roles = roleset['roles']
             roleset['roles'] = {}
@@ -200,61 +276,57 @@ class AuthorisationController:
         """
         Processes wildcard information in one group.
         
+        The group is not expanded; the members of the group are determined when validating.
+        
         @param type: Type of role; either actor, action or target
         @type type: C{String}
         @param wildcard: Wildcard string as given in the XML description (most likely a star)
         @type wildcard: C{String}
+        @return: Set of the ids described by the wildcard
+        @rtype: L{IdSet}
         """
         from errorhandling import G4dsDependencyException
-        retList = []
         if type == 'membergroup':
-            from communitymanager import getMemberManager
             if wildcard == '*':     # all members  - easy stuff
-                return getMemberManager().getMemberIds()
+                return IdSet(IDSET_ALL_MEMBERS)
             elif wildcard[0] == 'C':      # here we want all the members of a certain community
-                from communitymanager import getCommunityManager
-                return getCommunityManager().getCommunity(wildcard).getMembers()
+                return IdSet(IDSET_COMMUNITY_MEMBERS, wildcard)
             elif wildcard[0] == 'S':        # all the members of a service
-                from servicerepository import getServiceManager
-                return getServiceManager().getService(wildcard).getMembers()
+                return IdSet(IDSET_SERVICE_MEMBERS, wildcard)
         elif type == 'communitygroup':
-            from communitymanager import getCommunityManager
             if wildcard == '*':     # that should be all communities then
-                return getCommunityManager().getCommunityIds()
+                return IdSet(IDSET_ALL_COMMUNITIES)
         elif type == 'servicegroup':
-            from servicerepository import getServiceManager
             if wildcard == '*':     # all the services here
-                return getServiceManager().getServiceIds()
+                return IdSet(IDSET_ALL_SERVICES)
         else:
             raise G4dsDependencyException('Policy error - unknown group type "%s".' %(type))
-        return retList
+        return IdSet(IDSET_IDS, [])
         
     def _determineIndependantTargets(self, targettype, target):
         """
-        Assembles a target list which is independant from the actor type.
+        Assembles a target set which is independant from the actor type.
+        
+        @rtype: L{IdSet}
         """
         from errorhandling import G4dsDependencyException
-        retList = []
             
         if targettype == 'member':
             if target[0] != 'M':
                 raise G4dsDependencyException('Policy error - only member ids allowed for target type "member".')
-            retList.append(target)
+            return IdSet(IDSET_IDS, [target])
         elif targettype == 'community':
             if target[0] != 'C':
                 raise G4dsDependencyException('Policy error - only community ids allowed for target type "community".')
-            retList.append(target)
+            return IdSet(IDSET_IDS, [target])
         elif targettype == 'service':
             if target[0] != 'S':
                 raise G4dsDependencyException('Policy error - only service ids allowed for target type "service".')
-            retList.append(target)
+            return IdSet(IDSET_IDS, [target])
         elif targettype == 'membergroup' or targettype == 'communitygroup' or targettype == 'servicegroup':
-            targets = self._decodeGroup(targettype, target)
-            for t in targets:
-                retList.append(t)
+            return self._decodeGroup(targettype, target)
         else:
             raise G4dsDependencyException('Policy error - unknown target type "%s" for policy.' %(targettype))
-        return retList
         
     
     def _decodeCouples_SingleActorMember(self, actor, target, targettype):
@@ -265,10 +337,7 @@ class AuthorisationController:
         if actor[0] != 'M': # first character of a member id is always an M
             raise G4dsDependencyException('Policy error - only member ids allowed for actor type "member".')
         
-        retList = []
-        for x in self._determineIndependantTargets(targettype, target):
-            retList.append((actor, x))
-        return retList
+        return ProductCouples(IdSet(IDSET_IDS, [actor]), self._determineIndependantTargets(targettype, target))
 
     def _decodeCouples_ActorMemberGroup(self, actor, target, targettype):
         """
@@ -276,81 +345,22 @@ class AuthorisationController:
         """
         from errorhandling import G4dsDependencyException
 
-        retList = []
         if actor == '*' or actor[0] == 'C'  or actor[0] == 'S':     # simple (independent group)
-            actorlist = self._decodeGroup('membergroup', actor)
-            targetlist = self._determineIndependantTargets(targettype, target)
-            for a in actorlist:
-                for t in targetlist:
-                    retList.append((a,t))
-            return retList
-        elif actor == 'authorities_community':
-            # check targets as well
-            targetList = self._determineIndependantTargets(targettype, target)
-            from communitymanager import getCommunityManager
-            for cid in getCommunityManager().getCommunityIds():
-                c = getCommunityManager().getCommunity(cid)
-                try:
-                    targetList.index(cid)
-                    for mid in c.getAuthorities():
-                        retList.append((mid, cid))
-                except ValueError, msg:
-                    pass        # alright, this community is not in our target list
-            return retList
-        elif actor == 'authorities_service':
-            # check targets as well
-            targetList = self._determineIndependantTargets(targettype, target)
-            from servicerepository import getServiceManager
-            for sid in getServiceManager().getServiceIds():
-                s = getServiceManager().getService(sid)
-                try:
-                    targetList.index(sid)
-                    for mid in s.getAuthorities():
-                        retList.append((mid, sid))
-                except ValueError, msg:
-                    pass       # alright, this service is not in our target list
-            return retList
-        elif actor == 'authorities_member':
-            # each member is its own authority
-            targetList = self._determineIndependantTargets(targettype, target)
-            from communitymanager import getMemberManager
-            for mid in getMemberManager().getMemberIds():
-                try:
-                    targetList.index(mid)
-                    retList.append((mid, mid))
-                except ValueError, msg:
-                    pass        # ok, this is not in our target list
-            return retList
-        elif actor == 'gateways_community':
-            # check targets as well
-            targetList = self._determineIndependantTargets(targettype, target)
-            # assemble list of all gateways
-            gws = []
-            from communitymanager import getCommunityManager
-            for cid in getCommunityManager().getCommunityIds():
-                for gw in getCommunityManager().getCommunity(cid).getSourceGateways():
-                    gws.append(gw)
-            for gw in gws:
-                mid = gw.getMemberId()
-                sid = gw.getSourceCommunityId()
-                did = gw.getDestinationCommunityId()
-                try:
-                    targetList.index(did)       # we only check the dest tc here; the src is left to the user
-                    retList.append((mid, did))
-                except ValueError, msg:
-                    pass    # alright, this dest tc is not in our target list
-            return retList            
+            return ProductCouples(self._decodeGroup('membergroup', actor), self._determineIndependantTargets(targettype, target))
+        elif actor == 'authorities_community' or actor == 'authorities_service' or actor == 'authorities_member' \
+                or actor == 'gateways_community':
+            # actors depend on the targets here
+            return AuthorityCouples(actor, self._determineIndependantTargets(targettype, target))
         else:
             raise G4dsDependencyException('Policy error - unrecognised actor string (%s) for actor type "membergroup".' %(actor))
-        return retList
 
         
     def _decodeCouples(self, actor, actortype, target, targettype):
         """
-        Processes a actor - target wildcard relation and returns the corresponding values for them.
+        Processes a actor - target wildcard relation and returns the corresponding set of couples for them.
         
-        @return: List of couples - actor | target
-        @rtype: C{List} of C{Couple}
+        @return: Set of couples - actor | target
+        @rtype: L{ProductCouples} or L{AuthorityCouples}
         """
         from errorhandling import G4dsDependencyException
         if actortype == 'member':
@@ -378,9 +388,13 @@ class AuthorisationController:
                 retList.append((rep['type'],rep['value']))
         return retList
         
-    def _applyOneDirectRule(self, rule, groups, actorsTargets = None, actionFilters = [], depth = 0):
+    def _applyOneDirectRule(self, rule, groups, couples = None, actionFilters = [], depth = 0):
         """
         Applies a single rule to the matrix.
+        
+        @param couples: The couples of actor / target the rule applies to - for each level of redirection the list of 
+            the (OR combined) sets of couples given in the rule on this level; the levels are AND combined
+        @type couples: C{List} of C{List} of L{ProductCouples} or L{AuthorityCouples}
         """
         indent = " " * 3
 ##        print indent * depth + "> Started direct processing of rule %s | %s" %(rule['id'], rule['comment'])
@@ -415,24 +429,12 @@ class AuthorisationController:
                 
                 # put the list of rules on each address
 ##                for a, t in addresses:
-        for a,t in actorsTargets:
-##            for actiontype, action in listActions:
-##            for action in actionFilters:
-            try:
-                self._matrix[a]
-            except KeyError, msg:
-                self._matrix[a] = {}
-            try:
-                self._matrix[a][t]
-            except KeyError, msg:
-                self._matrix[a][t] = []
-                
-            self._matrix[a][t].append((actionFilters, reaction))
+        self._rules.append((couples, actionFilters, reaction))
     
 ##        print indent * depth + "< Finished direct processing of rule"
 
         
-    def _processOneRuleset(self, rulesets, groups, currentRule, actorsTargets = None, actionFilters = [], depth = 0):
+    def _processOneRuleset(self, rulesets, groups, currentRule, couples = [], actionFilters = [], depth = 0):
         """
         Processes one rule.
         
@@ -454,18 +456,9 @@ class AuthorisationController:
             
         keys = ruleset['rules'].keys()
         keys.sort()
-        oldActorsTargets = actorsTargets
         oldActionFilters = actionFilters
         for key in keys:
-            # make a copy of actorsTargets and actionFilters
-            if oldActorsTargets:
-                tmp = oldActorsTargets
-                actorsTargets = []
-                for item in tmp:
-                    actorsTargets.append(item)
-            else:
-                actorsTargets = None
-                
+            # make a copy of actionFilters
             tmp = oldActionFilters
             actionFilters = []
             for item in tmp:
@@ -490,22 +483,10 @@ class AuthorisationController:
             tmpList = []
             for actortype, actor in listActors:
                 for targettype, target in listTargets:
-                    addresses = self._decodeCouples(actor, actortype, target, targettype)
-                    tmpList += addresses
-
-                    
-##            tmpList = self._decodeCouples(rule['actor'], rule['actor_type'], rule['target'], rule['target_type'])
-            if actorsTargets:   # validate against pre selected actor / target couple list
-                retList = []
-                for item in tmpList:
-                    try:
-                        actorsTargets.index(item)
-                        retList.append(item)
-                    except Exception, msg:
-                        pass
-                actorsTargets = retList
-            else:
-                actorsTargets = tmpList
+                    tmpList.append(self._decodeCouples(actor, actortype, target, targettype))
+
+            # the couples must be in the pre selected couples of the redirecting rules as well
+            ruleCouples = couples + [tmpList]
                 
             if rule['action_type'] == 'role':
                 actionFilters.append(self._resolveGroup(rule['action'], groups))
@@ -514,10 +495,10 @@ class AuthorisationController:
             
             if rule['reaction_type'] == 'direct':
 ##                print indent * (depth+2) + "* Ruletype direct - create matrix entries now"
-                self._applyOneDirectRule(rule, groups, actorsTargets, actionFilters, depth = depth + 3)
+                self._applyOneDirectRule(rule, groups, ruleCouples, actionFilters, depth = depth + 3)
             elif rule['reaction_type'] == 'redirect':
 ##                print indent * (depth+2) + "* Ruletype redirect - load rule set %s" %(rule['reaction'])
-                self._processOneRuleset(rulesets, groups, rule['reaction'], actorsTargets, actionFilters, depth + 2)
+                self._processOneRuleset(rulesets, groups, rule['reaction'], ruleCouples, actionFilters, depth + 2)
         
 ##        print indent * depth + "< Finished processing of rule set %s" %(currentRule)
 
@@ -533,6 +514,99 @@ class AuthorisationController:
         self._processOneRuleset(rulesets, groups, startRuleset, depth = 1)
 ##        print "Finished assembling"
         
+    def _resetCaches(self):
+        """
+        Drops the compiled rules of all couples of actor / target and all cached decisions.
+        """
+        self._cacheLock.acquire()
+        try:
+            self._couples = {}
+            self._coupleOrder = deque()
+            self._shared = {}
+            self._decisions = {}
+            self._decisionOrder = deque()
+            self._generation += 1
+        finally:
+            self._cacheLock.release()
+        
+    def membershipChanged(self, ids):
+        """
+        Drops the compiled rules and the decisions for all couples of actor / target involving one of the given ids.
+        
+        Registered as listener with the community, member and service managers. The rules themselves are not 
+        affected by such changes; the rules applying to the couples dropped are picked again with the next 
+        validation.
+        
+        @param ids: IDs of the members, communities and services affected by a change
+        @type ids: C{List} of C{String}
+        """
+        changed = {}
+        for id in ids:
+            changed[id] = 1
+        self._cacheLock.acquire()
+        try:
+            for key in self._couples.keys():
+                if changed.has_key(key[0]) or changed.has_key(key[1]):
+                    del self._couples[key]
+            self._coupleOrder = deque([key for key in self._coupleOrder if self._couples.has_key(key)])
+            for key in self._decisions.keys():
+                if changed.has_key(key[0]) or changed.has_key(key[1]):
+                    del self._decisions[key]
+            self._decisionOrder = deque([key for key in self._decisionOrder if self._decisions.has_key(key)])
+            self._generation += 1
+        finally:
+            self._cacheLock.release()
+        
+    def _getCompiledRules(self, actor, target):
+        """
+        Provides the compiled list of rules for the given couple of actor / target.
+        
+        The rules applying to the couple are picked from the list of all rules by resolving the couples of each rule
+        for the given actor and target. Lists of rules are shared by many couples; lists consisting of the same rules 
+        are compiled only once. The compiled rules are remembered for the last L{config.POLICY_COUPLE_CACHE_SIZE} 
+        couples.
+        
+        @return: The compiled rules for the couple
+        @rtype: L{CompiledRules}
+        @raise KeyError: No rule applies to the given couple
+        """
+        key = (actor, target)
+        compiled = self._couples.get(key, _UNKNOWN)
+        if compiled is _UNKNOWN:
+            generation = self._generation
+            indices = []
+            rules = []
+            index = 0
+            for couples, actionFilters, reaction in self._rules:
+                if _containsCouple(couples, actor, target):
+                    indices.append(index)
+                    rules.append((actionFilters, reaction))
+                index += 1
+            indices = tuple(indices)
+            
+            from config import POLICY_COUPLE_CACHE_SIZE
+            self._cacheLock.acquire()
+            try:
+                if not rules:
+                    compiled = None
+                else:
+                    compiled = self._shared.get(indices)
+                    if compiled is None:
+                        if len(self._shared) >= POLICY_COUPLE_CACHE_SIZE:
+                            self._shared = {}
+                        compiled = self._shared[indices] = CompiledRules(rules)
+                if generation == self._generation:
+                    if not self._couples.has_key(key):
+                        self._coupleOrder.append(key)
+                    self._couples[key] = compiled
+                    while len(self._coupleOrder) > POLICY_COUPLE_CACHE_SIZE:
+                        del self._couples[self._coupleOrder.popleft()]
+            finally:
+                self._cacheLock.release()
+        if compiled is None:
+            raise KeyError(key)
+        return compiled
+        
     def _logEntry(self, actor, target, action, reaction, reportPolicyError = 0):
         """
         Reports this access control access to the logging facilities.
@@ -544,9 +618,9 @@ class AuthorisationController:
         
         global REACTION_DICT
         if REACTION_DICT[reaction]:
-            getDefaultLogger().newMessage(PERMISSION_MESSAGE_PASSED, 'Access Control - message passed: %s -> %s (A: %s)' %(actor, target, action))
+            getDefaultLogger().newMessage(PERMISSION_MESSAGE_PASSED, 'Access Control - message passed: %s -> %s (A: %s)', actor, target, action)
         else:
-            getDefaultLogger().newMessage(PERMISSION_MESSAGE_DROPPED, 'Access Control - access violation: %s -> %s (A: %s)' %(actor, target, action))
+            getDefaultLogger().newMessage(PERMISSION_MESSAGE_DROPPED, 'Access Control - access violation: %s -> %s (A: %s)', actor, target, action)
         
     def _checkAgainstOneActionString(self, action, polActionString):
         """
@@ -559,33 +633,311 @@ class AuthorisationController:
         """
         Checks the given action against the available rules.
         
-        Picks up the value for the couple of the given actor and target and iterates this ordered list and compares
-        each item against the given action.
+        Picks up the compiled rules for the couple of the given actor and target (see L{_getCompiledRules}) and looks
+        up the first rule hitting the given action (see L{CompiledRules.lookup}). Decisions are cached until the matrix
+        is recalculated.
         """
         global REACTION_DICT
+        key = (actor, target, action)
+        decision = self._decisions.get(key)
+        if decision is None:
+            generation = self._generation
+            # let's first of all pics the compiled access list for the given couple of actor / target
+            reaction = self._getCompiledRules(actor, target).lookup(action)
+            if reaction is None:
+                from config import POLICY_DEFAULT_REACTION
+                decision = (POLICY_DEFAULT_REACTION, POLICY_DEFAULT_REACTION, 1)
+            else:
+                decision = (reaction, REACTION_DICT[reaction], 0)
+            self._cacheDecision(key, decision, generation)
+        
+        self._logEntry(actor, target, action, decision[0], reportPolicyError = decision[2])
+        return decision[1]
         
-        # let's first of all pics the access list for the given couple of actor / target
-        accessForCouple = self._matrix[actor][target]
-        # the first iteration goes through the ordered list - each item = 1 rule
-        for maction, mreaction in accessForCouple:
-            # the second iteration goes through the AND combinations of rule parts (occuring due to rule nesting)
-            for mactionAnd in maction:
-                oneAnd = 0
-                # the third iteratiion is for the OR combinations within one AND combination part (occuring due to roles for operations / actions)
-                for actionid, mactionOr in mactionAnd:
-                    if self._checkAgainstOneActionString(action, mactionOr):
-                        oneAnd = 1
-                        break
-                if not oneAnd:
-                    break
-            if oneAnd:
-                self._logEntry(actor, target, action, mreaction)
-                return REACTION_DICT[mreaction]
-                        
-##            if maction == "*" or action.startswith(maction):        # 2nd condition should actually look a bit more for the dots; but this will do for now
-##                self._logEntry(actor, target, action, mreaction)
-##                return REACTION_DICT[mreaction]
-        from config import POLICY_DEFAULT_REACTION
-        
-        self._logEntry(actor, target, action, POLICY_DEFAULT_REACTION, reportPolicyError = 1)
-        return POLICY_DEFAULT_REACTION
+    def _cacheDecision(self, key, decision, generation):
+        """
+        Remembers a decision; the oldest decisions are dropped if the cache is full.
+        
+        Decisions taken before the last change of the rules or memberships (given generation) are not remembered.
+        """
+        from config import POLICY_DECISION_CACHE_SIZE
+        self._cacheLock.acquire()
+        try:
+            if generation != self._generation:
+                return
+            if not self._decisions.has_key(key):
+                self._decisionOrder.append(key)
+            self._decisions[key] = decision
+            while len(self._decisionOrder) > POLICY_DECISION_CACHE_SIZE:
+                del self._decisions[self._decisionOrder.popleft()]
+        finally:
+            self._cacheLock.release()
+
+
+class CompiledRules:
+    """
+    Ordered list of rules for one couple of actor / target compiled into a prefix tree.
+    
+    Each rule consists of AND combined parts; each part of OR combined action strings from the policy - the rule
+    hits an action if, for each part, the action starts with one of the action strings of the part (or one of 
+    them is a star). The prefix tree is built from all the action strings of all rules character by character; 
+    each node holds the parts (rule index and part index) the action string ending in this node belongs to. 
+    Walking down the tree along the action hence collects all the parts hit.
+    
+    The parts hit only depend on the deepest node reached by the walk; hence, the resulting reaction is 
+    remembered in that node once determined.
+    
+    @ivar _root: Root node of the prefix tree - each node is a list of [children by character, hits, reaction
+        determined for walks ending in this node (L{_UNKNOWN} if not yet determined)]
+    @type _root: C{List}
+    @ivar _partCounts: Number of AND combined parts for each rule
+    @type _partCounts: C{List} of C{int}
+    @ivar _reactions: Reaction for each rule
+    @type _reactions: C{List} of C{String}
+    """
+    
+    def __init__(self, rules):
+        """
+        Builds the prefix tree.
+        
+        @param rules: Ordered list of rules as held in the access matrix - couples of action filters and reaction
+        @type rules: C{List} of C{Tuple}
+        """
+        self._root = [{}, [], _UNKNOWN]
+        self._partCounts = []
+        self._reactions = []
+        for index in range(len(rules)):
+            actionFilters, reaction = rules[index]
+            self._partCounts.append(len(actionFilters))
+            self._reactions.append(reaction)
+            for part in range(len(actionFilters)):
+                for actionid, polActionString in actionFilters[part]:
+                    if polActionString == '*':
+                        polActionString = ''    # a star hits any action - just like the empty prefix
+                    node = self._root
+                    for character in polActionString:
+                        child = node[0].get(character)
+                        if child is None:
+                            child = node[0][character] = [{}, [], _UNKNOWN]
+                        node = child
+                    node[1].append((index, part))
+    
+    def lookup(self, action):
+        """
+        Looks up the reaction of the first rule hitting the given action.
+        
+        @return: Reaction of the first rule hitting the action; None if there is none
+        @rtype: C{String}
+        """
+        node = self._root
+        path = [node]
+        for character in action:
+            child = node[0].get(character)
+            if child is None:
+                break
+            node = child
+            path.append(node)
+        if node[2] is not _UNKNOWN:
+            return node[2]
+        
+        hits = {}
+        for step in path:
+            for index, part in step[1]:
+                parts = hits.get(index)
+                if parts is None:
+                    parts = hits[index] = {}
+                parts[part] = 1
+        first = None
+        for index, parts in hits.items():
+            if len(parts) == self._partCounts[index] and (first is None or index < first):
+                first = index
+        if first is None:
+            node[2] = None
+        else:
+            node[2] = self._reactions[first]
+        return node[2]
+
+
+def _containsCouple(couples, actor, target):
+    """
+    Checks, whether the given couple of actor / target is covered by the couples of a rule.
+    
+    @param couples: AND combined lists of OR combined sets of couples (as held with each rule)
+    @type couples: C{List} of C{List} of L{ProductCouples} or L{AuthorityCouples}
+    @rtype: C{Boolean}
+    """
+    for union in couples:
+        found = 0
+        for spec in union:
+            if spec.contains(actor, target):
+                found = 1
+                break
+        if not found:
+            return 0
+    return 1
+
+
+class IdSet:
+    """
+    Set of ids of members, communities or services as described in a policy.
+    
+    Apart from explicitly given ids, the set is not expanded; it is checked against the managers (and the membership
+    indexes of the communities and services) whenever asked whether it contains an id.
+    
+    @ivar _kind: Kind of the set - one out of L{IDSET_KINDS}
+    @type _kind: C{String}
+    @ivar _value: Id of the community or service for sets of kind L{IDSET_COMMUNITY_MEMBERS} or 
+        L{IDSET_SERVICE_MEMBERS}; the list of ids for sets of kind L{IDSET_IDS}
+    @ivar _index: Index of the ids for sets of kind L{IDSET_IDS}
+    @type _index: C{Dict}
+    """
+    
+    def __init__(self, kind, value = None):
+        """
+        Initialises the set.
+        
+        @param kind: Kind of the set - one out of L{IDSET_KINDS}
+        @type kind: C{String}
+        @param value: Community or service id or list of ids - depending on the kind
+        """
+        self._kind = kind
+        self._value = value
+        self._index = {}
+        if kind == IDSET_IDS:
+            for id in value:
+                self._index[id] = 1
+        
+    def __str__(self):
+        """
+        Symbolic description of the set.
+        """
+        if self._kind == IDSET_IDS:
+            return "[%s]" %(", ".join(self._value))
+        elif self._kind == IDSET_COMMUNITY_MEMBERS or self._kind == IDSET_SERVICE_MEMBERS:
+            return "members(%s)" %(self._value)
+        return "all %s" %(self._kind)
+        
+    def contains(self, id):
+        """
+        Checks, whether the given id is in the set.
+        
+        @rtype: C{Boolean}
+        """
+        if self._kind == IDSET_IDS:
+            return self._index.has_key(id)
+        elif self._kind == IDSET_ALL_MEMBERS:
+            from communitymanager import getMemberManager
+            try:
+                getMemberManager().getMember(id)
+                return 1
+            except KeyError:
+                return 0
+        elif self._kind == IDSET_COMMUNITY_MEMBERS:
+            from communitymanager import getCommunityManager
+            try:
+                return getCommunityManager().getCommunity(self._value).hasMember(id)
+            except KeyError:
+                return 0
+        elif self._kind == IDSET_SERVICE_MEMBERS:
+            from servicerepository import getServiceManager
+            try:
+                return getServiceManager().getService(self._value).hasMember(id)
+            except KeyError:
+                return 0
+        elif self._kind == IDSET_ALL_COMMUNITIES:
+            from communitymanager import getCommunityManager
+            try:
+                getCommunityManager().getCommunity(id)
+                return 1
+            except KeyError:
+                return 0
+        elif self._kind == IDSET_ALL_SERVICES:
+            from servicerepository import getServiceManager
+            try:
+                getServiceManager().getService(id)
+                return 1
+            except KeyError:
+                return 0
+        return 0
+
+
+class ProductCouples:
+    """
+    Couples of actor / target given by a set of actors and an independent set of targets - any actor with any target.
+    
+    @ivar _actors: The actors
+    @type _actors: L{IdSet}
+    @ivar _targets: The targets
+    @type _targets: L{IdSet}
+    """
+    
+    def __init__(self, actors, targets):
+        self._actors = actors
+        self._targets = targets
+        
+    def __str__(self):
+        return "%s -> %s" %(self._actors, self._targets)
+        
+    def contains(self, actor, target):
+        """
+        Checks, whether the given couple of actor / target is covered.
+        
+        @rtype: C{Boolean}
+        """
+        return self._actors.contains(actor) and self._targets.contains(target)
+
+
+class AuthorityCouples:
+    """
+    Couples of actor / target, for which the actor depends on the target - such as authorities of communities.
+    
+    Supported relations are:
+        - 'authorities_community': authorities of the community as target
+        - 'authorities_service': authorities of the service as target
+        - 'authorities_member': the member as target itself
+        - 'gateways_community': gateways into the community as target
+    
+    @ivar _relation: The relation between actor and target (the actor string from the policy)
+    @type _relation: C{String}
+    @ivar _targets: The targets
+    @type _targets: L{IdSet}
+    """
+    
+    def __init__(self, relation, targets):
+        self._relation = relation
+        self._targets = targets
+        
+    def __str__(self):
+        return "%s -> %s" %(self._relation, self._targets)
+        
+    def contains(self, actor, target):
+        """
+        Checks, whether the given couple of actor / target is covered.
+        
+        @rtype: C{Boolean}
+        """
+        if not self._targets.contains(target):
+            return 0
+        if self._relation == 'authorities_community':
+            from communitymanager import getCommunityManager
+            try:
+                return getCommunityManager().getCommunity(target).hasAuthority(actor)
+            except KeyError:
+                return 0
+        elif self._relation == 'authorities_service':
+            from servicerepository import getServiceManager
+            try:
+                return getServiceManager().getService(target).hasAuthority(actor)
+            except KeyError:
+                return 0
+        elif self._relation == 'authorities_member':
+            # each member is its own authority
+            return actor == target and IdSet(IDSET_ALL_MEMBERS).contains(actor)
+        elif self._relation == 'gateways_community':
+            # we only check the dest tc here; the src is left to the user
+            from communitymanager import getCommunityManager
+            for cid in getCommunityManager().getCommunityIds():
+                for gw in getCommunityManager().getCommunity(cid).getSourceGateways():
+                    if gw.getMemberId() == actor and gw.getDestinationCommunityId() == target:
+                        return 1
+        return 0
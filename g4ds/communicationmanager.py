@@ -20,6 +20,7 @@ connections and provide functions for lists of entries or loading an entry in pa
 import tools
 import config
 import communicationmanager_db
+import threading
 
 # ##########################################
 # ##########################################
@@ -56,6 +57,16 @@ def getEndpointManager():
     if _endpointManager == None:
         _endpointManager = EndpointManager(config.dbconnected)
     return _endpointManager
+
+def endpointDependenciesChanged():
+    """
+    To be called whenever a protocol, a credential or an algorithm is added.
+    
+    Endpoints, which could not be resolved for the index so far, are tried again with the next lookup
+    (see L{EndpointManager.findEndpoint}).
+    """
+    if _endpointManager != None:
+        _endpointManager.dependenciesChanged()
 # ##########################################
 # ##########################################
 
@@ -66,6 +77,17 @@ class EndpointManager:
 
     @ivar _endpoints: Dictionary, maintaining the endpoints - accessable by its id
     @type _endpoints: C{Dict} (C{String} | L{Endpoint})
+    @ivar _index: Lookup for incoming messages - key is the tuple of member id, community id, protocol name and algorithm name
+    @type _index: C{Dict} (C{Tuple} | L{Endpoint})
+    @ivar _indexKeys: Keys of the endpoints in the index - accessable by the endpoint id
+    @type _indexKeys: C{Dict} (C{String} | C{Tuple})
+    @ivar _unindexed: Endpoints not in the index yet (their protocol or credential could not be resolved so far)
+    @type _unindexed: C{Dict} (C{String} | L{Endpoint})
+    @ivar _retryUnindexed: Indicates, whether endpoints, protocols or credentials have changed since the unindexed
+        endpoints were tried last
+    @type _retryUnindexed: C{Boolean}
+    @ivar _indexLock: Guards the index - lookups happen concurrently in all dispatch workers
+    @type _indexLock: C{threading.Lock}
     @ivar _dbconnected: Indicates, whether the manager is connected to a database; hence whether the changes 
         shall be written through
     @type _dbconnected: C{Boolean}
@@ -80,6 +102,11 @@ class EndpointManager:
         @type loadFromDatabase: C{Boolean}
         """
         self._endpoints = {}
+        self._index = {}
+        self._indexKeys = {}
+        self._unindexed = {}
+        self._retryUnindexed = 1
+        self._indexLock = threading.Lock()
         self._dbconnected = loadFromDatabase
         if self._dbconnected:
             self._comm_db = communicationmanager_db.CommDB()
@@ -103,7 +130,16 @@ class EndpointManager:
         @param persistent: Indicates, whether the protocol shall be written through to the database
         @type persistent: C{Boolean}
         """
-        self._endpoints[endpoint.getId()] = endpoint
+        self._indexLock.acquire()
+        try:
+            if self._endpoints.has_key(endpoint.getId()):
+                self._unindexEndpoint(endpoint.getId())
+            self._endpoints[endpoint.getId()] = endpoint
+            # the index key is resolved with the next lookup - protocols and credentials might not be loaded yet
+            self._unindexed[endpoint.getId()] = endpoint
+            self._retryUnindexed = 1
+        finally:
+            self._indexLock.release()
         if persistent:
             self._comm_db.addEndpoint(endpoint)
 
@@ -127,12 +163,88 @@ class EndpointManager:
         """
         There is a problem to find the correct endpoint instance for incoming message.
         
-        A function inside the db connector solves this problem. All the known information is put togehter, and voila,
-        we have an endpoint id.
+        All the known information is put together and looked up in the in-memory index of the endpoints;
+        the database is not involved here.
+        
+        @param memberid: ID of the member the endpoint belongs to
+        @type memberid: C{String}
+        @param communityid: ID of the community the endpoint is used in
+        @type communityid: C{String}
+        @param protocolname: Name of the protocol of the endpoint
+        @type protocolname: C{String}
+        @param algorithmname: Name of the algorithm of the credential of the endpoint
+        @type algorithmname: C{String}
+        @return: The endpoint matching all the given information
+        @rtype: L{Endpoint}
+        """
+        key = (memberid, communityid, protocolname, algorithmname)
+        self._indexLock.acquire()
+        try:
+            if self._unindexed and self._retryUnindexed:
+                self._indexPending()
+            endpoint = self._index.get(key)
+        finally:
+            self._indexLock.release()
+        if endpoint is None:
+            from errorhandling import G4dsDependencyException
+            raise G4dsDependencyException('Incoming message has no valid endpoint. Try install / update member description.')
+        return endpoint
+        
+    def dependenciesChanged(self):
         """
-        if self._dbconnected:
-            endpointid = self._comm_db.findEndpoint(memberid, communityid, protocolname, algorithmname)
-            return self.getEndpoint(endpointid)
+        Makes the next lookup try again to index the endpoints, which could not be resolved so far.
+        """
+        self._retryUnindexed = 1
+        
+    def _getIndexKey(self, endpoint):
+        """
+        Assembles the key for the index of the given endpoint.
+        
+        @return: Tuple of member id, community id, protocol name and algorithm name - or None, if the protocol 
+            or the credential (or its algorithm) of the endpoint are not known (yet)
+        @rtype: C{Tuple}
+        """
+        from securitymanager import getCredentialManager, getAlgorithmManager
+        try:
+            protocolname = getProtocolManager().getProtocol(endpoint.getProtocolId()).getName()
+            credential = getCredentialManager().getCredential(endpoint.getCredentialId())
+            algorithmname = getAlgorithmManager().getAlgorithm(credential.getAlgorithmId()).getName()
+        except KeyError:
+            return None
+        return (endpoint.getMemberId(), endpoint.getCommunityId(), protocolname, algorithmname)
+        
+    def _indexPending(self):
+        """
+        Puts all endpoints into the index, which have not been indexed so far and can be resolved by now.
+        
+        The caller must hold the index lock.
+        """
+        self._retryUnindexed = 0
+        for endpoint in self._unindexed.values():
+            key = self._getIndexKey(endpoint)
+            if key:
+                self._index[key] = endpoint
+                self._indexKeys[endpoint.getId()] = key
+                self._unindexed.pop(endpoint.getId(), None)
+                
+    def _unindexEndpoint(self, endpointid):
+        """
+        Removes the endpoint with the given id from the index.
+        
+        The caller must hold the index lock.
+        """
+        if self._unindexed.has_key(endpointid):
+            del self._unindexed[endpointid]
+        if self._indexKeys.has_key(endpointid):
+            key = self._indexKeys[endpointid]
+            del self._indexKeys[endpointid]
+            if self._index.has_key(key) and self._index[key].getId() == endpointid:
+                del self._index[key]
+                # another endpoint might share the key
+                for otherid, otherKey in self._indexKeys.items():
+                    if otherKey == key:
+                        self._index[key] = self._endpoints[otherid]
+                        break
             
     def getEndpointsForMember(self, memberid, communityid = None, communityNegativeList = []):
         """
@@ -164,7 +276,12 @@ class EndpointManager:
         """
         Removes the endpoint with the given id from the manager (and the database if connected).
         """
-        del self._endpoints[endpointid]
+        self._indexLock.acquire()
+        try:
+            del self._endpoints[endpointid]
+            self._unindexEndpoint(endpointid)
+        finally:
+            self._indexLock.release()
         if self._dbconnected:
             self._comm_db.removeEndpoints(endpointid)
         
@@ -315,6 +432,7 @@ class ProtocolManager:
         @type persistent: C{Boolean}
         """
         self._protocols[protocol.getId()] = protocol
+        endpointDependenciesChanged()
         if persistent:
             self._comm_db.addProtocol(protocol)
 
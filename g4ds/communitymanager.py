@@ -77,6 +77,8 @@ class CommunityManager:
     @type _dbconnected: C{Boolean}
     @ivar _cm_db: Community Manager Database Connector
     @type _cm_db: L{communitymanager_db.CM_DB}
+    @ivar _changeListeners: Functions to be called whenever communities or their relations change
+    @type _changeListeners: C{List} of C{Function}
     """
     
     def __init__(self, loadFromDatabase = 0):
@@ -89,6 +91,7 @@ class CommunityManager:
         @type loadFromDatabase: C{Boolean}
         """
         self._communities = {}
+        self._changeListeners = []
         self._dbconnected = loadFromDatabase
         if loadFromDatabase:
             self._cm_db = communitymanager_db.CM_DB()
@@ -143,6 +146,7 @@ class CommunityManager:
         self._communities[community.getId()] = community
         if persistent:
             self._cm_db.addCommunity(community, storeMemberRelations)
+        self.notifyChange(self._getAffectedIds(community))
     
     def getCommunity(self, communityId):
         """
@@ -179,6 +183,7 @@ class CommunityManager:
         @type dropMemberRelations: C{Boolean}
         """
         if self._communities.has_key(community.getId()):
+            affected = self._getAffectedIds(self._communities[community.getId()])
             del self._communities[community.getId()]
             self._communities[community.getId()] = community
             if self._dbconnected:
@@ -216,10 +221,43 @@ class CommunityManager:
                     for algorithm in algorithms:
                         community.addAlgorithm(algorithm, loading = 1)
                 
+            self.notifyChange(affected + self._getAffectedIds(community))
         else:
             self.addCommunity(community)
         return community
         
+    def addChangeListener(self, listener):
+        """
+        Registers a function to be called whenever a community or the relations of members with a community change.
+        
+        The listener is passed the list of ids of the communities and members affected by the change.
+        
+        @param listener: Function to be called on changes
+        @type listener: C{Function}
+        """
+        self._changeListeners.append(listener)
+        
+    def notifyChange(self, ids):
+        """
+        Passes a change to all the registered listeners.
+        
+        @param ids: IDs of the communities and members affected by the change
+        @type ids: C{List} of C{String}
+        """
+        for listener in self._changeListeners:
+            listener(ids)
+            
+    def _getAffectedIds(self, community):
+        """
+        Assembles the ids of the community itself and all the members related with it.
+        
+        @rtype: C{List} of C{String}
+        """
+        ids = [community.getId()] + community.getMembers() + community.getAuthorities()
+        for gateway in community.getSourceGateways() + community.getDestinationGateways():
+            ids.append(gateway.getMemberId())
+        return ids
+        
     def registerCommunityMemberRelation(self, communityid, memberid):
         """
         Passes the request to the database backend.
@@ -282,6 +320,10 @@ class Community:
     @type _members: C{List} of C{String}
     @ivar _authorities: List of Community Authorities for this TC (their ids)
     @type _authorities: C{List} of C{String}
+    @ivar _memberIndex: Index of the member ids for membership checks
+    @type _memberIndex: C{Dict}
+    @ivar _authorityIndex: Index of the member ids of the Community Authorities
+    @type _authorityIndex: C{Dict}
     @ivar _sourceGateways: List of outgoing gateways
     @type _sourceGateways: C{List} of L{CommunityGateway}
     @ivar _destinationGateways: List of incoming gateways
@@ -327,6 +369,8 @@ class Community:
         
         self._members = []
         self._authorities = []
+        self._memberIndex = {}
+        self._authorityIndex = {}
         
         self._sourceGateways = []
         self._destinationGateways = []
@@ -417,16 +461,14 @@ class Community:
         @param loading: Indicates, whether this function is called during initialisation process. No changes must be written to the db then.
         @type loading: C{Boolean}
         """
-        memberalready = 0
-        for m in self._members:
-            if m == memberId:
-                    memberalready = 1
-        if not memberalready:
+        if not self._memberIndex.has_key(memberId):
             self._members.append(memberId)
+            self._memberIndex[memberId] = 1
 
             if not loading:
                 global getCommunityManager
                 getCommunityManager().registerCommunityMemberRelation(self.getId(), memberId)
+                getCommunityManager().notifyChange([memberId])
         
         if registerInMember:
             member = getMemberManager().getMember(memberId)
@@ -447,17 +489,14 @@ class Community:
         @param loading: Indicates, whether this function is called during initialisation process. No changes must be written to the db then.
         @type loading: C{Boolean}        
         """
-        memberalready = 0
-        for m in self._authorities:
-            if m == authority_memberId:
-                memberalready = 1
-
-        if not memberalready:
+        if not self._authorityIndex.has_key(authority_memberId):
             self._authorities.append(authority_memberId)
+            self._authorityIndex[authority_memberId] = 1
             
             if not loading:
                 global getCommunityManager
                 getCommunityManager().registerCommunityAuthorityRelation(self.getId(), authority_memberId)
+                getCommunityManager().notifyChange([authority_memberId])
                 
         if registerInMember:
             member = getMemberManager().getMember(authority_memberId)
@@ -484,12 +523,7 @@ class Community:
         @return: Indicates, whether the member is member of the community
         @rtype: C{Boolean}
         """
-        try:
-            self._members.index(memberid)
-            return 1
-        except ValueError:
-            pass
-        return 0
+        return self._memberIndex.has_key(memberid)
         
     def getAuthorities(self):
         """
@@ -502,6 +536,17 @@ class Community:
         """
         return self._authorities
         
+    def hasAuthority(self, memberid):
+        """
+        Checks, whether the member with the given id is Community Authority for this community.
+        
+        @param memberid: ID of the potential authority of the community
+        @type memberid: C{String}
+        @return: Indicates, whether the member is authority of the community
+        @rtype: C{Boolean}
+        """
+        return self._authorityIndex.has_key(memberid)
+        
     def addGateway(self, gateway):
         """
         Add a community gateway to this community.
@@ -516,6 +561,8 @@ class Community:
             self._sourceGateways.append(gateway)
         if gateway.getDestinationCommunityId() == self._id:
             self._destinationGateways.append(gateway)
+        if _communityManager:       # gateways are added while the manager is being initialised as well
+            _communityManager.notifyChange([gateway.getMemberId()])
     
     def getSourceGateways(self):
         """
@@ -699,6 +746,8 @@ class MemberManager:
     @type _dbconnected: C{Boolean}
     @ivar _cm_db: Community Manager Database Connector
     @type _cm_db: L{communitymanager_db.CM_DB}
+    @ivar _changeListeners: Functions to be called whenever members are added or updated
+    @type _changeListeners: C{List} of C{Function}
     """
     
     def __init__(self, loadFromDatabase = 0):
@@ -706,6 +755,7 @@ class MemberManager:
         Initialises the member manager.
         """
         self._members = {}
+        self._changeListeners = []
         self._dbconnected = loadFromDatabase
         if loadFromDatabase:
             self._cm_db = communitymanager_db.CM_DB()
@@ -748,6 +798,7 @@ class MemberManager:
         self._members[member.getId()] = member
         if persistent:
             self._cm_db.addMember(member, storeCommunityRelations)
+        self.notifyChange([member.getId()])
         
     def getMember(self, memberId):
         """
@@ -796,11 +847,33 @@ class MemberManager:
             self._members[member.getId()] = member
             if self._dbconnected:
                 self._cm_db.updateMember(member, updateCommunityRelations)
+            self.notifyChange([member.getId()])
                 
         else:
             self.addMember(member, storeCommunityRelations=updateCommunityRelations)
         return member
         
+    def addChangeListener(self, listener):
+        """
+        Registers a function to be called whenever a member is added or updated.
+        
+        The listener is passed the list of ids of the members affected by the change.
+        
+        @param listener: Function to be called on changes
+        @type listener: C{Function}
+        """
+        self._changeListeners.append(listener)
+        
+    def notifyChange(self, ids):
+        """
+        Passes a change to all the registered listeners.
+        
+        @param ids: IDs of the members affected by the change
+        @type ids: C{List} of C{String}
+        """
+        for listener in self._changeListeners:
+            listener(ids)
+        
 class Member:
     """
     Keeps data for one member.
@@ -31,6 +31,45 @@ DAEMON_MODE = 1
 FIFO_PATH_IN = '/tmp/g4ds.in.fifo'
 FIFO_PATH_OUT = '/tmp/g4ds.out.fifo'
 
+# highest version of message envelopes used for sending - version 2 (see envelopecodec) is only used for members,
+# which have announced to support it; set to 1 for sending the original format only
+ENVELOPE_VERSION = 2
+# bounds for the contexts of incoming messages (see messagehandler.MessageContextController) - maximum number of
+# contexts kept and their life time in seconds; the oldest contexts are dropped first
+MESSAGE_CONTEXT_MAX_SIZE = 10000
+MESSAGE_CONTEXT_LIFETIME = 600
+# worker pool for incoming messages (see dispatchpool) - number of worker threads (0 for a new thread per message),
+# maximum number of messages queued and what to do when the queue is full ('reject' - discard the new message,
+# 'queue' - block the listener for DISPATCH_QUEUE_TIMEOUT seconds at most, 'shed' - discard the oldest message of
+# the busiest sender)
+DISPATCH_WORKERS = 8
+DISPATCH_QUEUE_SIZE = 500
+DISPATCH_POLICY = 'queue'
+DISPATCH_QUEUE_TIMEOUT = 30
+# asynchronous delivery of outgoing messages (see outboundscheduler) - number of worker threads (0 for sending on the
+# thread of the caller), maximum number of messages waiting per endpoint, limits for coalescing small messages for one
+# endpoint (number of messages and bytes), number of attempts per message and delay before the first retry (doubled
+# with each attempt up to the maximum) in seconds; the workers mostly wait for the network - for broadcasts, there
+# should be about as many of them as members in the communities
+OUTBOUND_WORKERS = 32
+OUTBOUND_QUEUE_SIZE = 1000
+OUTBOUND_BATCH_SIZE = 16
+OUTBOUND_BATCH_BYTES = 65536
+OUTBOUND_RETRIES = 5
+OUTBOUND_RETRY_DELAY = 1
+OUTBOUND_RETRY_MAX_DELAY = 60
+# maximum number of access control decisions (actor / target / action) remembered by the authorisation controller
+POLICY_DECISION_CACHE_SIZE = 10000
+# maximum number of couples of actor / target the rules applying to are remembered for by the authorisation controller
+POLICY_COUPLE_CACHE_SIZE = 10000
+# writing of the log file in a background thread (see g4dslogging.LogWriter) - set to 0 for writing on the thread of
+# the caller; maximum number of messages queued (further messages are dropped), seconds messages are kept in the queue
+# at most and number of messages queued for writing them before the interval has passed
+LOGGING_ASYNC = 1
+LOGGING_QUEUE_SIZE = 10000
+LOGGING_FLUSH_INTERVAL = 1
+LOGGING_BATCH_SIZE = 100
+
 
 ## ########################################
 ##
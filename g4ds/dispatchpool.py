@@ -0,0 +1,313 @@
+"""
+Worker pool for dispatching incoming G4DS messages.
+
+Grid for Digital Security (G4DS)
+
+Incoming messages used to be dispatched in a new thread each; under a burst of messages hundreds
+of threads were decrypting and parsing at the same time. Instead, messages are put into a bounded
+queue now and processed by a fixed number of worker threads (see DISPATCH_WORKERS in L{config}).
+
+The queue is kept per source (the address of the sending node as far as the protocol reveals it,
+the name of the protocol otherwise); the workers take the messages from the sources in turn -
+this way, a single node flooding this one cannot starve all the others.
+
+When the queue is full, the configured overload policy is applied (DISPATCH_POLICY in L{config}):
+    - L{DISPATCH_POLICY_REJECT}: the new message is discarded
+    - L{DISPATCH_POLICY_QUEUE}: the protocol listener is blocked until there is room again
+    (for DISPATCH_QUEUE_TIMEOUT seconds at most - the message is discarded afterwards)
+    - L{DISPATCH_POLICY_SHED}: the oldest message of the source with the most messages queued is discarded
+
+@author: Michael Pilgermann
+@contact: mailto:mpilgerm@glam.ac.uk
+@license: GPL (General Public License)
+
+@var _dispatchPool: Singleton - the only instance ever of the DispatchPool class
+@type _dispatchPool: L{DispatchPool}
+"""
+
+import threading
+import time
+from collections import deque
+
+DISPATCH_POLICY_REJECT = 'reject'
+DISPATCH_POLICY_QUEUE = 'queue'
+DISPATCH_POLICY_SHED = 'shed'
+
+DISPATCH_POLICIES = [DISPATCH_POLICY_REJECT, DISPATCH_POLICY_QUEUE, DISPATCH_POLICY_SHED]
+
+# stages of processing an incoming message latencies are recorded for
+STAGE_QUEUE = 'queue'
+STAGE_DECODE = 'decode'
+STAGE_DELIVER = 'deliver'
+
+# "singleton"
+_dispatchPool = None
+def getDispatchPool():
+    """
+    Singleton implementation.
+
+    The settings for the pool are taken from the config module.
+
+    @return: The instance for the dispatch pool
+    @rtype: L{DispatchPool}
+    """
+    global _dispatchPool
+    if not _dispatchPool:
+        import config
+        _dispatchPool = DispatchPool(config.DISPATCH_WORKERS, config.DISPATCH_QUEUE_SIZE, config.DISPATCH_POLICY,
+            config.DISPATCH_QUEUE_TIMEOUT)
+    return _dispatchPool
+
+class DispatchPool:
+    """
+    Fixed number of worker threads processing the messages from a bounded queue with fairness among the sources.
+
+    @ivar _queues: Queued messages by source - each one with the time it was queued
+    @type _queues: C{Dict} (C{String} | C{collections.deque} of C{Tuple} (C{float}, item))
+    @ivar _sources: Sources with messages queued in the order they are served
+    @type _sources: C{collections.deque} of C{String}
+    @ivar _latencies: Number of messages, total and maximum time in seconds by stage
+    @type _latencies: C{Dict} (C{String} | C{List} [C{int}, C{float}, C{float}])
+    """
+
+    def __init__(self, workers = 8, maxSize = 500, policy = DISPATCH_POLICY_QUEUE, queueTimeout = 30):
+        """
+        Initialises the empty queue and its statistics; the workers are started with the first message.
+
+        @param workers: Number of worker threads
+        @type workers: C{int}
+        @param maxSize: Maximum number of messages queued (all sources together)
+        @type maxSize: C{int}
+        @param policy: What to do if the queue is full - one out of L{DISPATCH_POLICIES}
+        @type policy: C{String}
+        @param queueTimeout: Seconds a listener is blocked at most (policy queue only) - None for no limit
+        @type queueTimeout: C{float}
+        """
+        if policy not in DISPATCH_POLICIES:
+            from errorhandling import G4dsRuntimeException
+            raise G4dsRuntimeException('Unknown overload policy for dispatching: %s' %(policy))
+        self._workers = workers
+        self._maxSize = maxSize
+        self._policy = policy
+        self._queueTimeout = queueTimeout
+        self._queues = {}
+        self._sources = deque()
+        self._size = 0
+        self._condition = threading.Condition()
+        self._threads = []
+        self._alive = 1
+
+        self._enqueued = 0
+        self._dispatched = 0
+        self._rejected = 0
+        self._shed = 0
+        self._highWaterMark = 0
+        self._latencies = {}
+
+    def submit(self, function, args, source = None):
+        """
+        Queues a message for processing by the workers.
+
+        If the queue is full, the overload policy is applied.
+
+        @param function: Function processing the message
+        @type function: C{Function}
+        @param args: Arguments for the function
+        @type args: C{Tuple}
+        @param source: Key for fairness - address of the sending node or name of the protocol
+        @type source: C{String}
+        @return: Indicates, whether the message was queued (1) or discarded (0)
+        @rtype: C{int}
+        """
+        self._condition.acquire()
+        try:
+            if not self._alive:
+                self._rejected += 1
+                return 0
+            if not self._threads:
+                self._startWorkers()
+            if self._size >= self._maxSize:
+                if self._policy == DISPATCH_POLICY_REJECT:
+                    self._rejected += 1
+                    return 0
+                elif self._policy == DISPATCH_POLICY_QUEUE:
+                    if not self._waitForRoom():
+                        self._rejected += 1
+                        return 0
+                elif self._policy == DISPATCH_POLICY_SHED:
+                    self._shedOne()
+
+            if not self._queues.has_key(source):
+                self._queues[source] = deque()
+                self._sources.append(source)
+            self._queues[source].append((time.time(), (function, args)))
+            self._size += 1
+            self._enqueued += 1
+            if self._size > self._highWaterMark:
+                self._highWaterMark = self._size
+            self._condition.notify()
+            return 1
+        finally:
+            self._condition.release()
+
+    def _startWorkers(self):
+        """
+        Starts the worker threads.
+
+        The caller must hold the condition.
+        """
+        for i in range(self._workers):
+            worker = threading.Thread(target = self._work, name = 'g4ds-dispatch-%d' %(i))
+            worker.setDaemon(1)
+            worker.start()
+            self._threads.append(worker)
+
+    def _waitForRoom(self):
+        """
+        Blocks the producer until there is room in the queue or the queue timeout elapsed.
+
+        The caller must hold the condition.
+        """
+        start = time.time()
+        while self._size >= self._maxSize and self._alive:
+            if self._queueTimeout is None:
+                self._condition.wait()
+            else:
+                remaining = self._queueTimeout - (time.time() - start)
+                if remaining <= 0:
+                    return 0
+                self._condition.wait(remaining)
+        return self._alive
+
+    def _shedOne(self):
+        """
+        Discards the oldest message of the source with the most messages queued.
+
+        The caller must hold the condition.
+        """
+        longest = None
+        for source, queue in self._queues.items():
+            if longest is None or len(queue) > len(self._queues[longest]):
+                longest = source
+        self._queues[longest].popleft()
+        if not self._queues[longest]:
+            del self._queues[longest]
+            self._sources.remove(longest)
+        self._size -= 1
+        self._shed += 1
+
+    def _next(self):
+        """
+        Takes the next message - from the next source in turn; blocks until a message is available.
+
+        @return: Time the message was queued, function and arguments - or None, if the pool was shut down
+            and the queue is empty
+        @rtype: C{Tuple} (C{float}, C{Tuple} (C{Function}, C{Tuple}))
+        """
+        self._condition.acquire()
+        try:
+            while not self._size:
+                if not self._alive:
+                    return None
+                self._condition.wait()
+            source = self._sources.popleft()
+            queue = self._queues[source]
+            item = queue.popleft()
+            if queue:
+                self._sources.append(source)
+            else:
+                del self._queues[source]
+            self._size -= 1
+            # there might be blocked listeners waiting for room
+            self._condition.notifyAll()
+            return item
+        finally:
+            self._condition.release()
+
+    def _work(self):
+        """
+        Main loop of the worker threads.
+        """
+        while 1:
+            item = self._next()
+            if item is None:
+                return
+            queued, (function, args) = item
+            self.addLatency(STAGE_QUEUE, time.time() - queued)
+            try:
+                apply(function, args)
+            except Exception, msg:
+                from g4dslogging import getDefaultLogger, COMMUNICATION_INCOMING_ERROR
+                getDefaultLogger().newMessage(COMMUNICATION_INCOMING_ERROR, 'Dispatch worker - unknown Error: %s' %(msg))
+            self._condition.acquire()
+            try:
+                self._dispatched += 1
+            finally:
+                self._condition.release()
+
+    def addLatency(self, stage, duration):
+        """
+        Records the time spent in one stage of processing an incoming message.
+
+        @param stage: Name of the stage (L{STAGE_QUEUE}, L{STAGE_DECODE}, L{STAGE_DELIVER})
+        @type stage: C{String}
+        @param duration: Seconds spent in the stage
+        @type duration: C{float}
+        """
+        self._condition.acquire()
+        try:
+            if not self._latencies.has_key(stage):
+                self._latencies[stage] = [0, 0.0, 0.0]
+            entry = self._latencies[stage]
+            entry[0] += 1
+            entry[1] += duration
+            if duration > entry[2]:
+                entry[2] = duration
+        finally:
+            self._condition.release()
+
+    def shutdown(self, timeout = 10):
+        """
+        Stops accepting messages; the workers process the messages queued already and terminate.
+
+        @param timeout: Seconds to wait for each worker at most
+        @type timeout: C{float}
+        """
+        self._condition.acquire()
+        try:
+            self._alive = 0
+            self._condition.notifyAll()
+            threads = self._threads
+        finally:
+            self._condition.release()
+        for worker in threads:
+            worker.join(timeout)
+
+    def getStatistics(self):
+        """
+        Assembles the metrics of the pool.
+
+        Latencies are given as average and maximum in seconds for each stage.
+
+        @return: Dictionary with the current statistics values
+        @rtype: C{Dict}
+        """
+        self._condition.acquire()
+        try:
+            stats = {}
+            stats['workers'] = self._workers
+            stats['size'] = self._size
+            stats['max_size'] = self._maxSize
+            stats['policy'] = self._policy
+            stats['sources'] = len(self._queues)
+            stats['high_water_mark'] = self._highWaterMark
+            stats['enqueued'] = self._enqueued
+            stats['dispatched'] = self._dispatched
+            stats['rejected'] = self._rejected
+            stats['shed'] = self._shed
+            for stage, (count, total, maximum) in self._latencies.items():
+                stats['latency_%s_avg' %(stage)] = total / count
+                stats['latency_%s_max' %(stage)] = maximum
+            return stats
+        finally:
+            self._condition.release()
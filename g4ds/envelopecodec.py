@@ -0,0 +1,256 @@
+"""
+Single pass codec for G4DS message envelopes.
+
+Grid for Digital Security (G4DS)
+
+The original envelope (see L{messagewrapper.MessageWrapper}) nests five XML documents - the service
+or control message, the plain message, the signed chunk, the encrypted chunk and the G4DS root. Each
+of them is created as DOM tree and pretty printed, the embedded documents are compressed and hex
+encoded (doubling their size) on each level and the receiver parses each level again.
+
+Envelopes of version 2 consist of two flat documents only, which are assembled and parsed in one
+pass each:
+    - the inner document, which is encrypted - one element carrying all header fields as attributes
+    and the base64 encoded payload as text::
+        <g4dsmsg kind=".." id=".." name=".." messageid=".." senderid=".." referenceid=".."
+            algorithm=".." communityid=".." fingerprint=".." signature="..">PAYLOAD</g4dsmsg>
+    - the outer document carrying the base64 encoded cipher text::
+        <g4ds version="2"><enc algorithm=".." sessionkey=".." sessionkeys="1">CIPHER TEXT</enc></g4ds>
+
+The inner document is compressed once only (before encryption). The signature covers all the
+header fields and the payload (see L{EnvelopeCodec.getSignatureInput}).
+
+Members are only sent envelopes of version 2 once they have proven to support them: messages in
+the original format sent by this implementation carry the highest envelope version it can receive
+in the root element; the sender is registered with L{EnvelopeCodec.setSupported} once the
+signature of such a message was validated.
+
+@author: Michael Pilgermann
+@contact: mailto:mpilgerm@glam.ac.uk
+@license: GPL (General Public License)
+
+@var _envelopeCodec: Singleton - the only instance ever of the EnvelopeCodec class
+@type _envelopeCodec: L{EnvelopeCodec}
+"""
+
+import re
+import base64
+import xml.parsers.expat
+from xml.sax.saxutils import quoteattr
+
+import xmlconfig
+
+# the version of envelopes assembled by this module
+ENVELOPE_VERSION = 2
+
+# header fields of the inner document covered by the signature (in this order)
+SIGNED_FIELDS = [xmlconfig.g4ds_envelope_kind, xmlconfig.g4ds_envelope_id, xmlconfig.g4ds_envelope_name,
+    xmlconfig.g4ds_plain_messageid, xmlconfig.g4ds_plain_senderid, xmlconfig.g4ds_plain_referenceid,
+    xmlconfig.g4ds_signature_algorithm, xmlconfig.g4ds_signature_communityid]
+
+_rootPattern = re.compile(r'\s*(?:<\?xml[^>]*\?>\s*)?<%s\b([^>]*)>' %(xmlconfig.g4ds_root_node))
+_attributePattern = re.compile(r'([\w:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+# "singleton"
+_envelopeCodec = None
+def getEnvelopeCodec():
+    """
+    Singleton implementation.
+
+    @return: The instance for the envelope codec class
+    @rtype: L{EnvelopeCodec}
+    """
+    global _envelopeCodec
+    if not _envelopeCodec:
+        _envelopeCodec = EnvelopeCodec()
+    return _envelopeCodec
+
+class EnvelopeCodec:
+    """
+    Assembles and parses envelopes of version 2; keeps track of the members supporting them.
+
+    @ivar _supported: Ids of members, which support envelopes of version 2
+    @type _supported: C{Dict}
+    """
+
+    def __init__(self):
+        """
+        Initialises the empty list of members supporting envelopes of version 2.
+        """
+        self._supported = {}
+
+    def setSupported(self, memberid):
+        """
+        Registers the given member as supporting envelopes of version 2.
+        """
+        self._supported[memberid] = 1
+
+    def isSupported(self, memberid):
+        """
+        Checks, whether messages to the given member shall be sent in envelopes of version 2.
+
+        Envelopes of version 2 may be disabled in the config module (ENVELOPE_VERSION).
+
+        @rtype: C{Boolean}
+        """
+        import config
+        return config.ENVELOPE_VERSION >= ENVELOPE_VERSION and self._supported.has_key(memberid)
+
+    def getEnvelopeInfo(self, message):
+        """
+        Determines the version of the envelope from the root element - without parsing the whole message.
+
+        @param message: The message as received
+        @type message: C{String}
+        @return: Version of the envelope and the highest version the sender is able to receive
+        @rtype: C{Tuple} (C{int}, C{int})
+        """
+        match = _rootPattern.match(message)
+        if not match:
+            return 1, 1
+        attributes = {}
+        for name, value1, value2 in _attributePattern.findall(match.group(1)):
+            attributes[name] = value1 or value2
+        try:
+            version = int(attributes.get(xmlconfig.g4ds_envelope_version, 1))
+            supported = int(attributes.get(xmlconfig.g4ds_envelope_versions, version))
+        except ValueError:
+            return 1, 1
+        return version, supported
+
+    def getSignatureInput(self, fields, payload):
+        """
+        Assembles the string to be signed for an inner document.
+
+        Each header field (as given in L{SIGNED_FIELDS}) and finally the payload is put in with its
+        length in front; this way, the fields cannot be shifted against each other.
+
+        @param fields: Header fields by attribute name
+        @type fields: C{Dict}
+        @param payload: The payload of the message
+        @type payload: C{String}
+        @rtype: C{String}
+        """
+        parts = []
+        for name in SIGNED_FIELDS:
+            value = fields.get(name) or ''
+            if type(value) == type(u''):
+                value = value.encode('utf-8')
+            parts.append('%d:%s' %(len(value), value))
+        if type(payload) == type(u''):
+            payload = payload.encode('utf-8')
+        parts.append('%d:%s' %(len(payload), payload))
+        return ''.join(parts)
+
+    def wrapInner(self, fields, payload):
+        """
+        Assembles the inner document (the one to be encrypted).
+
+        @param fields: Header fields by attribute name (see L{SIGNED_FIELDS}; plus fingerprint and signature)
+        @type fields: C{Dict}
+        @param payload: Service or control message to be transported
+        @type payload: C{String}
+        @return: The inner document (UTF-8 encoded)
+        @rtype: C{String}
+        """
+        parts = ['<', xmlconfig.g4ds_envelope_inner_node]
+        for name, value in fields.items():
+            if value is None:
+                continue
+            if type(value) == type(u''):
+                value = value.encode('utf-8')
+            parts.append(' %s=%s' %(name, quoteattr(value)))
+        parts.append('>')
+        if type(payload) == type(u''):
+            payload = payload.encode('utf-8')
+        parts.append(base64.b64encode(payload))
+        parts.append('</%s>' %(xmlconfig.g4ds_envelope_inner_node))
+        return ''.join(parts)
+
+    def unwrapInner(self, inner):
+        """
+        Inverse function for L{wrapInner}.
+
+        @return: Header fields by attribute name and the payload (as unicode - like the header fields)
+        @rtype: C{Tuple} (C{Dict}, C{String})
+        """
+        elements = self._parse(inner)
+        if not elements or elements[0][0] != xmlconfig.g4ds_envelope_inner_node:
+            from errorhandling import G4dsCommunicationException
+            raise G4dsCommunicationException('Invalid envelope: inner document not found.')
+        name, attributes, text = elements[0]
+        return attributes, base64.b64decode(''.join(text)).decode('utf-8')
+
+    def wrapOuter(self, ciphertext, algName, sessionKey = None, sessionKeysSupported = 0):
+        """
+        Assembles the outer document (the one to be sent).
+
+        @param ciphertext: The encrypted inner document
+        @type ciphertext: C{String}
+        @param algName: Name of the encryption algorithm
+        @type algName: C{String}
+        @param sessionKey: Encrypted session key the inner document was encrypted with (None if encrypted with the algorithm directly)
+        @type sessionKey: C{String}
+        @param sessionKeysSupported: Indicates, whether the sender supports session keys for incoming messages
+        @type sessionKeysSupported: C{Boolean}
+        @return: The message
+        @rtype: C{String}
+        """
+        parts = ['<%s %s="%d"><%s %s=%s' %(xmlconfig.g4ds_root_node, xmlconfig.g4ds_envelope_version, ENVELOPE_VERSION,
+            xmlconfig.g4ds_encryption_node, xmlconfig.g4ds_encryption_algorithm, quoteattr(algName))]
+        if sessionKey:
+            parts.append(' %s="%s"' %(xmlconfig.g4ds_encryption_sessionkey, base64.b64encode(sessionKey)))
+        if sessionKeysSupported:
+            parts.append(' %s="1"' %(xmlconfig.g4ds_encryption_sessionkeys_supported))
+        parts.append('>')
+        parts.append(base64.b64encode(ciphertext))
+        parts.append('</%s></%s>' %(xmlconfig.g4ds_encryption_node, xmlconfig.g4ds_root_node))
+        return ''.join(parts)
+
+    def unwrapOuter(self, message):
+        """
+        Inverse function for L{wrapOuter}.
+
+        @return: Name of the algorithm, the cipher text, the encrypted session key (None if not given) and the flag,
+            whether the sender supports session keys
+        @rtype: C{String}; C{String}; C{String}; C{Boolean}
+        """
+        elements = self._parse(message)
+        if len(elements) < 2 or elements[0][0] != xmlconfig.g4ds_root_node or elements[1][0] != xmlconfig.g4ds_encryption_node:
+            from errorhandling import G4dsCommunicationException
+            raise G4dsCommunicationException('Invalid envelope: encrypted chunk not found.')
+        name, attributes, text = elements[1]
+        sessionKey = attributes.get(xmlconfig.g4ds_encryption_sessionkey)
+        if sessionKey:
+            sessionKey = base64.b64decode(sessionKey)
+        supported = attributes.get(xmlconfig.g4ds_encryption_sessionkeys_supported) == '1'
+        return attributes.get(xmlconfig.g4ds_encryption_algorithm), base64.b64decode(''.join(text)), sessionKey, supported
+
+    def _parse(self, document):
+        """
+        Parses the document in one pass.
+
+        @return: Name, attributes and text chunks for each element in document order
+        @rtype: C{List} of [C{String}, C{Dict}, C{List} of C{String}]
+        """
+        elements = []
+        stack = []
+        def start(name, attributes):
+            element = [name, attributes, []]
+            elements.append(element)
+            stack.append(element)
+        def end(name):
+            stack.pop()
+        def characters(data):
+            if stack:
+                stack[-1][2].append(data)
+        parser = xml.parsers.expat.ParserCreate()
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        parser.CharacterDataHandler = characters
+        try:
+            parser.Parse(document, 1)
+        except xml.parsers.expat.ExpatError, msg:
+            from errorhandling import G4dsCommunicationException
+            raise G4dsCommunicationException('Invalid envelope: %s' %(msg))
+        return elements
@@ -184,6 +184,11 @@ class G4DS:
         except G4dsRuntimeException, msg:
             _finishActionLine(SUCESS_SKIP)
 
+        _printAction(1, "Sending remaining outgoing messages")
+        from outboundscheduler import getOutboundScheduler
+        getOutboundScheduler().shutdown()
+        _finishActionLine()
+
         _printAction(1, "Shutting down Listeners")
         from protocolcontroller import getProtocolController
         import socket
@@ -194,6 +199,10 @@ class G4DS:
             _finishActionLine(SUCESS_NEG)
             _printAction(2, str(msg))
             _finishActionLine(SUCESS_NEG)            
+        _printAction(1, "Shutting down message dispatching")
+        from dispatchpool import getDispatchPool
+        getDispatchPool().shutdown()
+        _finishActionLine()
         _printAction (1,"Shutting down Logging")
         from g4dslogging import getDefaultLogger
         getDefaultLogger().closedown()
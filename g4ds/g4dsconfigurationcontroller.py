@@ -1220,7 +1220,7 @@ class ServiceController:
                 # that's great - he is not a member yet
                 service.addMember(newmemberid)
                 self.sendServiceControllerMessage(receiver, SERVICE_ACTION_GENERIC_REPLY, args, None, messageid)
-                getDefaultLogger().newMessage(CONTROL_SYSTEM_DETAILS, 'G4DS Control - SS Service: Added member (%s) to service (%s).' %(newmemberid, serviceid))
+                getDefaultLogger().newMessage(CONTROL_SYSTEM_DETAILS, 'G4DS Control - SS Service: Added member (%s) to service (%s).', newmemberid, serviceid)
         except KeyError:
             self.sendServiceControllerMessage(receiver, SERVICE_ACTION_GENERIC_REPLY, args, None, messageid, SERVICE_SUCESS_SERVICE_NOT_FOUND)
 
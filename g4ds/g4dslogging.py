@@ -5,14 +5,20 @@ Grid for Digital Security (G4DS)
 
 Currently, simple logging into files.
 
+Writing to the log file is left to a background thread (see L{LogWriter}) unless disabled in the config module
+(LOGGING_ASYNC); callers only put their messages into a queue.
+
 @author: Michael Pilgermann
 @contact: mailto:mpilgerm@glam.ac.uk
 @license: GPL (General Public License)
 """
 
-from time import strftime
+from time import strftime, localtime
+import time
 import string
 import syslog
+import threading
+from collections import deque
 
 # "singleton"
 _defaultLogger = None
@@ -82,6 +88,10 @@ class FileLogger:
     @type _logfile: C{File}
     @ivar _level: Log level to be used for the instance (defined in config file)
     @type _level: C{int}
+    @ivar _enabled: Categories logged in the log level of the instance
+    @type _enabled: C{Dict}
+    @ivar _writer: Background writer for the log file - None if messages are written synchronously
+    @type _writer: L{LogWriter}
     """
     
     def __init__(self):
@@ -94,11 +104,20 @@ class FileLogger:
         from config import LOGGING_FILENAME, LOGGING_LEVEL, ENABLE_SYSLOG, SYSLOG_IDENTIFIER 
         self._logfile = open(LOGGING_FILENAME, 'a')
         self._level = LOGGING_LEVEL
+        self._enabled = {}
+        if self._level != 5:
+            for category in CLASS[self._level]:
+                self._enabled[category] = 1
         
         self._syslogOn = ENABLE_SYSLOG
         
         if ENABLE_SYSLOG:
             syslog.openlog(SYSLOG_IDENTIFIER)
+            
+        self._writer = None
+        if config.LOGGING_ASYNC:
+            self._writer = LogWriter(self._writeEntries, config.LOGGING_QUEUE_SIZE, config.LOGGING_FLUSH_INTERVAL,
+                config.LOGGING_BATCH_SIZE, 'g4ds-logwriter')
         
         self.newMessage(LOGSERVER_STATUS, 'G4DS Logging started (level %d)' %(self._level))
 
@@ -109,30 +128,73 @@ class FileLogger:
         Put a log message in the log file for closing down g4ds logging and finally close the log file.
         """
         self.newMessage(LOGSERVER_STATUS, 'G4DS Logging shut down')
+        if self._writer:
+            self._writer.shutdown()
         self._logfile.close()
         
         if self._syslogOn:
             syslog.closelog()
         
-    def newMessage(self, category, message):
+    def isEnabled(self, category):
+        """
+        Checks, whether messages of the given category are logged in the activated log level.
+        
+        Callers may skip expensive preparations of log messages this way.
+        
+        @rtype: C{Boolean}
+        """
+        return self._level == 5 or self._enabled.has_key(category)
+        
+    def newMessage(self, category, message, *args):
         """
         New entry for the log system.
         
         A check is performed, whether the given category is to be logged in the activated log level. If so,
-        a message is generated, made up by a time stamp, the category value and the message itself.
+        a message is generated, made up by a time stamp, the category value and the message itself. With the
+        background writer, the message is only queued here - the line is assembled and written by the writer.
+        
+        @param category: Category of the message
+        @type category: C{int}
+        @param message: The message - or a format string, if arguments are given
+        @type message: C{String}
+        @param args: Arguments for the format string; the message is only formatted, if the category is logged
         """
-        try:
-            if self._level != 5:
-                CLASS[self._level].index(category)
-            st = strftime('%Y-%m-%d %H:%M:%S').ljust(17) + ' ' + string.zfill(category, 3) + ' ' + str(message) + '\n'
-            self._logfile.write(st)
-            self._logfile.flush()
+        if self._level != 5 and not self._enabled.has_key(category):
+            return      # this log message is not in the class for the given log level - just ignore it
+        if args:
+            message = message %(args)
+        if self._writer:
+            self._writer.put((time.time(), category, message))
+        else:
+            self._writeEntries([(time.time(), category, message)])
             
-            if self._syslogOn:
-                syslog.syslog(string.zfill(category, 3) + ' ' + str(message))
+    def _writeEntries(self, entries):
+        """
+        Writes log entries to the log file (and to syslog) in one go.
+        
+        @param entries: Time, category and message for each entry
+        @type entries: C{List} of C{Tuple} (C{float}, C{int}, C{String})
+        """
+        lines = []
+        for timestamp, category, message in entries:
+            lines.append(strftime('%Y-%m-%d %H:%M:%S', localtime(timestamp)).ljust(17) + ' ' + string.zfill(category, 3) + ' ' + _encodeMessage(message) + '\n')
+        self._logfile.write(''.join(lines))
+        self._logfile.flush()
+        
+        if self._syslogOn:
+            for timestamp, category, message in entries:
+                syslog.syslog(string.zfill(category, 3) + ' ' + _encodeMessage(message))
                 
-        except KeyError:
-            pass    # this log message is not in the class for the given log level - just ignore it
+    def getStatistics(self):
+        """
+        Assembles the metrics of the background writer.
+        
+        @return: Dictionary with the current statistics values (empty if messages are written synchronously)
+        @rtype: C{Dict}
+        """
+        if self._writer:
+            return self._writer.getStatistics()
+        return {}
         
     def getLatestMessages(self, n):
         """
@@ -144,6 +206,8 @@ class FileLogger:
         @rtype: C{List} of C{String}
         """
         from config import LOGGING_FILENAME, LOGGING_LEVEL
+        if self._writer:
+            self._writer.flush()
         logfile = open(LOGGING_FILENAME, 'r')
         lines = []
         s = logfile.readline().rstrip()
@@ -166,3 +230,162 @@ class FileLogger:
             i = (i+1) % n
             back.append(lines[i])
         return back
+
+
+def _encodeMessage(message):
+    """
+    Converts a log message into a byte string for writing - unicode messages are encoded in UTF-8.
+    """
+    if isinstance(message, unicode):
+        return message.encode('utf-8', 'replace')
+    return str(message)
+    
+
+class LogWriter:
+    """
+    Writes log entries in a background thread.
+    
+    Callers only append the entries to a bounded queue - without taking a lock (appending to a deque is atomic).
+    The writer thread takes all the entries queued every flush interval (or as soon as a batch is complete) and
+    passes them to the write function in one go. Entries are dropped if the queue is full; the number of entries
+    dropped is reported in the log once there is room again.
+    
+    @ivar _write: Function writing a list of entries
+    @type _write: C{Function}
+    @ivar _queue: Entries waiting to be written
+    @type _queue: C{collections.deque}
+    @ivar _wakeup: Set when a batch is complete or the writer shall terminate
+    @type _wakeup: C{threading.Event}
+    @ivar _writeLock: Lock for writing - the entries may be flushed by another thread than the writer thread
+    @type _writeLock: C{threading.Lock}
+    @ivar _failed: Number of entries, which could not be written
+    @type _failed: C{int}
+    """
+    
+    def __init__(self, write, maxSize = 10000, flushInterval = 1, batchSize = 100, name = 'logwriter'):
+        """
+        Initialises the empty queue and starts the writer thread.
+        
+        @param write: Function writing a list of entries
+        @type write: C{Function}
+        @param maxSize: Maximum number of entries queued
+        @type maxSize: C{int}
+        @param flushInterval: Seconds entries are kept in the queue at most
+        @type flushInterval: C{float}
+        @param batchSize: Number of entries queued for waking up the writer thread before the flush interval has passed
+        @type batchSize: C{int}
+        @param name: Name for the writer thread
+        @type name: C{String}
+        """
+        self._write = write
+        self._maxSize = maxSize
+        self._flushInterval = flushInterval
+        self._batchSize = batchSize
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._writeLock = threading.Lock()
+        self._dropLock = threading.Lock()
+        self._alive = 1
+        
+        self._written = 0
+        self._batches = 0
+        self._dropped = 0
+        self._droppedReported = 0
+        self._failed = 0
+        
+        self._thread = threading.Thread(target = self._run, name = name)
+        self._thread.setDaemon(1)
+        self._thread.start()
+        
+    def put(self, entry):
+        """
+        Queues an entry for writing.
+        
+        @param entry: Time, category and message
+        @type entry: C{Tuple} (C{float}, C{int}, C{String})
+        @return: Indicates, whether the entry was queued (1) or dropped, because the queue is full (0)
+        @rtype: C{int}
+        """
+        if len(self._queue) >= self._maxSize:
+            self._dropLock.acquire()
+            try:
+                self._dropped += 1
+            finally:
+                self._dropLock.release()
+            return 0
+        self._queue.append(entry)
+        if len(self._queue) >= self._batchSize and not self._wakeup.isSet():
+            self._wakeup.set()
+        return 1
+        
+    def _run(self):
+        """
+        Main loop of the writer thread.
+        """
+        while self._alive:
+            self._wakeup.wait(self._flushInterval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass        # nowhere to report this - but the writer must keep going
+        self.flush()
+            
+    def flush(self):
+        """
+        Writes all the entries queued.
+        """
+        self._writeLock.acquire()
+        try:
+            entries = []
+            queue = self._queue
+            while queue:
+                entries.append(queue.popleft())
+            if self._dropped > self._droppedReported:
+                entries.append((time.time(), LOGSERVER_STATUS, '%d log messages dropped - log queue full' 
+                    %(self._dropped - self._droppedReported)))
+                self._droppedReported = self._dropped
+            if not entries:
+                return
+            written = len(entries)
+            try:
+                self._write(entries)
+            except Exception:
+                # write the entries one by one - so only the broken ones are lost
+                for entry in entries:
+                    try:
+                        self._write([entry])
+                    except Exception:
+                        written -= 1
+                        self._failed += 1       # nowhere to report this
+            self._written += written
+            self._batches += 1
+        finally:
+            self._writeLock.release()
+            
+    def shutdown(self, timeout = 10):
+        """
+        Writes the entries queued and terminates the writer thread.
+        
+        @param timeout: Seconds to wait for the writer thread at most
+        @type timeout: C{float}
+        """
+        self._alive = 0
+        self._wakeup.set()
+        self._thread.join(timeout)
+        
+    def getStatistics(self):
+        """
+        Assembles the metrics of the writer.
+        
+        @return: Dictionary with the current statistics values
+        @rtype: C{Dict}
+        """
+        stats = {}
+        stats['size'] = len(self._queue)
+        stats['max_size'] = self._maxSize
+        stats['written'] = self._written
+        stats['batches'] = self._batches
+        stats['dropped'] = self._dropped
+        stats['failed'] = self._failed
+        return stats
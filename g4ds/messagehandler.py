@@ -83,7 +83,8 @@ class GlobalOutoingMessageHandler:
         
         In fact, the L{messagewrapper.MessageWrapper} is used for wrapping the given message
         into a valid G4DS control message. Afterwards, the message is passed on to the
-        function L{sendG4dsMessage} for final delivery.
+        function L{sendG4dsMessage} for final delivery. Members supporting envelopes of version 2
+        are sent the message using L{_sendEnvelope} instead.
         
         @param endpointid: Id of the Endpoint for this message. Passed to L{sendG4dsMessage}
         @type endpointid: C{String}
@@ -99,6 +100,11 @@ class GlobalOutoingMessageHandler:
         @return: Return value of L{sendG4dsMessage} - should be the message id of the sent message
         @rtype: C{String}
         """
+        from communicationmanager import getEndpointManager
+        from envelopecodec import getEnvelopeCodec
+        endpoint = getEndpointManager().getEndpoint(endpointid)
+        if getEnvelopeCodec().isSupported(endpoint.getMemberId()):
+            return self._sendEnvelope(endpoint, xmlconfig.g4ds_service_node, serviceid, servicename, message, refid)
         wrapped = getMessageWrapper().wrapServiceMessage(serviceid, servicename, message)
         return self.sendG4dsMessage(endpointid, wrapped, refid)
         
@@ -108,7 +114,8 @@ class GlobalOutoingMessageHandler:
         
         In fact, the L{messagewrapper.MessageWrapper} is used for wrapping the given message
         into a valid G4DS service message. Afterwards, the message is passed on to the
-        function L{sendG4dsMessage} for final delivery.
+        function L{sendG4dsMessage} for final delivery. Members supporting envelopes of version 2
+        are sent the message using L{_sendEnvelope} instead.
         
         @param endpointid: Id of the Endpoint for this message. Passed to L{sendG4dsMessage}
         @type endpointid: C{String}
@@ -123,6 +130,11 @@ class GlobalOutoingMessageHandler:
         @return: Return value of L{sendG4dsMessage} - should be the message id of the sent message
         @rtype: C{String}
         """
+        from communicationmanager import getEndpointManager
+        from envelopecodec import getEnvelopeCodec
+        endpoint = getEndpointManager().getEndpoint(endpointid)
+        if getEnvelopeCodec().isSupported(endpoint.getMemberId()):
+            return self._sendEnvelope(endpoint, xmlconfig.g4ds_control_node, subsystemid, subsystemname, message, refid)
         wrapped = getMessageWrapper().wrapControlMessage(subsystemid, subsystemname, message)
         return self.sendG4dsMessage(endpointid, wrapped, refid)
         
@@ -156,7 +168,8 @@ class GlobalOutoingMessageHandler:
         message, doc = getMessageWrapper().wrapG4dsPlain(message, mid, memberid, refid)
         
         message, tree, rootnode = self._handleSigningAndEncryption(message, endpoint)
-        xmltext, domtree = getMessageWrapper().wrapG4dsMessage(rootnode)
+        from envelopecodec import ENVELOPE_VERSION
+        xmltext, domtree = getMessageWrapper().wrapG4dsMessage(rootnode, ENVELOPE_VERSION)
         
         from routingcontroller import getRoutingEngine
 ##        import thread
@@ -165,6 +178,63 @@ class GlobalOutoingMessageHandler:
         getRoutingEngine().sendMessage(xmltext, endpoint)
         return mid
         
+    def _sendEnvelope(self, endpoint, kind, id, name, message, refid = None):
+        """
+        Assembles a G4DS message in an envelope of version 2 (see L{envelopecodec}) and sends it off.
+        
+        Signing, compression and encryption are applied once each to the whole message.
+        
+        @param endpoint: Endpoint instance holding all information required about the destination
+        @type endpoint: L{communicationmanager.Endpoint}
+        @param kind: Kind of message - name of the control or the service node (see L{xmlconfig})
+        @type kind: C{String}
+        @param id: ID of the control sub system or the service
+        @type id: C{String}
+        @param name: Name of the control sub system or the service
+        @type name: C{String}
+        @param message: The message itself
+        @type message: C{String}
+        @param refid: An id of a previous message which shall be referenced here
+        @type refid: C{String}
+        @return: ID of the message
+        @rtype: C{String}
+        """
+        from securitymanager import getCredentialManager
+        from sessionkeycontroller import getSessionKeyController
+        from envelopecodec import getEnvelopeCodec
+        from tools import generateId, TYPE_MESSAGE
+        from config import memberid
+        codec = getEnvelopeCodec()
+        credential = getCredentialManager().getCredential(endpoint.getCredentialId())
+        algName = getAlgorithmManager().getAlgorithm(credential.getAlgorithmId()).getName()
+        
+        mid = generateId(TYPE_MESSAGE)
+        fields = {}
+        fields[xmlconfig.g4ds_envelope_kind] = kind
+        fields[xmlconfig.g4ds_envelope_id] = id
+        fields[xmlconfig.g4ds_envelope_name] = name
+        fields[xmlconfig.g4ds_plain_messageid] = mid
+        fields[xmlconfig.g4ds_plain_senderid] = memberid
+        fields[xmlconfig.g4ds_plain_referenceid] = refid
+        fields[xmlconfig.g4ds_signature_algorithm] = algName
+        fields[xmlconfig.g4ds_signature_communityid] = endpoint.getCommunityId()
+        fields[xmlconfig.g4ds_signature_fingerprint] = getSecurityController().getFingerprint(algName)
+        fields[xmlconfig.g4ds_envelope_signature] = getSecurityController().signMessage(codec.getSignatureInput(fields, message), algName)
+        inner = codec.wrapInner(fields, message)
+        
+        sessionKeyController = getSessionKeyController()
+        if sessionKeyController.isCapable(endpoint.getMemberId()):
+            sessionKey, ciphered = sessionKeyController.encrypt(inner, credential, algName)
+        else:
+            import zlib
+            sessionKey = None
+            ciphered = getSecurityController().encrypt(zlib.compress(inner), credential.getKey(), algName)
+        xmltext = codec.wrapOuter(ciphered, algName, sessionKey, sessionKeyController.isEnabled())
+        
+        from routingcontroller import getRoutingEngine
+        getRoutingEngine().sendMessage(xmltext, endpoint)
+        return mid
+        
     def _handleSigningAndEncryption(self, message, endpoint):
         """
         Helper function for supporting the encryption of a message.
@@ -175,6 +245,10 @@ class GlobalOutoingMessageHandler:
         the message is passed on to the L{messagewrapper.MessageWrapper.wrapForEncryption} to make
         it a valid piece of encrypted information.
         
+        If the receiving member supports session keys, the message is encrypted symmetrically with
+        the session key for its credential instead (see L{sessionkeycontroller}); only the session key
+        is encrypted with the algorithm of the credential.
+        
         @param message: Message to be encrypted and wrapped
         @type message: C{String}
         @param endpoint: Endpoint instance holding all information required about the destination
@@ -187,10 +261,17 @@ class GlobalOutoingMessageHandler:
         from config import memberid
         communityid = endpoint.getCommunityId()
         signature = getSecurityController().signMessage(message, algName)  # let's just use the same algorithm as we used for encryption
-        sigXmlString, doc, node = getMessageWrapper().wrapForSigning(message, signature, algName, memberid, communityid)
-        
-        ciphered = getSecurityController().encrypt(sigXmlString, credential.getKey(), algName)
-        xmlString = getMessageWrapper().wrapForEncryption(ciphered, algName)
+        fingerprint = getSecurityController().getFingerprint(algName)
+        sigXmlString, doc, node = getMessageWrapper().wrapForSigning(message, signature, algName, memberid, communityid, fingerprint)
+        
+        from sessionkeycontroller import getSessionKeyController
+        sessionKeyController = getSessionKeyController()
+        if sessionKeyController.isCapable(endpoint.getMemberId()):
+            sessionKey, ciphered = sessionKeyController.encrypt(sigXmlString, credential, algName)
+        else:
+            sessionKey = None
+            ciphered = getSecurityController().encrypt(sigXmlString, credential.getKey(), algName)
+        xmlString = getMessageWrapper().wrapForEncryption(ciphered, algName, sessionKey, sessionKeyController.isEnabled())
         return xmlString
 
 # "singleton"
@@ -220,7 +301,7 @@ class GlobalDispatcher:
         """
         pass
 
-    def dispatch(self, protocol, message, inbackground = 1):
+    def dispatch(self, protocol, message, inbackground = 1, source = None):
         """
         Receives the raw messages from the protocol implementations and passes them
         somewhere depending on the type.
@@ -233,49 +314,92 @@ class GlobalDispatcher:
         L{g4dsconfigurationcontroller.ControlMessageDispatcher.dispatch} or to the 
         L{serviceintegrator.ServiceIntegrator.dispatch}.
         
+        Envelopes of version 2 (see L{envelopecodec}) are decrypted, validated and unwrapped in one go 
+        by L{_handleEnvelope} instead; the DOM tree of control messages is not available for them.
+        
+        Messages to be dispatched in background are processed by the L{dispatchpool.DispatchPool} - or 
+        in a new thread each, if no workers are configured (DISPATCH_WORKERS in L{config}).
+        
         @param protocol: Protocol as identified for the incoming message
         @type protocol: C{String}
         @param message: String representation of the XML message
         @type message: C{String}
+        @param inbackground: Indicates, whether the message shall be processed in background
+        @type inbackground: C{Boolean}
+        @param source: Address of the sending node (if known by the protocol) - messages are queued by it
+        @type source: C{String}
         """
         if inbackground:
-            import thread
-            thread.start_new_thread(self.dispatch,(protocol, message, 0))
+            import config
+            if not config.DISPATCH_WORKERS:
+                import thread
+                thread.start_new_thread(self.dispatch,(protocol, message, 0))
+                return
+            from dispatchpool import getDispatchPool
+            if not getDispatchPool().submit(self.dispatch, (protocol, message, 0), source or protocol):
+                from g4dslogging import getDefaultLogger, COMMUNICATION_INCOMING_ERROR
+                getDefaultLogger().newMessage(COMMUNICATION_INCOMING_ERROR, 'Global dispatching - overload: message from %s discarded' %(source or protocol))
             return
         
         from errorhandling import G4dsException
+        import time
+        from dispatchpool import getDispatchPool, STAGE_DECODE, STAGE_DELIVER
         try:
+            start = time.time()
             from g4dslogging import getDefaultLogger, COMMUNICATION_INCOMING_MSG, COMMUNICATION_INCOMING_MSG_DETAILS
             getDefaultLogger().newMessage(COMMUNICATION_INCOMING_MSG, 'New incoming message')
             firstmessage = message
-            message, rootnode = getMessageWrapper().unwrapG4dsMessage(message)
-            
-            message, senderidDec, communityid = self._handleDecryptionAndValidation(message, protocol)
-            
-            message, mid, senderid, refid = getMessageWrapper().unwrapG4dsPlain(message)
-            getDefaultLogger().newMessage(COMMUNICATION_INCOMING_MSG_DETAILS, '-- MSG ID %s | SENDER %s' %(mid, senderid))
-            getDefaultLogger().newMessage(COMMUNICATION_INCOMING_MSG_DETAILS, '-- Size of msg (brutto | netto): %d | %d Bytes' %(len(firstmessage), len(message)))
+            from envelopecodec import getEnvelopeCodec
+            version, envelopes = getEnvelopeCodec().getEnvelopeInfo(message)
+            childnode = None
+            if version >= 2:
+                fields, message = self._handleEnvelope(message, protocol)
+                kind = fields.get(xmlconfig.g4ds_envelope_kind)
+                id = fields.get(xmlconfig.g4ds_envelope_id)
+                name = fields.get(xmlconfig.g4ds_envelope_name)
+                data = message
+                mid = fields.get(xmlconfig.g4ds_plain_messageid)
+                senderid = fields.get(xmlconfig.g4ds_plain_senderid)
+                refid = fields.get(xmlconfig.g4ds_plain_referenceid)
+                communityid = fields.get(xmlconfig.g4ds_signature_communityid)
+            else:
+                message, rootnode = getMessageWrapper().unwrapG4dsMessage(message)
+                
+                message, senderidDec, communityid = self._handleDecryptionAndValidation(message, protocol)
+                if envelopes >= 2:
+                    getEnvelopeCodec().setSupported(senderidDec)
+                
+                message, mid, senderid, refid = getMessageWrapper().unwrapG4dsPlain(message)
+                
+                root = xml.dom.ext.reader.Sax2.FromXml(message)
+                kind = None
+                childnode = root.childNodes[1]
+                if childnode.nodeType == Node.ELEMENT_NODE:
+                    stio = StringIO()
+                    xml.dom.ext.PrettyPrint(childnode, stio)
+                    xmlSubTreeString = stio.getvalue()
+                    stio.close()
+                    
+                    kind = childnode.nodeName
+                    if kind == xmlconfig.g4ds_control_node:
+                        id, name, data = getMessageWrapper().unwrapControlMessage(xmlSubTreeString)
+                    elif kind == xmlconfig.g4ds_service_node:
+                        id, name, data = getMessageWrapper().unwrapServiceMessage(xmlSubTreeString)
+                        
+            getDefaultLogger().newMessage(COMMUNICATION_INCOMING_MSG_DETAILS, '-- MSG ID %s | SENDER %s', mid, senderid)
+            getDefaultLogger().newMessage(COMMUNICATION_INCOMING_MSG_DETAILS, '-- Size of msg (brutto | netto): %d | %d Bytes', len(firstmessage), len(message))
             getMessageContextController().addMessage(mid)
             getMessageContextController().addValue(mid, 'refid', refid)
             getMessageContextController().addValue(mid, 'senderid', senderid)
             getMessageContextController().addValue(mid, 'communityid', communityid)
             
-            root = xml.dom.ext.reader.Sax2.FromXml(message)
-    
-            childnode = root.childNodes[1]
-            if childnode.nodeType == Node.ELEMENT_NODE:
-                stio = StringIO()
-                xml.dom.ext.PrettyPrint(childnode, stio)
-                xmlSubTreeString = stio.getvalue()
-                stio.close()
-                
-                if childnode.nodeName == xmlconfig.g4ds_control_node:
-                    id, name, data = getMessageWrapper().unwrapControlMessage(xmlSubTreeString)
-                    getControlMessageDispatcher().dispatch(childnode, id, name, data, mid)
-                    
-                if childnode.nodeName == xmlconfig.g4ds_service_node:
-                    id, name, data = getMessageWrapper().unwrapServiceMessage(xmlSubTreeString)
-                    getServiceIntegrator().dispatch(id, name, data, mid)
+            decoded = time.time()
+            getDispatchPool().addLatency(STAGE_DECODE, decoded - start)
+            if kind == xmlconfig.g4ds_control_node:
+                getControlMessageDispatcher().dispatch(childnode, id, name, data, mid)
+            elif kind == xmlconfig.g4ds_service_node:
+                getServiceIntegrator().dispatch(id, name, data, mid)
+            getDispatchPool().addLatency(STAGE_DELIVER, time.time() - decoded)
         except G4dsException, msg:
             from g4dslogging import getDefaultLogger, COMMUNICATION_INCOMING_ERROR
             getDefaultLogger().newMessage(COMMUNICATION_INCOMING_ERROR, msg)
@@ -290,20 +414,85 @@ class GlobalDispatcher:
         The passed message is passed to the L{messagewrapper.MessageWrapper.unwrapForDecryption}
         for removing the encryption "header" and gaining the name of the algorithm and the 
         cipher text. Afterwards, the function decrypt in the securitycontroller is invoked
-        and the result is returned.
+        and the result is returned. Messages encrypted with a session key are decrypted by the
+        L{sessionkeycontroller.SessionKeyController} instead. Senders supporting session keys are 
+        registered as such, once the signature of their message was validated.
+        
+        The signature is checked with L{_validateSignature}.
         
         @return: Result of the L{securitycontroller.SecurityController.decrypt}
         @rtype: C{String}
         """
-        alg, data = getMessageWrapper().unwrapForDecryption(message)
-        data = getSecurityController().decrypt(data, alg)
-        algName, memberid, communityid, data, signature = getMessageWrapper().unwrapForValidation(data)
+        alg, data, sessionKey, sessionKeysSupported = getMessageWrapper().unwrapForDecryption(message, 1)
+        from sessionkeycontroller import getSessionKeyController
+        if sessionKey:
+            data = getSessionKeyController().decrypt(data, sessionKey, alg)
+        else:
+            data = getSecurityController().decrypt(data, alg)
+        algName, memberid, communityid, data, signature, fingerprint = getMessageWrapper().unwrapForValidation(data, 1)
+        self._validateSignature(data, signature, algName, memberid, communityid, fingerprint, protocolname, 
+            sessionKeysSupported or sessionKey)
+        return data, memberid, communityid
+        
+    def _handleEnvelope(self, message, protocolname):
+        """
+        Helper function for decrypting and validating envelopes of version 2 (see L{envelopecodec}).
+        
+        The inner document is compressed before encryption - unless it was encrypted with a session key
+        (the L{sessionkeycontroller.SessionKeyController} takes care of compression itself).
         
+        @return: Header fields of the inner document (by attribute name) and the payload
+        @rtype: C{Dict}; C{String}
+        """
+        from envelopecodec import getEnvelopeCodec
+        from sessionkeycontroller import getSessionKeyController
+        codec = getEnvelopeCodec()
+        alg, data, sessionKey, sessionKeysSupported = codec.unwrapOuter(message)
+        if sessionKey:
+            inner = getSessionKeyController().decrypt(data, sessionKey, alg)
+        else:
+            import zlib
+            inner = zlib.decompress(getSecurityController().decrypt(data, alg))
+        fields, payload = codec.unwrapInner(inner)
+        
+        memberid = fields.get(xmlconfig.g4ds_plain_senderid)
+        self._validateSignature(codec.getSignatureInput(fields, payload), fields.get(xmlconfig.g4ds_envelope_signature), 
+            fields.get(xmlconfig.g4ds_signature_algorithm), memberid, fields.get(xmlconfig.g4ds_signature_communityid), 
+            fields.get(xmlconfig.g4ds_signature_fingerprint), protocolname, sessionKeysSupported or sessionKey)
+        codec.setSupported(memberid)
+        return fields, payload
+        
+    def _validateSignature(self, data, signature, algName, memberid, communityid, fingerprint, protocolname, sessionKeysSupported = 0):
+        """
+        Validates the signature of an incoming message; an exception is raised if not valid.
+        
+        If the fingerprint of the key of the sender is given, the credential for validation is looked up 
+        directly by it (see L{securitymanager.CredentialManager.getCredentialByFingerprint}); otherwise, the 
+        credential is determined using the endpoints or the credentials of the sender.
+        
+        Senders supporting session keys are registered as such, once the signature was validated.
+        """
+        if not data or not signature or not algName or not memberid:
+            from errorhandling import G4dsCommunicationException
+            raise G4dsCommunicationException('Incomplete signature information in the incoming message.')
+        from sessionkeycontroller import getSessionKeyController
         from communicationmanager import getEndpointManager
         from errorhandling import G4dsDependencyException, G4dsCommunicationException
         from g4dslogging import getDefaultLogger, COMMUNICATION_INCOMING_NO_ENDPOINT
         from securitymanager import getCredentialManager, getAlgorithmManager
 
+        # the sender tells us about the key it signed with - one lookup and one validation only
+        if fingerprint:
+            credential = getCredentialManager().getCredentialByFingerprint(fingerprint)
+            if credential and credential.getOwnerId() == memberid and \
+                    getAlgorithmManager().getAlgorithm(credential.getAlgorithmId()).getName() == algName:
+                if not getSecurityController().validate(data, signature, credential.getKey(), algName):
+                    raise G4dsCommunicationException('Signature not valid for this message.')
+                if sessionKeysSupported:
+                    getSessionKeyController().setCapable(memberid)
+                return
+            # unknown fingerprint - carry on with the search for the credential below
+
         try:
             endpoint = getEndpointManager().findEndpoint(memberid, communityid, protocolname, algName)
             credential = getCredentialManager().getCredential(endpoint.getCredentialId())
@@ -314,7 +503,9 @@ class GlobalDispatcher:
             
             if not getSecurityController().validate(data, signature, key, algName):
                 raise G4dsCommunicationException('Signature not valid for this message.')
-            return data, memberid, communityid
+            if sessionKeysSupported:
+                getSessionKeyController().setCapable(memberid)
+            return
         except G4dsDependencyException, msg:
             getDefaultLogger().newMessage(COMMUNICATION_INCOMING_NO_ENDPOINT, 'Src Enpoint Detemination: %s - attempt key determination' %(msg))
             # we have to carry on here - if the message is routed; the end-to-end message integrity must still be ensured; however - both members are not in the 
@@ -326,12 +517,18 @@ class GlobalDispatcher:
                 if getAlgorithmManager().getAlgorithm(cred.getAlgorithmId()).getName() == algName:
                     key = cred.getKey()
                     if getSecurityController().validate(data, signature, key, algName):
-                        return data, memberid, communityid
+                        if sessionKeysSupported:
+                            getSessionKeyController().setCapable(memberid)
+                        return
             # ohoh - looks like this message is not valied :(
             getDefaultLogger().newMessage(COMMUNICATION_INCOMING_NO_ENDPOINT, 'Src Enpoint Detemination: manual key search not sucessful.')
             raise G4dsCommunicationException('Signature not valid for the incoming message.')
         
 
+# estimated memory (in bytes) for each message context (dictionary, list and order entry) and each value in it
+CONTEXT_OVERHEAD = 400
+VALUE_OVERHEAD = 80
+
 # "singleton"
 _messageContextController = None
 def getMessageContextController():
@@ -354,20 +551,81 @@ class MessageContextController:
     avoid passing this information from one function to another, a message context may be created for this
     message. The key is always the message id - this way, only the message id needs to be passed and all
     remaining information may be accessed using the id.
+    
+    Contexts are hardly ever deleted explicitly (replies may refer to the incoming message any time later);
+    hence, the store is bounded in size and age: contexts older than the life time are dropped, and the
+    oldest contexts are dropped once the maximum number of contexts is exceeded. Contexts are dropped in 
+    the order they were created - this way, no scan over the whole store is ever required.
+    
+    @ivar _messages: Creation time and context (dictionary of values) by message id
+    @type _messages: C{Dict} (C{String} | C{List} [C{float}, C{Dict}])
+    @ivar _order: Creation time and message id of the contexts in the order of creation
+    @type _order: C{collections.deque} of C{Tuple} (C{float}, C{String})
     """
-    def __init__(self):
+    def __init__(self, maxSize = None, lifetime = None):
         """
         Initialises the dictionary for messages.
+        
+        @param maxSize: Maximum number of contexts kept (default from the config module)
+        @type maxSize: C{int}
+        @param lifetime: Number of seconds a context is kept at most (default from the config module)
+        @type lifetime: C{int}
         """
+        import config
+        import threading
+        from collections import deque
+        if maxSize is None:
+            maxSize = config.MESSAGE_CONTEXT_MAX_SIZE
+        if lifetime is None:
+            lifetime = config.MESSAGE_CONTEXT_LIFETIME
+        self._maxSize = maxSize
+        self._lifetime = lifetime
         self._messages = {}
+        self._order = deque()
+        self._lock = threading.Lock()
+        self._evictions = 0
+        self._expirations = 0
+        
+    def _purge(self, now):
+        """
+        Drops expired contexts and the oldest contexts beyond the maximum size.
+        
+        Must be called with the lock held. Entries of the order for contexts deleted or replaced in the 
+        meantime are skipped.
+        """
+        while self._order:
+            created, messageid = self._order[0]
+            entry = self._messages.get(messageid)
+            if entry is None or entry[0] != created:
+                self._order.popleft()
+                continue
+            if now - created > self._lifetime:
+                self._expirations += 1
+            elif len(self._messages) > self._maxSize:
+                self._evictions += 1
+            else:
+                break
+            self._order.popleft()
+            del self._messages[messageid]
         
     def addMessage(self, messageid):
         """
         Initialises a new context for a certain message.
+        
+        Expired contexts (and the oldest ones, if the store is full) are dropped on the way.
         """
-        self._messages[messageid] = {}
-        self._messages[messageid]['senderid'] = None
-        self._messages[messageid]['refid'] = None
+        import time
+        now = time.time()
+        context = {}
+        context['senderid'] = None
+        context['refid'] = None
+        self._lock.acquire()
+        try:
+            self._messages[messageid] = [now, context]
+            self._order.append((now, messageid))
+            self._purge(now)
+        finally:
+            self._lock.release()
         
     def addValue(self, messageid, key, value):
         """
@@ -380,7 +638,7 @@ class MessageContextController:
         @param value: The value to be stored in the context for this message behind the given key
         @type value: any
         """
-        self._messages[messageid][key] = value
+        self._messages[messageid][1][key] = value
         
     def getValue(self, messageid, key):
         """
@@ -393,9 +651,10 @@ class MessageContextController:
         @return: The value behind the key
         @rtype: any
         
-        @note: If there is no value behind the given key, an KeyError will be produced.
+        @note: If there is no value behind the given key (or the context has been dropped already), 
+            an KeyError will be produced.
         """
-        return self._messages[messageid][key]
+        return self._messages[messageid][1][key]
         
     def deleteMessage(self, messageid):
         """
@@ -404,4 +663,38 @@ class MessageContextController:
         @param messageid: ID of the message in the first place.
         @type messageid: C{String}
         """
-        del self._messages[messageid]
+        self._lock.acquire()
+        try:
+            del self._messages[messageid]
+        finally:
+            self._lock.release()
+            
+    def getStatistics(self):
+        """
+        Assembles the metrics of the store.
+        
+        The memory estimate sums up the lengths of the message ids and the string values plus a fixed 
+        overhead (L{CONTEXT_OVERHEAD}) for each context and each value.
+        
+        @return: Dictionary with the current statistics values
+        @rtype: C{Dict}
+        """
+        self._lock.acquire()
+        try:
+            memory = 0
+            for messageid, entry in self._messages.items():
+                memory += CONTEXT_OVERHEAD + len(messageid)
+                for key, value in entry[1].items():
+                    memory += VALUE_OVERHEAD + len(key)
+                    if type(value) in (type(''), type(u'')):
+                        memory += len(value)
+            stats = {}
+            stats['size'] = len(self._messages)
+            stats['max_size'] = self._maxSize
+            stats['lifetime'] = self._lifetime
+            stats['evictions'] = self._evictions
+            stats['expirations'] = self._expirations
+            stats['memory_estimate'] = memory
+            return stats
+        finally:
+            self._lock.release()
@@ -347,17 +347,21 @@ class MessageWrapper(GenericWrapper):
         """
         pass
         
-    def wrapG4dsMessage(self, node):
+    def wrapG4dsMessage(self, node, envelopes = None):
         """
         Creates a new XML document, which is a valid G4DS message, containing the data given by node.
         
         @param node: Content of the XML document to be appended underneath the G4DS root element.
         @type node: L{xml.dom.Node}
+        @param envelopes: Highest version of envelopes the sender is able to receive (see L{envelopecodec}) - optional
+        @type envelopes: C{int}
         @return: XML String containing the G4DS message, and the XML DOM document
         @rtype: C{String}; L{xml.dom.Document}
         """
         impl = xml.dom.getDOMImplementation()
         doc = impl.createDocument("", xmlconfig.g4ds_root_node, None)
+        if envelopes:
+            doc.documentElement.setAttribute(xmlconfig.g4ds_envelope_versions, str(envelopes))
         
         copy = node.cloneNode(1)
         doc.documentElement.appendChild(copy)
@@ -633,7 +637,7 @@ class MessageWrapper(GenericWrapper):
         data = self._decodeHex(data)       # data = self._unReplaceCdata(data)
         return id, name, data
         
-    def wrapForEncryption(self, message, algName):
+    def wrapForEncryption(self, message, algName, sessionKey = None, sessionKeysSupported = 0):
         """
         Wraps an encrypted message chunk into a valid XML node.
         
@@ -642,10 +646,17 @@ class MessageWrapper(GenericWrapper):
         choose the appropriate algorithm on its side. The cipher text itself (given as L{message}) 
         is stored into a CDATA section.
         
+        If the message was encrypted with a session key (see L{sessionkeycontroller}), the session key 
+        (encrypted with the given algorithm) is put into the node as well.
+        
         @param message: Cipher text to be wrapped into a encrypted G4DS field
         @type message: C{String}
         @param algName: Name of the encryption algorithm to be used for decryption
         @type algName: C{String}
+        @param sessionKey: Encrypted session key the message was encrypted with (None if encrypted with the algorithm directly)
+        @type sessionKey: C{String}
+        @param sessionKeysSupported: Indicates, whether the sender supports session keys for incoming messages
+        @type sessionKeysSupported: C{Boolean}
         @return: The result as String and as Dom tree and as root element of the dom tree
         @rtype: C{String}; L{xml.dom.Document}; L{xml.dom.Element}
         """
@@ -653,11 +664,19 @@ class MessageWrapper(GenericWrapper):
         
         impl = xml.dom.getDOMImplementation()
         doc = impl.createDocument("",xmlconfig.g4ds_encryption_node, None)      # namespace, root element name, ???
+        if sessionKeysSupported:
+            doc.documentElement.setAttribute(xmlconfig.g4ds_encryption_sessionkeys_supported, '1')
         elementAlg = doc.createElement(xmlconfig.g4ds_encryption_algorithm)
         doc.documentElement.appendChild(elementAlg)
         algValue = doc.createTextNode(algName)
         elementAlg.appendChild(algValue)
         
+        if sessionKey:
+            elementKey = doc.createElement(xmlconfig.g4ds_encryption_sessionkey)
+            doc.documentElement.appendChild(elementKey)
+            keyValue = doc.createTextNode(self._encodeHex(sessionKey, 0))
+            elementKey.appendChild(keyValue)
+        
         elementData = doc.createElement(xmlconfig.g4ds_encryption_data)
         doc.documentElement.appendChild(elementData)
         cdata = doc.createCDATASection(message)
@@ -670,7 +689,7 @@ class MessageWrapper(GenericWrapper):
         return value, doc, doc.documentElement
         
     
-    def unwrapForDecryption(self, message):
+    def unwrapForDecryption(self, message, withSessionInfo = 0):
         """
         Extracts the cipher text and the name of the algorithm from an encrypted G4DS message chunk.
         
@@ -681,16 +700,23 @@ class MessageWrapper(GenericWrapper):
         is gained.
         @param message: XML String of the G4DS encrypted message chunk
         @type message: C{String}
-        @return: Name of the algorithm and the cipher text
-        @rtype: C{String}; C{String}
+        @param withSessionInfo: Return the encrypted session key and the session key support flag of the sender as well
+        @type withSessionInfo: C{Boolean}
+        @return: Name of the algorithm and the cipher text (and the encrypted session key - None if not given - and
+            the flag, whether the sender supports session keys)
+        @rtype: C{String}; C{String} (; C{String}; C{Boolean})
         """
         root = xml.dom.ext.reader.Sax2.FromXml(message)
         node = root.childNodes[1]
         if node.nodeName != xmlconfig.g4ds_encryption_node:
+            if withSessionInfo:
+                return None, None, None, 0
             return None, None                 # that's not an encrypted
         
         alg = None
         data = None
+        sessionKey = None
+        supported = node.getAttribute(xmlconfig.g4ds_encryption_sessionkeys_supported) == '1'
         for node in node.childNodes:   # 2 child nodes should be given - 1 the algorithm; 2 the encrypted data
             if node.nodeType == Node.ELEMENT_NODE:
                 if node.nodeName == xmlconfig.g4ds_encryption_algorithm:
@@ -701,15 +727,23 @@ class MessageWrapper(GenericWrapper):
                     for child in node.childNodes:
                         if child.nodeType == Node.CDATA_SECTION_NODE:
                             data = child.nodeValue
+                elif node.nodeName == xmlconfig.g4ds_encryption_sessionkey:
+                    for child in node.childNodes:
+                        if child.nodeType == Node.TEXT_NODE:
+                            sessionKey = self._decodeHex(child.nodeValue.strip(), 0)
         
         if not alg or not data:
+            if withSessionInfo:
+                return None, None, None, 0
             return None, None
         data = self._decodeHex(data)       # data = self._unReplaceCdata(data)
+        if withSessionInfo:
+            return alg, data, sessionKey, supported
         return alg, data
 
         
 
-    def wrapForSigning(self, message, signature, algName, senderid, communityid):
+    def wrapForSigning(self, message, signature, algName, senderid, communityid, fingerprint = None):
         """
         Wraps the message together with the signature into a signed G4DS message chunk.
 
@@ -723,6 +757,9 @@ class MessageWrapper(GenericWrapper):
         @type senderid: C{String}
         @param communityid: G4DS unique id of the community
         @type communityid: C{String}
+        @param fingerprint: Fingerprint of the public key of the sender (see L{tools.getKeyFingerprint}) - the receiver
+            may look up the credential for validation directly with it (optional)
+        @type fingerprint: C{String}
         @return: The result as String and as Dom tree and as root element of the dom tree
         @rtype: C{String}; L{xml.dom.Document}; L{xml.dom.Element}
         """
@@ -745,6 +782,12 @@ class MessageWrapper(GenericWrapper):
         communityValue = doc.createTextNode(communityid)
         elementCommunity.appendChild(communityValue)
 
+        if fingerprint:
+            elementFingerprint = doc.createElement(xmlconfig.g4ds_signature_fingerprint)
+            doc.documentElement.appendChild(elementFingerprint)
+            fingerprintValue = doc.createTextNode(fingerprint)
+            elementFingerprint.appendChild(fingerprintValue)
+
         elementData = doc.createElement(xmlconfig.g4ds_signature_data)
         doc.documentElement.appendChild(elementData)
         cdata = doc.createCDATASection(message)
@@ -761,7 +804,7 @@ class MessageWrapper(GenericWrapper):
         stio.close()
         return value, doc, doc.documentElement
 
-    def unwrapForValidation(self, message):
+    def unwrapForValidation(self, message, withFingerprint = 0):
         """
         Extracts the message, the signature and the name of the algorithm from a G4DS signature message chunk.
         
@@ -769,19 +812,25 @@ class MessageWrapper(GenericWrapper):
 
         @param message: XML String of the G4DS signed message chunk
         @type message: C{String}
+        @param withFingerprint: Return the fingerprint of the key of the sender as well
+        @type withFingerprint: C{Boolean}
         @return: Name of the algorithm, unique id of the sender, unique id of the community, the message and the signature
-        @rtype: C{String}; C{String}; C{String}; C{String}; C{String}
+            (and the fingerprint - None if not given)
+        @rtype: C{String}; C{String}; C{String}; C{String}; C{String} (; C{String})
         """
         root = xml.dom.ext.reader.Sax2.FromXml(message)
         node1 = root.childNodes[1]
         if node1.nodeName != xmlconfig.g4ds_signature_node:
-            return None, None, None, None         # this is not an signed message chunk
+            if withFingerprint:
+                return None, None, None, None, None, None
+            return None, None, None, None, None         # this is not an signed message chunk
             
         alg = None
         senderid = None
         communityid = None
         data = None
         signature = None
+        fingerprint = None
         for node in node1.childNodes:
             if node.nodeType == Node.ELEMENT_NODE:
                 if node.nodeName == xmlconfig.g4ds_signature_algorithm:
@@ -796,6 +845,10 @@ class MessageWrapper(GenericWrapper):
                     for child in node.childNodes:
                         if child.nodeType == Node.TEXT_NODE:
                             communityid = child.nodeValue
+                elif node.nodeName == xmlconfig.g4ds_signature_fingerprint:
+                    for child in node.childNodes:
+                        if child.nodeType == Node.TEXT_NODE:
+                            fingerprint = child.nodeValue
                 elif node.nodeName == xmlconfig.g4ds_signature_data:
                     for child in node.childNodes:
                         if child.nodeType == Node.CDATA_SECTION_NODE:
@@ -805,8 +858,12 @@ class MessageWrapper(GenericWrapper):
                         if child.nodeType == Node.CDATA_SECTION_NODE:
                             signature = child.nodeValue
         if not alg or not senderid or not communityid or not data or not signature:
+            if withFingerprint:
+                return None, None, None, None, None, None
             return None, None, None, None, None
         data = self._decodeHex(data)       # data = self._unReplaceCdata(data)
+        if withFingerprint:
+            return alg, senderid, communityid, data, signature, fingerprint
         return alg, senderid, communityid, data, signature
 
 # "singleton"
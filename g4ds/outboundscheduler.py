@@ -0,0 +1,311 @@
+"""
+Asynchronous delivery of outgoing G4DS messages.
+
+Grid for Digital Security (G4DS)
+
+The routing engine used to send each message on the thread of the caller; broadcasting a message
+to a community took the sum of the times for all the members. Instead, messages for direct delivery
+are put into a queue for their endpoint (protocol and address) now; a number of worker threads
+(see OUTBOUND_WORKERS in L{config}) drains the queues - the endpoints are served in parallel,
+whilst the messages for one endpoint are still sent in order by one worker at a time.
+
+Small messages waiting for the same endpoint are coalesced - they are passed to the protocol in one
+go (see L{protocols.protocolinterface.ProtocolInterface.sendMessages}), which may put them into one
+transport write.
+
+If sending fails, the messages are put back into the queue and the endpoint is retried after a delay,
+which doubles with each attempt; messages are dropped after OUTBOUND_RETRIES attempts. A message may
+be delivered twice if the connection broke in the middle of sending.
+
+@author: Michael Pilgermann
+@contact: mailto:mpilgerm@glam.ac.uk
+@license: GPL (General Public License)
+
+@var _outboundScheduler: Singleton - the only instance ever of the OutboundScheduler class
+@type _outboundScheduler: L{OutboundScheduler}
+"""
+
+import threading
+import time
+from collections import deque
+
+# "singleton"
+_outboundScheduler = None
+def getOutboundScheduler():
+    """
+    Singleton implementation.
+
+    The settings for the scheduler are taken from the config module.
+
+    @return: The instance for the outbound scheduler
+    @rtype: L{OutboundScheduler}
+    """
+    global _outboundScheduler
+    if not _outboundScheduler:
+        import config
+        _outboundScheduler = OutboundScheduler(config.OUTBOUND_WORKERS, config.OUTBOUND_QUEUE_SIZE,
+            config.OUTBOUND_BATCH_SIZE, config.OUTBOUND_BATCH_BYTES, config.OUTBOUND_RETRIES,
+            config.OUTBOUND_RETRY_DELAY, config.OUTBOUND_RETRY_MAX_DELAY)
+    return _outboundScheduler
+
+class OutboundScheduler:
+    """
+    Queues per endpoint drained by a fixed number of worker threads.
+
+    Endpoints are identified by the tuple of protocol name and address.
+
+    @ivar _queues: Messages waiting by endpoint - each one as list of [message, number of failed attempts]
+    @type _queues: C{Dict} (C{Tuple} | C{collections.deque} of C{List})
+    @ivar _ready: Endpoints with messages waiting, which are neither being served nor waiting for a retry
+    @type _ready: C{collections.deque} of C{Tuple}
+    @ivar _scheduled: Endpoints in the ready queue, being served or waiting for a retry
+    @type _scheduled: C{Dict}
+    @ivar _delayed: Time of the next attempt by endpoint (for endpoints waiting for a retry)
+    @type _delayed: C{Dict} (C{Tuple} | C{float})
+    """
+
+    def __init__(self, workers = 8, maxSize = 1000, batchSize = 16, batchBytes = 65536, retries = 5,
+                    retryDelay = 1, retryMaxDelay = 60):
+        """
+        Initialises the empty queues and the statistics; the workers are started with the first message.
+
+        @param workers: Number of worker threads
+        @type workers: C{int}
+        @param maxSize: Maximum number of messages waiting for one endpoint
+        @type maxSize: C{int}
+        @param batchSize: Maximum number of messages passed to the protocol in one go
+        @type batchSize: C{int}
+        @param batchBytes: Messages are only added to a batch as long as it is smaller than this number of bytes
+        @type batchBytes: C{int}
+        @param retries: Number of attempts for sending a message
+        @type retries: C{int}
+        @param retryDelay: Seconds to wait before the first retry
+        @type retryDelay: C{float}
+        @param retryMaxDelay: Maximum number of seconds to wait before a retry
+        @type retryMaxDelay: C{float}
+        """
+        self._workers = workers
+        self._maxSize = maxSize
+        self._batchSize = batchSize
+        self._batchBytes = batchBytes
+        self._retries = retries
+        self._retryDelay = retryDelay
+        self._retryMaxDelay = retryMaxDelay
+        self._queues = {}
+        self._ready = deque()
+        self._scheduled = {}
+        self._delayed = {}
+        self._condition = threading.Condition()
+        self._threads = []
+        self._alive = 1
+
+        self._enqueued = 0
+        self._sent = 0
+        self._batches = 0
+        self._retried = 0
+        self._dropped = 0
+
+    def enqueue(self, protocolname, address, message):
+        """
+        Queues a message for delivery to the given endpoint.
+
+        @param protocolname: Name of the protocol to be used
+        @type protocolname: C{String}
+        @param address: Address of the endpoint (in the format of the protocol)
+        @type address: C{String}
+        @param message: The message to be sent
+        @type message: C{String}
+        @return: Indicates, whether the message was queued (1) or dropped, because the queue for the endpoint is full (0)
+        @rtype: C{int}
+        """
+        key = (protocolname, address)
+        self._condition.acquire()
+        try:
+            if not self._alive:
+                self._dropped += 1
+                return 0
+            if not self._threads:
+                self._startWorkers()
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = deque()
+            if len(queue) >= self._maxSize:
+                self._dropped += 1
+                return 0
+            queue.append([message, 0])
+            self._enqueued += 1
+            if not self._scheduled.has_key(key):
+                self._scheduled[key] = 1
+                self._ready.append(key)
+                self._condition.notify()
+            return 1
+        finally:
+            self._condition.release()
+
+    def _startWorkers(self):
+        """
+        Starts the worker threads.
+
+        The caller must hold the condition.
+        """
+        for i in range(self._workers):
+            worker = threading.Thread(target = self._work, name = 'g4ds-outbound-%d' %(i))
+            worker.setDaemon(1)
+            worker.start()
+            self._threads.append(worker)
+
+    def _next(self):
+        """
+        Takes the next batch of messages for the next endpoint ready; blocks until there is one.
+
+        Endpoints waiting for a retry become ready again once their delay has elapsed.
+
+        @return: Endpoint and the batch of message entries - or None, None if shut down and nothing is left to send
+        @rtype: C{Tuple}; C{List} of C{List}
+        """
+        self._condition.acquire()
+        try:
+            while 1:
+                now = time.time()
+                wait = None
+                for key, due in self._delayed.items():
+                    if due <= now or not self._alive:
+                        del self._delayed[key]
+                        self._ready.append(key)
+                    elif wait is None or due - now < wait:
+                        wait = due - now
+                if self._ready:
+                    break
+                if not self._alive:
+                    return None, None
+                self._condition.wait(wait)
+
+            key = self._ready.popleft()
+            queue = self._queues[key]
+            batch = [queue.popleft()]
+            size = len(batch[0][0])
+            while queue and len(batch) < self._batchSize and size + len(queue[0][0]) <= self._batchBytes:
+                entry = queue.popleft()
+                batch.append(entry)
+                size += len(entry[0])
+            return key, batch
+        finally:
+            self._condition.release()
+
+    def _work(self):
+        """
+        Main loop of the worker threads.
+        """
+        while 1:
+            key, batch = self._next()
+            if key is None:
+                return
+            try:
+                self._send(key, batch)
+                failure = None
+            except Exception, msg:
+                failure = msg
+            self._finish(key, batch, failure)
+
+    def _send(self, key, batch):
+        """
+        Passes the batch of messages to the protocol.
+        """
+        from protocolcontroller import getProtocolController
+        protocolname, address = key
+        protocol = getProtocolController().getOpenProtocol(protocolname)
+        messages = []
+        for message, attempts in batch:
+            messages.append(message)
+        protocol.sendMessages(address, messages)
+
+    def _finish(self, key, batch, failure):
+        """
+        Updates the queue of the endpoint after an attempt to send a batch.
+
+        After a failure, the messages go back to the front of the queue and the endpoint is retried
+        after a delay; messages are dropped once they have been tried too often.
+        """
+        dropped = 0
+        self._condition.acquire()
+        try:
+            queue = self._queues[key]
+            if failure is None:
+                self._sent += len(batch)
+                self._batches += 1
+                attempts = 0
+            else:
+                attempts = 0
+                for entry in batch:
+                    entry[1] += 1
+                    attempts = max(attempts, entry[1])
+                batch.reverse()
+                for entry in batch:
+                    if entry[1] < self._retries:
+                        queue.appendleft(entry)
+                        self._retried += 1
+                    else:
+                        dropped += 1
+                self._dropped += dropped
+            if not queue:
+                del self._queues[key]
+                del self._scheduled[key]
+            elif failure is None or not queue[0][1]:
+                self._ready.append(key)
+            else:
+                delay = min(self._retryDelay * 2 ** (attempts - 1), self._retryMaxDelay)
+                self._delayed[key] = time.time() + delay
+            self._condition.notify()
+        finally:
+            self._condition.release()
+
+        if failure is not None:
+            from g4dslogging import getDefaultLogger, COMMUNICATION_OUTGOING_ERROR
+            getDefaultLogger().newMessage(COMMUNICATION_OUTGOING_ERROR, 'Sending message to %s (%s) failed - %d message(s) dropped: %s'
+                %(key[1], key[0], dropped, failure))
+
+    def shutdown(self, timeout = 10):
+        """
+        Stops accepting messages; the workers try to send the messages queued already and terminate.
+
+        Endpoints waiting for a retry are tried once more immediately.
+
+        @param timeout: Seconds to wait for each worker at most
+        @type timeout: C{float}
+        """
+        self._condition.acquire()
+        try:
+            self._alive = 0
+            self._retries = 0
+            self._condition.notifyAll()
+            threads = self._threads
+        finally:
+            self._condition.release()
+        for worker in threads:
+            worker.join(timeout)
+
+    def getStatistics(self):
+        """
+        Assembles the metrics of the scheduler.
+
+        @return: Dictionary with the current statistics values
+        @rtype: C{Dict}
+        """
+        self._condition.acquire()
+        try:
+            waiting = 0
+            for queue in self._queues.values():
+                waiting += len(queue)
+            stats = {}
+            stats['workers'] = self._workers
+            stats['endpoints'] = len(self._queues)
+            stats['endpoints_delayed'] = len(self._delayed)
+            stats['size'] = waiting
+            stats['enqueued'] = self._enqueued
+            stats['sent'] = self._sent
+            stats['batches'] = self._batches
+            stats['retried'] = self._retried
+            stats['dropped'] = self._dropped
+            return stats
+        finally:
+            self._condition.release()
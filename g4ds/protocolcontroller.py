@@ -134,7 +134,7 @@ class Dispatcher:
         """
         pass
         
-    def dispatch(self, protocol, message):
+    def dispatch(self, protocol, message, source = None):
         """
         Passes messages to the GlobalDispatcher in the messagehandler module.
         
@@ -142,7 +142,9 @@ class Dispatcher:
         @type protocol: C{String}
         @param message: Message itself
         @type message: C{String}
+        @param source: Address of the sending node - None if not known by the protocol
+        @type source: C{String}
         """
         from messagehandler import getGlobalDispatcher
 
-        getGlobalDispatcher().dispatch(protocol, message)
+        getGlobalDispatcher().dispatch(protocol, message, source = source)
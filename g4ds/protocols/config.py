@@ -35,11 +35,21 @@ default_protocol = 'soap'
 # Settings for SOAP protocol
 ##soap_local_address  = local_address         # put DNS name or IP address of the local machine to be used for SOAP here
 ##soap_local_port = 8080                       # port to listen on for SOAP connections
+soap_threaded_server = 1        # handle each incoming connection in a thread of its own
+soap_keepalive = 1              # keep HTTP connections open between messages (the listener supports it in threaded mode only)
+soap_keepalive_timeout = 120    # seconds, after which the listener closes an idle connection
+soap_pool_size = 4              # maximum number of idle proxies kept per endpoint
 
 
 # Settings for TCP sockets
 ##tcp_local_address = local_address
 ##tcp_local_port = 2000
+tcp_framing = 0                 # 1 - keep connections open and send length prefixed frames; 0 - one connection per message
+                                # only switch on, once all peers understand framing - listeners of older nodes cannot read it
+tcp_pool_size = 4               # maximum number of idle connections kept open per endpoint (framing only)
+tcp_idle_timeout = 120          # seconds, after which an idle connection is not reused anymore (the listener waits twice as long)
+tcp_receive_buffer = 65536      # number of bytes read from a connection at once
+tcp_listen_backlog = 16         # number of pending connections for the listening socket
 
 
 
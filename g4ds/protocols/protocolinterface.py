@@ -39,6 +39,9 @@ class ProtocolInterface:
         Any implementation must run its listener in its own thread, otherwise it
         will block the entire application / library.
         
+        The callback takes the name of the protocol, the message and (optionally) the address of
+        the sending node as parameters.
+        
         @param callback: Function to call whenever a new message arrives
         @type callback: Function
         @return: Indicates, whether the server was established sucessfully
@@ -64,3 +67,20 @@ class ProtocolInterface:
         """
         return 0
         
+    
+    def sendMessages(self, endpoint, messages):
+        """
+        Sends several messages to the endpoint in the given order.
+        
+        The messages are sent one by one per default; implementations may override this function for
+        putting them into one transport write.
+        
+        @param messages: The messages to be sent
+        @type messages: C{List} of C{String}
+        @return: Indicates, whether the messages were send sucessfully
+        @rtype: C{Boolean}
+        """
+        for message in messages:
+            if not self.sendMessage(endpoint, message):
+                return 0
+        return 1
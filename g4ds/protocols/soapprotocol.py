@@ -6,6 +6,10 @@ Grid for Digital Security (G4DS)
 Just plain text soap connections are established. Encryption should be
 provided on a higher layer though.
 
+SOAP proxies are kept in a pool for each endpoint and reused. With keep alive enabled (see
+soap_keepalive in L{config}), the proxies use the L{KeepAliveTransport}, which keeps the HTTP
+connection to the endpoint open between the messages; the threaded listener answers with
+HTTP/1.1 and keeps the connections open accordingly.
 
 @author: Michael Pilgermann
 @contact: mailto:mpilgerm@glam.ac.uk
@@ -15,6 +19,10 @@ from protocolinterface import ProtocolInterface
 import config
 import SOAPpy
 import thread
+import threading
+import httplib
+import socket
+import time
 
 class ProtocolImplementation(ProtocolInterface):
     """
@@ -24,6 +32,10 @@ class ProtocolImplementation(ProtocolInterface):
     @type _server: L{SOAPpy.SOAPServer}
     @ivar _callback: Function to call whenever a new message arrives
     @type _callback: C{Function}
+    @ivar _pool: Idle proxies by endpoint
+    @type _pool: C{Dict} (C{String} | C{List} of L{SOAPpy.SOAPProxy})
+    @ivar _poolLock: Lock for the proxy pool
+    @type _poolLock: C{threading.Lock}
     """
     
     def __init__(self):
@@ -31,6 +43,8 @@ class ProtocolImplementation(ProtocolInterface):
         Call super constructor and initialise with name.
         """
         ProtocolInterface.__init__(self, "soap")
+        self._pool = {}
+        self._poolLock = threading.Lock()
         
     def listen(self, callback):
         """
@@ -43,7 +57,14 @@ class ProtocolImplementation(ProtocolInterface):
         address = config.soap_local_address
         port = config.soap_local_port
         
-        self._server = SOAPpy.SOAPServer((address, port))
+        if config.soap_threaded_server:
+            if config.soap_keepalive:
+                self._server = SOAPpy.ThreadingSOAPServer((address, port), RequestHandler = KeepAliveRequestHandler)
+            else:
+                self._server = SOAPpy.ThreadingSOAPServer((address, port))
+            self._server.daemon_threads = 1
+        else:
+            self._server = SOAPpy.SOAPServer((address, port))
         self._server.registerFunction(self.newMessage)
         thread.start_new_thread(self._server.serve_forever, ())
         return 1
@@ -52,10 +73,14 @@ class ProtocolImplementation(ProtocolInterface):
         """
         Registered with the SOAP server.
         
-        Sends each incoming message to the callback.
+        Sends each incoming message to the callback - along with the address of the sending node.
         """
-        self._callback(self.getName(), message)
-
+        try:
+            source = SOAPpy.GetSOAPContext().connection.getpeername()[0]
+        except (KeyError, AttributeError, socket.error):
+            source = None
+        self._callback(self.getName(), message, source)
+        
     def sendMessage(self, endpoint, message):
         """
         Send a message to the endpoint given.
@@ -63,12 +88,228 @@ class ProtocolImplementation(ProtocolInterface):
         @return: Indicates, whether the message was send sucessfully
         @rtype: C{Boolean}
         """
-        server = SOAPpy.SOAPProxy(endpoint)
+        server = self._getProxy(endpoint)
         server.newMessage(message)
+        # proxies are only put back after successful calls
+        self._releaseProxy(endpoint, server)
         return 1
-
+        
+    def _getProxy(self, endpoint):
+        """
+        Takes an idle proxy for the endpoint from the pool or creates a new one.
+        
+        @rtype: L{SOAPpy.SOAPProxy}
+        """
+        self._poolLock.acquire()
+        try:
+            proxies = self._pool.get(endpoint)
+            if proxies:
+                return proxies.pop()
+        finally:
+            self._poolLock.release()
+        if config.soap_keepalive:
+            return SOAPpy.SOAPProxy(endpoint, transport = KeepAliveTransport)
+        return SOAPpy.SOAPProxy(endpoint)
+        
+    def _releaseProxy(self, endpoint, server):
+        """
+        Puts the proxy back into the pool - or drops it, if the pool for the endpoint is full.
+        """
+        self._poolLock.acquire()
+        try:
+            proxies = self._pool.setdefault(endpoint, [])
+            if len(proxies) < config.soap_pool_size:
+                proxies.append(server)
+                return
+        finally:
+            self._poolLock.release()
+        self._closeProxy(server)
+        
+    def _closeProxy(self, server):
+        if isinstance(server.transport, KeepAliveTransport):
+            server.transport.close()
+            
     def shutdown(self):
         """
         Stop listening.
         """
+        if hasattr(self._server, 'shutdown'):
+            # stop the serve_forever loop first (Python 2.6 onwards)
+            self._server.shutdown()
         self._server.server_close()
+        self._poolLock.acquire()
+        try:
+            for proxies in self._pool.values():
+                for server in proxies:
+                    self._closeProxy(server)
+            self._pool = {}
+        finally:
+            self._poolLock.release()
+
+
+class KeepAliveTransport(SOAPpy.Client.HTTPTransport):
+    """
+    Transport for SOAP proxies, which keeps the HTTP connection open between the calls.
+    
+    Only plain HTTP without HTTP proxy and authentication is handled in here; anything else
+    is passed on to the transport of SOAPpy. Instances must not be shared between threads.
+    
+    @ivar _connection: Connection to the server of the last call
+    @type _connection: C{httplib.HTTPConnection}
+    @ivar _host: Host (and port) the connection is established with
+    @type _host: C{String}
+    @ivar _lastUsed: Time of the last call
+    @type _lastUsed: C{float}
+    """
+    
+    def __init__(self):
+        """
+        Call super constructor and initialise without connection.
+        """
+        SOAPpy.Client.HTTPTransport.__init__(self)
+        self._connection = None
+        self._host = None
+        self._lastUsed = 0
+        # reconnect well before the listener on the other side closes the connection
+        self._idleTimeout = config.soap_keepalive_timeout / 2.0
+        
+    def call(self, addr, data, namespace, soapaction = None, encoding = None,
+                http_proxy = None, config = SOAPpy.Config, timeout = None):
+        """
+        Posts the SOAP request to the server and reads the reply.
+        
+        A connection, which turns out to be closed by the server when sending the request, is replaced once.
+        
+        @return: Payload of the reply and the namespace
+        @rtype: C{Tuple} (C{String}, C{String})
+        """
+        if not isinstance(addr, SOAPpy.Client.SOAPAddress):
+            addr = SOAPpy.Client.SOAPAddress(addr, config)
+        if http_proxy or addr.proto != 'http' or addr.user != None:
+            kw = {}
+            if timeout is not None:
+                kw['timeout'] = timeout
+            return SOAPpy.Client.HTTPTransport.call(self, addr, data, namespace, soapaction, encoding,
+                http_proxy, config, **kw)
+                
+        contentType = 'text/xml'
+        if encoding != None:
+            contentType += '; charset=%s' %(encoding)
+        headers = {'Content-type': contentType, 'User-agent': SOAPpy.Client.SOAPUserAgent()}
+        if soapaction:
+            headers['SOAPAction'] = '"%s"' %(soapaction)
+        else:
+            headers['SOAPAction'] = ''
+            
+        if self._connection and time.time() - self._lastUsed > self._idleTimeout:
+            # the server might be about to close it
+            self.close()
+        while 1:
+            fresh = 0
+            if not self._connection or self._host != addr.host:
+                self.close()
+                if timeout is not None:
+                    self._connection = httplib.HTTPConnection(addr.host, timeout = timeout)
+                else:
+                    self._connection = httplib.HTTPConnection(addr.host)
+                self._host = addr.host
+                fresh = 1
+            try:
+                if fresh:
+                    # header and body are written separately - do not wait for the acknowledgement in between
+                    self._connection.connect()
+                    self._connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self._connection.request('POST', addr.path, data, headers)
+            except (httplib.HTTPException, socket.error):
+                # nothing has been processed by the server yet - try again with a new connection
+                self.close()
+                if fresh:
+                    raise
+                continue
+            try:
+                response = self._connection.getresponse()
+                body = response.read()
+            except:
+                # no retry here - the message might have been processed already
+                self.close()
+                raise
+            break
+        self._lastUsed = time.time()
+        
+        code = response.status
+        contentType = response.getheader('content-type', 'text/xml')
+        if code == 500 and not (contentType[:8] == 'text/xml' and len(body) > 0):
+            raise SOAPpy.Errors.HTTPError(code, response.reason)
+        if code not in (200, 500):
+            raise SOAPpy.Errors.HTTPError(code, response.reason)
+            
+        if namespace is None:
+            return body, None
+        return body, self.getNS(namespace, body)
+        
+    def close(self):
+        """
+        Closes the connection to the server (if any).
+        """
+        if self._connection:
+            self._connection.close()
+        self._connection = None
+        self._host = None
+
+
+class KeepAliveRequestHandler(SOAPpy.Server.SOAPRequestHandler):
+    """
+    Request handler for the SOAP server answering with HTTP/1.1 - this way, clients may keep the connection open.
+    
+    Connections are closed after replies without content length (which the client could not
+    tell apart otherwise) and after being idle for soap_keepalive_timeout seconds.
+    """
+    protocol_version = 'HTTP/1.1'
+    
+    def setup(self):
+        self.timeout = config.soap_keepalive_timeout
+        SOAPpy.Server.SOAPRequestHandler.setup(self)
+        self.request.settimeout(config.soap_keepalive_timeout)
+        # the reply is written line by line - do not wait for acknowledgements in between
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        
+    def do_POST(self):
+        # the SOAPpy handler shuts down the connection after each reply
+        connection = self.connection
+        self.connection = _KeepAliveConnection(connection, self)
+        try:
+            SOAPpy.Server.SOAPRequestHandler.do_POST(self)
+        finally:
+            self.connection = connection
+            
+    def send_response(self, code, message = None):
+        self._contentLength = 0
+        SOAPpy.Server.SOAPRequestHandler.send_response(self, code, message)
+        
+    def send_header(self, keyword, value):
+        if keyword.lower() == 'content-length':
+            self._contentLength = 1
+        SOAPpy.Server.SOAPRequestHandler.send_header(self, keyword, value)
+        
+    def end_headers(self):
+        if not self._contentLength:
+            self.send_header('Connection', 'close')
+            self.close_connection = 1
+        SOAPpy.Server.SOAPRequestHandler.end_headers(self)
+
+
+class _KeepAliveConnection:
+    """
+    Wrapper for the connection of a request handler ignoring shut downs while the connection is kept alive.
+    """
+    
+    def __init__(self, connection, handler):
+        self._connection = connection
+        self._handler = handler
+        
+    def shutdown(self, how):
+        if self._handler.close_connection:
+            self._connection.shutdown(how)
+            
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
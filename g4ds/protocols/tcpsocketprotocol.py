@@ -6,6 +6,16 @@ Grid for Digital Security (G4DS)
 Just plain text soap connections are established. Encryption should be
 provided on a higher layer though.
 
+Two modes of operation are supported for sending (see tcp_framing in L{config}):
+    - Plain: one connection per message; the end of the message is signalled by closing the connection.
+    - Framing: connections to an endpoint are kept open and reused. The connection starts with
+    L{FRAMING_MAGIC}, afterwards, each message is sent with its length (4 bytes, network byte
+    order) in front. Several messages for the same endpoint may be written in one go (see
+    L{ProtocolImplementation.sendMessages}).
+
+The listener detects the mode for each incoming connection; hence, it can handle both. Listeners of
+older nodes only understand plain connections, so framing is off by default.
+Each incoming connection is handled in a thread of its own.
 
 @author: Michael Pilgermann
 @contact: mailto:mpilgerm@glam.ac.uk
@@ -14,8 +24,17 @@ provided on a higher layer though.
 from protocolinterface import ProtocolInterface
 import config
 import thread
+import threading
+import struct
+import time
 from socket import *
 
+# starts each connection in framing mode
+FRAMING_MAGIC = 'G4DSTCP1'
+# format of the length in front of each frame
+FRAME_HEADER_FORMAT = '!I'
+FRAME_HEADER_SIZE = struct.calcsize(FRAME_HEADER_FORMAT)
+
 class ProtocolImplementation(ProtocolInterface):
     """
     Protocol implementation for G4DS for simple TCP socket connections.
@@ -24,6 +43,10 @@ class ProtocolImplementation(ProtocolInterface):
     @type _server: L{socket.socket}
     @ivar _callback: Function to call whenever a new message arrives
     @type _callback: C{Function}
+    @ivar _pool: Idle connections by endpoint - each one with the time of its last use
+    @type _pool: C{Dict} (C{String} | C{List} of [L{socket.socket}, C{float}])
+    @ivar _poolLock: Lock for the connection pool
+    @type _poolLock: C{threading.Lock}
     """
     
     def __init__(self):
@@ -31,6 +54,8 @@ class ProtocolImplementation(ProtocolInterface):
         Call super constructor and initialise with name.
         """
         ProtocolInterface.__init__(self, "tcpsocket")
+        self._pool = {}
+        self._poolLock = threading.Lock()
         
     def listen(self, callback):
         """
@@ -45,8 +70,8 @@ class ProtocolImplementation(ProtocolInterface):
         
         self._server = socket(AF_INET, SOCK_STREAM)    # create a TCP socket
         self._server.bind((address, port))                          # bind it to the server port
-        self._server.listen(0)
-           
+        self._server.listen(config.tcp_listen_backlog)
+        
         self._alive = 1
         thread.start_new_thread(self._waitForMessages, ())
         
@@ -54,21 +79,69 @@ class ProtocolImplementation(ProtocolInterface):
         
     def _waitForMessages(self):
         """
-        Sends each incoming message to the callback.
+        Accepts incoming connections and starts a reader thread for each of them.
         """
         while self._alive:
             # wait for next client to connect
-            connection, address = self._server.accept() # connection is a new socket
-            alldata = ""
-            while 1:
-                data = connection.recv(1024) # receive up to 1K bytes
-                if data:
-                    alldata += data
-                else:
-                    break
+            try:
+                connection, address = self._server.accept() # connection is a new socket
+            except error:
+                # the server socket is closed on shut down
+                continue
+            thread.start_new_thread(self._readConnection, (connection, address[0]))
+            
+    def _readConnection(self, connection, source = None):
+        """
+        Sends each message arriving on the given connection to the callback.
+        
+        Without the framing header, the whole content of the connection is one message.
+        """
+        try:
+            try:
+                header = self._receive(connection, len(FRAMING_MAGIC))
+                if header != FRAMING_MAGIC:
+                    chunks = [header]
+                    while 1:
+                        data = connection.recv(config.tcp_receive_buffer)
+                        if not data:
+                            break
+                        chunks.append(data)
+                    connection.close()
+                    self._callback(self.getName(), ''.join(chunks), source)
+                    return
+                    
+                connection.settimeout(2 * config.tcp_idle_timeout)
+                while self._alive:
+                    header = self._receive(connection, FRAME_HEADER_SIZE)
+                    if len(header) < FRAME_HEADER_SIZE:
+                        break           # connection closed by the sender
+                    length = struct.unpack(FRAME_HEADER_FORMAT, header)[0]
+                    message = self._receive(connection, length)
+                    if len(message) < length:
+                        break           # incomplete frame - connection is broken
+                    self._callback(self.getName(), message, source)
+            except error:
+                pass
+        finally:
             connection.close()
-            self._callback(self.getName(), alldata)
-
+            
+    def _receive(self, connection, length):
+        """
+        Reads the given number of bytes from the connection.
+        
+        @return: The bytes read - less than requested only if the connection was closed
+        @rtype: C{String}
+        """
+        chunks = []
+        remaining = length
+        while remaining > 0:
+            data = connection.recv(min(remaining, config.tcp_receive_buffer))
+            if not data:
+                break
+            chunks.append(data)
+            remaining -= len(data)
+        return ''.join(chunks)
+        
     def sendMessage(self, endpoint, message):
         """
         Send a message to the endpoint given.
@@ -76,18 +149,117 @@ class ProtocolImplementation(ProtocolInterface):
         @return: Indicates, whether the message was send sucessfully
         @rtype: C{Boolean}
         """
+        if type(message) == type(u''):
+            message = message.encode('utf-8')
+        if not config.tcp_framing:
+            s = self._connect(endpoint)
+            try:
+                s.sendall(message)
+            finally:
+                s.close()
+            return 1
+            
+        return self._sendFrames(endpoint, struct.pack(FRAME_HEADER_FORMAT, len(message)) + message)
+        
+    def sendMessages(self, endpoint, messages):
+        """
+        Sends several messages to the endpoint in the given order.
+        
+        With framing, all the frames are written in one go.
+        
+        @return: Indicates, whether the messages were send sucessfully
+        @rtype: C{Boolean}
+        """
+        if not config.tcp_framing:
+            return ProtocolInterface.sendMessages(self, endpoint, messages)
+        frames = []
+        for message in messages:
+            if type(message) == type(u''):
+                message = message.encode('utf-8')
+            frames.append(struct.pack(FRAME_HEADER_FORMAT, len(message)))
+            frames.append(message)
+        return self._sendFrames(endpoint, ''.join(frames))
+        
+    def _sendFrames(self, endpoint, frame):
+        """
+        Writes the frame(s) to a pooled connection to the endpoint - or to a new one.
+        
+        @return: Indicates, whether the frames were send sucessfully
+        @rtype: C{Boolean}
+        """
+        s = self._getPooledConnection(endpoint)
+        if s:
+            try:
+                s.sendall(frame)
+                self._releaseConnection(endpoint, s)
+                return 1
+            except error:
+                # the other side has given up on this connection - try again with a new one
+                s.close()
+        s = self._connect(endpoint)
+        try:
+            s.sendall(FRAMING_MAGIC + frame)
+        except error:
+            s.close()
+            raise
+        self._releaseConnection(endpoint, s)
+        return 1
+        
+    def _connect(self, endpoint):
+        """
+        Opens a new connection to the endpoint.
+        """
         addresses = endpoint.split(":")
         host = addresses[0]
         port = int(addresses[1])
         s = socket(AF_INET, SOCK_STREAM)
         s.connect((host, port)) # connect to server on the port
-        sendbytes = 0
-        while sendbytes < len(message):
-            sendbytes += s.send(message[sendbytes:])
-        return 1
-
+        return s
+        
+    def _getPooledConnection(self, endpoint):
+        """
+        Takes an idle connection to the endpoint from the pool; connections idle for too long are closed.
+        
+        @return: The connection or None, if no connection is available
+        @rtype: L{socket.socket}
+        """
+        self._poolLock.acquire()
+        try:
+            connections = self._pool.get(endpoint, [])
+            while connections:
+                s, lastUsed = connections.pop()
+                if time.time() - lastUsed < config.tcp_idle_timeout:
+                    return s
+                s.close()
+            return None
+        finally:
+            self._poolLock.release()
+            
+    def _releaseConnection(self, endpoint, s):
+        """
+        Puts the connection back into the pool - or closes it, if the pool for the endpoint is full.
+        """
+        self._poolLock.acquire()
+        try:
+            connections = self._pool.setdefault(endpoint, [])
+            if len(connections) < config.tcp_pool_size:
+                connections.append([s, time.time()])
+                return
+        finally:
+            self._poolLock.release()
+        s.close()
+        
     def shutdown(self):
         """
         Stop listening.
         """
         self._alive = 0
+        self._server.close()
+        self._poolLock.acquire()
+        try:
+            for connections in self._pool.values():
+                for s, lastUsed in connections:
+                    s.close()
+            self._pool = {}
+        finally:
+            self._poolLock.release()
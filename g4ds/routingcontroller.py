@@ -119,6 +119,10 @@ class RoutingEngine:
         is possible, the message is sent off directly. If, however, this is not possible, the 
         message is wrapped into a routing message and gateways are tried to identify for passing
         the message through the topology.
+        
+        Messages for direct delivery are handed over to the L{outboundscheduler.OutboundScheduler}, 
+        unless no workers are configured for it (OUTBOUND_WORKERS in L{config}); errors of the
+        transport are not raised to the caller then.
         """
         
         # check, whether I am in the community of the given endpoint, if not - we need to attempt to route this message
@@ -132,12 +136,19 @@ class RoutingEngine:
         if len(getEndpointManager().getEndpointsForMember(local.getId(), tc)):
 
             from g4dslogging import getDefaultLogger, COMMUNICATION_OUTGOING_MSG, COMMUNICATION_OUTGOING_MSG_DETAILS
-            getDefaultLogger().newMessage(COMMUNICATION_OUTGOING_MSG, 'New outgoing message - direct delivery (%s | %s)' %(endpoint.getMemberId(), tc))
-            getDefaultLogger().newMessage(COMMUNICATION_OUTGOING_MSG_DETAILS, '-- Endpoint %s' %(str(endpoint)))
-            getDefaultLogger().newMessage(COMMUNICATION_OUTGOING_MSG_DETAILS, '-- Size of Data %d chars' %(len(message)))
+            getDefaultLogger().newMessage(COMMUNICATION_OUTGOING_MSG, 'New outgoing message - direct delivery (%s | %s)', endpoint.getMemberId(), tc)
+            getDefaultLogger().newMessage(COMMUNICATION_OUTGOING_MSG_DETAILS, '-- Endpoint %s', endpoint)
+            getDefaultLogger().newMessage(COMMUNICATION_OUTGOING_MSG_DETAILS, '-- Size of Data %d chars', len(message))
 
             protocol = getProtocolManager().getProtocol(endpoint.getProtocolId())
             
+            import config
+            if config.OUTBOUND_WORKERS:
+                from outboundscheduler import getOutboundScheduler
+                if not getOutboundScheduler().enqueue(protocol.getName(), endpoint.getAddress(), message):
+                    from errorhandling import G4dsCommunicationException
+                    raise G4dsCommunicationException('Sending Message: queue for endpoint %s full.' %(endpoint.getAddress()))
+                return
             from protocolcontroller import getProtocolController
             protocol = getProtocolController().getOpenProtocol(protocol.getName())
     
@@ -151,7 +162,7 @@ class RoutingEngine:
         else:
             # ok, not in there - let's route then
             from g4dslogging import getDefaultLogger, COMMUNICATION_OUTGOING_MSG_ROUTED
-            getDefaultLogger().newMessage(COMMUNICATION_OUTGOING_MSG_ROUTED, 'New outgoing message - routed (%s | %s)' %(endpoint.getMemberId(), tc))
+            getDefaultLogger().newMessage(COMMUNICATION_OUTGOING_MSG_ROUTED, 'New outgoing message - routed (%s | %s)', endpoint.getMemberId(), tc)
 
             self._assembleRoutingMessage(message, endpoint)
         
@@ -170,8 +181,8 @@ class RoutingEngine:
         wrapped, tmp, tmp1 = getControlMessageWrapper().wrapSSRoutingMessage('1', args = args, data = message)
 
         from g4dslogging import getDefaultLogger, COMMUNICATION_OUTGOING_MSG_DETAILS
-        getDefaultLogger().newMessage(COMMUNICATION_OUTGOING_MSG_DETAILS, '-- Routing details: Gateway (%s | %s)' %(gateway_member_id, peercommunity))
-        getDefaultLogger().newMessage(COMMUNICATION_OUTGOING_MSG_DETAILS, '-- Size of Data %d chars' %(len(message)))
+        getDefaultLogger().newMessage(COMMUNICATION_OUTGOING_MSG_DETAILS, '-- Routing details: Gateway (%s | %s)', gateway_member_id, peercommunity)
+        getDefaultLogger().newMessage(COMMUNICATION_OUTGOING_MSG_DETAILS, '-- Size of Data %d chars', len(message))
 
         from g4dsconfigurationcontroller import getOutgoingControlMessagesHandler, CONTROL_ROUTER
         getOutgoingControlMessagesHandler().sendMessage(gateway_member_id, CONTROL_ROUTER, "Routing message", wrapped, communityid = peercommunity)
@@ -37,9 +37,9 @@ class SecurityController:
     """
     def __init__(self):
         """
-        Yet empty Constructor.
+        Initialises the store for the fingerprints of the own public keys.
         """
-        pass
+        self._fingerprints = {}
         
     def decrypt(self, message, algorithm):
         """
@@ -94,6 +94,33 @@ class SecurityController:
         signature = algorithm.signMessage(message)
         return signature
     
+    def getFingerprint(self, algorithm):
+        """
+        Provides the fingerprint of the own public key for the given algorithm.
+        
+        The fingerprint is calculated once only for each algorithm.
+        
+        @param algorithm: Name of the algorithm
+        @type algorithm: C{String}
+        @return: Fingerprint of the public key (see L{tools.getKeyFingerprint})
+        @rtype: C{String}
+        """
+        if not self._fingerprints.has_key(algorithm):
+            from tools import getKeyFingerprint
+            publicKey = getAlgorithmController().getAlgorithm(algorithm).getPublicKey()
+            self._fingerprints[algorithm] = getKeyFingerprint(publicKey)
+        return self._fingerprints[algorithm]
+    
+    def getKeyCacheStatistics(self):
+        """
+        Provides the statistics of the cache for parsed key objects used by the algorithm implementations.
+        
+        @return: Dictionary with the current statistics values
+        @rtype: C{Dict}
+        """
+        from algorithms.keycache import getKeyCache
+        return getKeyCache().getStatistics()
+        
     def validate(self, message, signature, key, algorithm):
         """
         Verifies, whether the given signature corrosponds with the given message.
@@ -81,6 +81,8 @@ class CredentialManager:
     
     @ivar _credentials: Dictionary, maintaining the credentials - accessable by its id
     @type _credentials: C{Dict} (C{String} | L{Credential})
+    @ivar _fingerprints: Index for the credentials by the fingerprint of their keys (see L{tools.getKeyFingerprint})
+    @type _fingerprints: C{Dict} (C{String} | L{Credential})
     @ivar _dbconnected: Indicates, whether the manager is connected to a database; hence whether the changes 
         shall be written through
     @type _dbconnected: C{Boolean}
@@ -95,6 +97,7 @@ class CredentialManager:
         @type loadFromDatabase: C{Boolean}
         """
         self._credentials = {}
+        self._fingerprints = {}
         self._dbconnected = loadFromDatabase
         if self._dbconnected:
             self._sec_db = securitymanager_db.SecDB()
@@ -119,6 +122,10 @@ class CredentialManager:
         @type persistent: C{Boolean}
         """
         self._credentials[credential.getId()] = credential
+        if credential.getKey():
+            self._fingerprints[tools.getKeyFingerprint(credential.getKey())] = credential
+        from communicationmanager import endpointDependenciesChanged
+        endpointDependenciesChanged()
         if persistent:
             self._sec_db.addCredential(credential)
     
@@ -128,6 +135,17 @@ class CredentialManager:
         """
         return self._credentials[credentialId]
         
+    def getCredentialByFingerprint(self, fingerprint):
+        """
+        Looks up the credential for the key with the given fingerprint.
+        
+        @param fingerprint: Fingerprint of the key (see L{tools.getKeyFingerprint})
+        @type fingerprint: C{String}
+        @return: The credential or None, if no credential is known for this fingerprint
+        @rtype: L{Credential}
+        """
+        return self._fingerprints.get(fingerprint)
+        
     def getCredentials(self):
         """
         Returns a list of all saved credentials.
@@ -154,7 +172,12 @@ class CredentialManager:
         """
         Removes the credential with the given id from the manager (and the database if connected).
         """
+        credential = self._credentials[credentialid]
         del self._credentials[credentialid]
+        if credential.getKey():
+            fingerprint = tools.getKeyFingerprint(credential.getKey())
+            if self._fingerprints.get(fingerprint) is credential:
+                del self._fingerprints[fingerprint]
         if self._dbconnected:
             self._sec_db.removeCredentials(credentialid)
         
@@ -451,6 +474,8 @@ class AlgorithmManager:
         @type persistent: C{Boolean}
         """
         self._algorithms[algorithm.getId()] = algorithm
+        from communicationmanager import endpointDependenciesChanged
+        endpointDependenciesChanged()
         if persistent:
             self._sec_db.addAlgorithm(algorithm)
     
@@ -39,7 +39,7 @@ class ServiceIntegrator:
         from authorisationcontroller import getAuthorisationController
 
         from g4dslogging import getDefaultLogger, COMMUNICATION_INCOMING_MSG_DETAILS
-        getDefaultLogger().newMessage(COMMUNICATION_INCOMING_MSG_DETAILS, '-- Service Msg - Service %s (%s)' %(servicename, serviceid))
+        getDefaultLogger().newMessage(COMMUNICATION_INCOMING_MSG_DETAILS, '-- Service Msg - Service %s (%s)', servicename, serviceid)
         
         # the action string for service is: g4ds.service.$ACTION_ID - let's check whether to pass
         actionString = "g4ds.service." + serviceid
@@ -90,14 +90,20 @@ class ServiceIntegrator:
         else:
             # that should not happen
             getDefaultLogger().newMessage(COMMUNICATION_OUTGOING_ERROR_SERVICE, 'Outgoing service message - unkown destination string for service %s: %s' %(serviceid, dest_memberid))
-        getDefaultLogger().newMessage(COMMUNICATION_OUTGOING_MSG_SERVICE_DETAILS, 'Outgoing service message - resolved destination string (%s): %s' %(dest_memberid, destinations))
+        getDefaultLogger().newMessage(COMMUNICATION_OUTGOING_MSG_SERVICE_DETAILS, 'Outgoing service message - resolved destination string (%s): %s', dest_memberid, destinations)
             
         from routingcontroller import getRoutingController
+        from messagehandler import getGlobalOutgoingMessageHandler
+        from errorhandling import G4dsException
         for dest_memberid in destinations:
-            endpoint = getRoutingController().findBestEndpointForMember(dest_memberid, communityid)
-            endpointid = endpoint.getId()
-            from messagehandler import getGlobalOutgoingMessageHandler
-            getGlobalOutgoingMessageHandler().sendServiceMessage(endpointid, serviceid, servicename, message, messagereference)
+            try:
+                endpoint = getRoutingController().findBestEndpointForMember(dest_memberid, communityid)
+                getGlobalOutgoingMessageHandler().sendServiceMessage(endpoint.getId(), serviceid, servicename, message, messagereference)
+            except G4dsException, msg:
+                if len(destinations) == 1:
+                    raise
+                # one member out of reach must not stop the broadcast to the others
+                getDefaultLogger().newMessage(COMMUNICATION_OUTGOING_ERROR_SERVICE, 'Outgoing service message - not sent to %s: %s' %(dest_memberid, msg))
     
     
     def registerClient(self, serviceid, callback):
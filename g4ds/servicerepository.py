@@ -53,6 +53,8 @@ class ServiceManager:
     @type _dbconnected: C{Boolean}
     @ivar _sr_db: Service Repository Database Connector
     @type _sr_db: L{servicerepository_db.ServDB}
+    @ivar _changeListeners: Functions to be called whenever services or their relations with members change
+    @type _changeListeners: C{List} of C{Function}
     """
     
     def __init__(self, loadFromDatabase = 0):
@@ -65,6 +67,7 @@ class ServiceManager:
         @type loadFromDatabase: C{Boolean}
         """
         self._services = {}
+        self._changeListeners = []
         self._dbconnected = loadFromDatabase
         if loadFromDatabase:
             self._sr_db = servicerepository_db.ServDB()
@@ -103,6 +106,7 @@ class ServiceManager:
         self._services[service.getId()] = service
         if persistent:
             self._sr_db.addService(service)
+        self.notifyChange(self._getAffectedIds(service))
     
     def updateService(self, service, dropAuthorityRelations = 1, dropMemberRelations = 0, dropCommunityRelations = 0):
         """
@@ -111,6 +115,7 @@ class ServiceManager:
         Writes information through to the database if connected.
         """
         if self._services.has_key(service.getId()):
+            affected = self._getAffectedIds(self._services[service.getId()])
             del self._services[service.getId()]
             self._services[service.getId()] = service
             if self._dbconnected:
@@ -133,10 +138,41 @@ class ServiceManager:
                 communityids = self._sr_db.getCommunitiesForService(service.getId())
                 for communityid in communityids:
                     service.addCommunity(communityid, init = 1)
+                    
+            self.notifyChange(affected + self._getAffectedIds(service))
         else:
             self.addService(service)
                 
         return service
+        
+    def addChangeListener(self, listener):
+        """
+        Registers a function to be called whenever a service or the relations of members with a service change.
+        
+        The listener is passed the list of ids of the services and members affected by the change.
+        
+        @param listener: Function to be called on changes
+        @type listener: C{Function}
+        """
+        self._changeListeners.append(listener)
+        
+    def notifyChange(self, ids):
+        """
+        Passes a change to all the registered listeners.
+        
+        @param ids: IDs of the services and members affected by the change
+        @type ids: C{List} of C{String}
+        """
+        for listener in self._changeListeners:
+            listener(ids)
+            
+    def _getAffectedIds(self, service):
+        """
+        Assembles the ids of the service itself and all the members related with it.
+        
+        @rtype: C{List} of C{String}
+        """
+        return [service.getId()] + service.getMembers() + service.getAuthorities()
     
     def getService(self, serviceId):
         """
@@ -200,6 +236,10 @@ class Service:
     @type _members: C{List} of C{String}
     @ivar _authorities: List of ids of members which are authorities to this service
     @type _authorities: C{List} of C{String}
+    @ivar _memberIndex: Index of the ids of subscribed members for membership checks
+    @type _memberIndex: C{Dict}
+    @ivar _authorityIndex: Index of the ids of members which are authorities to this service
+    @type _authorityIndex: C{Dict}
     """
     
     def __init__(self, id = None, name = '', ksdl = '', ksdlversion = '', ksdldate = None):
@@ -229,6 +269,8 @@ class Service:
         self._communities = []
         self._members = []
         self._authorities = []
+        self._memberIndex = {}
+        self._authorityIndex = {}
         
         if self._id == None:
             self._id = tools.generateId(tools.TYPE_SERVICE)
@@ -323,33 +365,27 @@ class Service:
         """
         Mirrors the subscription of a member to a service
         """
-        memberalready = 0
-        for m in self._members:
-            if m == memberid:
-                memberalready = 1
-                
-        if not memberalready:
+        if not self._memberIndex.has_key(memberid):
             self._members.append(memberid)
+            self._memberIndex[memberid] = 1
             
             if not init:
                 global getServiceManager
                 getServiceManager().registerMemberSubscription(self.getId(), memberid)
+                getServiceManager().notifyChange([memberid])
             
     def addAuthority(self, memberid, init = 0):
         """
         Mirrors the subscription of a communtiy to a service
         """
-        memberalready = 0
-        for m in self._authorities:
-            if m == memberid:
-                memberalready = 1
-                
-        if not memberalready:
+        if not self._authorityIndex.has_key(memberid):
             self._authorities.append(memberid)
+            self._authorityIndex[memberid] = 1
             
             if not init:
                 global getServiceManager
                 getServiceManager().registerAuthority(self.getId(), memberid)
+                getServiceManager().notifyChange([memberid])
             
     def hasMember(self, memberid):
         """
@@ -360,12 +396,7 @@ class Service:
         @return: Indicates, whether the member is member of the service
         @rtype: C{Boolean}
         """
-        try:
-            self._members.index(memberid)
-            return 1
-        except ValueError:
-            pass
-        return 0
+        return self._memberIndex.has_key(memberid)
 
     def hasAuthority(self, memberid):
         """
@@ -376,12 +407,7 @@ class Service:
         @return: Indicates, whether the member is authority of the service
         @rtype: C{Boolean}
         """
-        try:
-            self._authorities.index(memberid)
-            return 1
-        except ValueError:
-            pass
-        return 0
+        return self._authorityIndex.has_key(memberid)
 
     def hasCommunity(self, communityid):
         """
@@ -0,0 +1,268 @@
+"""
+Hybrid encryption of G4DS messages using session keys.
+
+Grid for Digital Security (G4DS)
+
+Encrypting each entire message with the public key algorithms (RSA, ElGamal) is expensive. Instead,
+a random session key is created for each receiving credential. The session key is encrypted once
+with the public key algorithm of the credential; the encrypted session key is sent along with each
+message, whilst the message itself is encrypted with AES under the session key. Session keys are
+rotated after a configurable life time or amount of data (see L{algorithms.config}).
+
+On the receiving side, decrypted session keys are remembered by a digest of their encrypted form;
+hence, the private key operation is only required once per session key.
+
+Session keys are only used for members, which have proven to support them - each G4DS message
+sent by this implementation carries a marker for this capability, which is registered with
+L{SessionKeyController.setCapable} once the signature of the message has been validated. For all
+other members, the whole message is still encrypted with the public key algorithm.
+
+@author: Michael Pilgermann
+@contact: mailto:mpilgerm@glam.ac.uk
+@license: GPL (General Public License)
+
+@var _sessionKeyController: Singleton - the only instance ever of the SessionKeyController class
+@type _sessionKeyController: L{SessionKeyController}
+"""
+
+import threading
+import time
+import os
+import zlib
+import hmac
+import binascii
+
+import algorithms.config
+
+# length of the random session key in bytes
+SESSION_KEY_LENGTH = 32
+# block size of AES in bytes
+AES_BLOCK_SIZE = 16
+
+# "singleton"
+_sessionKeyController = None
+def getSessionKeyController():
+    """
+    Singleton implementation.
+
+    @return: The instance for the session key controller class
+    @rtype: L{SessionKeyController}
+    """
+    global _sessionKeyController
+    if not _sessionKeyController:
+        _sessionKeyController = SessionKeyController()
+    return _sessionKeyController
+
+def _digestsEqual(a, b):
+    """
+    Compares two digests in constant time - the time taken must not reveal how many leading bytes match.
+
+    @return: Indicates, whether both digests are equal
+    @rtype: C{Boolean}
+    """
+    if len(a) != len(b):
+        return 0
+    result = 0
+    for x, y in zip(a, b):
+        result |= ord(x) ^ ord(y)
+    if result:
+        return 0
+    return 1
+
+class SessionKeyController:
+    """
+    Maintains the session keys for outgoing and incoming messages.
+
+    @ivar _outgoing: Session keys for sending - key is the tuple of credential id, algorithm name and public key; 
+        value a list of [session key, encrypted session key, creation time, number of bytes encrypted]
+    @type _outgoing: C{Dict}
+    @ivar _incoming: Decrypted session keys - key is a digest of the encrypted session key
+    @type _incoming: C{Dict}
+    @ivar _incomingOrder: Digests of the incoming session keys in the order they were added (for limiting the cache)
+    @type _incomingOrder: C{List}
+    @ivar _capable: Ids of members, which support session keys
+    @type _capable: C{Dict}
+    """
+
+    def __init__(self, enabled = algorithms.config.session_keys_enabled, lifetime = algorithms.config.session_key_lifetime,
+                    maxBytes = algorithms.config.session_key_max_bytes, cacheSize = algorithms.config.session_key_cache_size):
+        """
+        Initialises the empty key stores.
+
+        @param enabled: Use session keys for members supporting them at all
+        @type enabled: C{Boolean}
+        @param lifetime: Number of seconds after which a session key for sending is replaced (None for no limit)
+        @type lifetime: C{int}
+        @param maxBytes: Number of bytes after which a session key for sending is replaced (None for no limit)
+        @type maxBytes: C{int}
+        @param cacheSize: Maximum number of decrypted session keys remembered for incoming messages
+        @type cacheSize: C{int}
+        """
+        self._enabled = enabled
+        self._lifetime = lifetime
+        self._maxBytes = maxBytes
+        self._cacheSize = cacheSize
+        self._outgoing = {}
+        self._incoming = {}
+        self._incomingOrder = []
+        self._capable = {}
+        self._lock = threading.Lock()
+
+    def isEnabled(self):
+        """
+        GETTER
+        """
+        return self._enabled
+
+    def setCapable(self, memberid):
+        """
+        Registers the given member as supporting session keys.
+        """
+        self._capable[memberid] = 1
+
+    def isCapable(self, memberid):
+        """
+        Checks, whether messages to the given member shall be encrypted using session keys.
+
+        @rtype: C{Boolean}
+        """
+        return self._enabled and self._capable.has_key(memberid)
+
+    def encrypt(self, message, credential, algName):
+        """
+        Encrypts the message with the current session key for the given credential.
+
+        A new session key is created (and encrypted with the public key of the credential) if none is
+        available yet or if the current one has expired.
+
+        @param message: Plain text to be encrypted
+        @type message: C{String}
+        @param credential: Credential of the receiver
+        @type credential: L{securitymanager.Credential}
+        @param algName: Name of the public key algorithm for encrypting the session key
+        @type algName: C{String}
+        @return: The encrypted session key and the cipher text
+        @rtype: C{Tuple} (C{String}, C{String})
+        """
+        storeKey = (credential.getId(), algName, credential.getKey())
+        self._lock.acquire()
+        try:
+            entry = None
+            if self._outgoing.has_key(storeKey):
+                entry = self._outgoing[storeKey]
+                if self._lifetime is not None and time.time() - entry[2] > self._lifetime:
+                    entry = None
+                elif self._maxBytes is not None and entry[3] > self._maxBytes:
+                    entry = None
+            if not entry:
+                entry = self._createSessionKey(credential, algName)
+                self._outgoing[storeKey] = entry
+            entry[3] += len(message)
+            sessionKey, wrappedKey = entry[0], entry[1]
+        finally:
+            self._lock.release()
+        return wrappedKey, self._encryptSymmetric(zlib.compress(message), sessionKey)
+
+    def decrypt(self, ciphertext, wrappedKey, algName):
+        """
+        Decrypts the message with the session key given in encrypted form.
+
+        The session key is only decrypted (using the private key for the given algorithm) if it has
+        not been seen before.
+
+        @param ciphertext: The encrypted message
+        @type ciphertext: C{String}
+        @param wrappedKey: The session key encrypted with the public key of this node
+        @type wrappedKey: C{String}
+        @param algName: Name of the public key algorithm used for encrypting the session key
+        @type algName: C{String}
+        @return: The plain text
+        @rtype: C{String}
+        """
+        from Crypto.Hash import SHA
+        digest = SHA.new(algName + wrappedKey).digest()
+        self._lock.acquire()
+        try:
+            sessionKey = self._incoming.get(digest)
+        finally:
+            self._lock.release()
+
+        if sessionKey is None:
+            from securitycontroller import getSecurityController
+            sessionKey = binascii.unhexlify(getSecurityController().decrypt(wrappedKey, algName))
+            self._lock.acquire()
+            try:
+                if not self._incoming.has_key(digest):
+                    self._incoming[digest] = sessionKey
+                    self._incomingOrder.append(digest)
+                    if len(self._incomingOrder) > self._cacheSize:
+                        del self._incoming[self._incomingOrder.pop(0)]
+            finally:
+                self._lock.release()
+
+        return zlib.decompress(self._decryptSymmetric(ciphertext, sessionKey))
+
+    def invalidate(self, credentialid = None):
+        """
+        Drops the session keys for sending - for the given credential only or all of them.
+
+        New session keys are created with the next message.
+        """
+        self._lock.acquire()
+        try:
+            for storeKey in self._outgoing.keys():
+                if credentialid is None or storeKey[0] == credentialid:
+                    del self._outgoing[storeKey]
+        finally:
+            self._lock.release()
+
+    def _createSessionKey(self, credential, algName):
+        """
+        Creates a new random session key and encrypts it with the public key of the credential.
+
+        @return: Entry for the store of outgoing session keys
+        @rtype: C{List}
+        """
+        from securitycontroller import getSecurityController
+        sessionKey = os.urandom(SESSION_KEY_LENGTH)
+        wrappedKey = getSecurityController().encrypt(binascii.hexlify(sessionKey), credential.getKey(), algName)
+        return [sessionKey, wrappedKey, time.time(), 0]
+
+    def _deriveKeys(self, sessionKey):
+        """
+        Derives the keys for encryption and message authentication from the session key.
+        """
+        from Crypto.Hash import SHA256
+        return SHA256.new(sessionKey + 'enc').digest(), SHA256.new(sessionKey + 'mac').digest()
+
+    def _encryptSymmetric(self, plaintext, sessionKey):
+        """
+        Encrypts with AES in CBC mode; the result is the random IV, the cipher text and a HMAC over both.
+        """
+        from Crypto.Cipher import AES
+        from Crypto.Hash import SHA256
+        encKey, macKey = self._deriveKeys(sessionKey)
+        padding = AES_BLOCK_SIZE - len(plaintext) % AES_BLOCK_SIZE
+        plaintext = plaintext + chr(padding) * padding
+        iv = os.urandom(AES_BLOCK_SIZE)
+        ciphertext = iv + AES.new(encKey, AES.MODE_CBC, iv).encrypt(plaintext)
+        return ciphertext + hmac.new(macKey, ciphertext, SHA256).digest()
+
+    def _decryptSymmetric(self, ciphertext, sessionKey):
+        """
+        Inverse function for L{_encryptSymmetric}.
+        """
+        from Crypto.Cipher import AES
+        from Crypto.Hash import SHA256
+        from errorhandling import G4dsCommunicationException
+        encKey, macKey = self._deriveKeys(sessionKey)
+        macLength = SHA256.digest_size
+        if len(ciphertext) < 2 * AES_BLOCK_SIZE + macLength or (len(ciphertext) - macLength) % AES_BLOCK_SIZE:
+            raise G4dsCommunicationException('Invalid length of symmetrically encrypted message.')
+        mac = ciphertext[-macLength:]
+        ciphertext = ciphertext[:-macLength]
+        if not _digestsEqual(hmac.new(macKey, ciphertext, SHA256).digest(), mac):
+            raise G4dsCommunicationException('Message authentication failed for symmetrically encrypted message.')
+        iv = ciphertext[:AES_BLOCK_SIZE]
+        plaintext = AES.new(encKey, AES.MODE_CBC, iv).decrypt(ciphertext[AES_BLOCK_SIZE:])
+        return plaintext[:-ord(plaintext[-1])]
@@ -31,9 +31,13 @@ def test():
 ##    testLogging()
 ##    checkEndpoints()
 ##    testTcp()
+##    testSoapThroughput()
+##    testEnvelopeCodec()
 ##    testRoutingTableManager()
 ##    testG4dsService()
 ##    testPermissionStuff()
+##    testAuthorisationSpeed()
+##    testLoggingSpeed()
     
 def testTcp():
     from protocolcontroller import getProtocolController
@@ -42,6 +46,126 @@ def testTcp():
     raw_input()
     
     
+def testSoapThroughput(peers = 4, messages = 100, messageSize = 2000, port = 18080):
+    """
+    Benchmark: messages per second for the SOAP protocol with several peers sending concurrently.
+    
+    A local listener is set up for each configuration (single threaded / threaded listener, without /
+    with keep alive); each peer has got its own protocol instance and sends its messages in a thread of 
+    its own. The rates are given for the sending side (until all peers are done) and the receiving side
+    (until the last message arrived).
+    """
+    import time
+    import threading
+    import protocols.config
+    from protocols.soapprotocol import ProtocolImplementation
+    
+    protocols.config.soap_local_address = '127.0.0.1'
+    message = 'x' * messageSize
+    total = peers * messages
+    
+    for threaded, keepalive in [[0, 0], [1, 0], [1, 1]]:
+        protocols.config.soap_local_port = port
+        protocols.config.soap_threaded_server = threaded
+        protocols.config.soap_keepalive = keepalive
+        endpoint = 'http://127.0.0.1:%d' %(port)
+        port += 1
+        
+        received = []
+        lock = threading.Lock()
+        def callback(protocolname, message, source = None):
+            lock.acquire()
+            try:
+                received.append(time.time())
+            finally:
+                lock.release()
+        listener = ProtocolImplementation()
+        listener.listen(callback)
+        time.sleep(0.5)
+        
+        def sender():
+            protocol = ProtocolImplementation()
+            for i in range(messages):
+                protocol.sendMessage(endpoint, message)
+        
+        threads = []
+        for i in range(peers):
+            threads.append(threading.Thread(target = sender))
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        sendDuration = time.time() - start
+        while len(received) < total and time.time() - start < 60:
+            time.sleep(0.01)
+        receiveDuration = max(received) - start
+        listener.shutdown()
+        
+        print "threaded %d keepalive %d - %d peers: send %8.1f msg/s, receive %8.1f msg/s (%d of %d received)" %(threaded, 
+            keepalive, peers, total / sendDuration, len(received) / receiveDuration, len(received), total)
+    
+def testEnvelopeCodec(messageSize = 2000, rounds = 200):
+    """
+    Benchmark: bytes and CPU time per message for the original envelope and envelopes of version 2.
+    
+    Both envelopes are assembled and taken apart again the way the message handler does it, without 
+    encryption and signing (cipher text equals plain text, constant signature) - this way, only the 
+    costs of the envelope itself are measured.
+    """
+    import time
+    import zlib
+    import xmlconfig
+    from messagewrapper import getMessageWrapper
+    from envelopecodec import getEnvelopeCodec
+    
+    message = ('<data>' + 'G4DS test payload ' * (messageSize / 18 + 1))[:messageSize] + '</data>'
+    signature = '1234567890' * 13
+    fingerprint = 'f' * 40
+    wrapper = getMessageWrapper()
+    codec = getEnvelopeCodec()
+    
+    def legacy():
+        wrapped = wrapper.wrapServiceMessage('S10001', 'TEST', message)
+        plain, doc = wrapper.wrapG4dsPlain(wrapped, 'M100001', 'M100002', None)
+        signed, doc, node = wrapper.wrapForSigning(plain, signature, 'rsa', 'M100002', 'C100001', fingerprint)
+        encrypted, doc, node = wrapper.wrapForEncryption(signed, 'rsa')
+        xmltext, domtree = wrapper.wrapG4dsMessage(node, 2)
+        
+        size = len(xmltext)
+        data, rootnode = wrapper.unwrapG4dsMessage(xmltext)
+        alg, data = wrapper.unwrapForDecryption(data)
+        result = wrapper.unwrapForValidation(data, 1)
+        data, mid, senderid, refid = wrapper.unwrapG4dsPlain(result[3])
+        import xml.dom.ext.reader.Sax2
+        root = xml.dom.ext.reader.Sax2.FromXml(data)
+        return size
+    
+    def version2():
+        fields = {xmlconfig.g4ds_envelope_kind: xmlconfig.g4ds_service_node, xmlconfig.g4ds_envelope_id: 'S10001', 
+            xmlconfig.g4ds_envelope_name: 'TEST', xmlconfig.g4ds_plain_messageid: 'M100001', 
+            xmlconfig.g4ds_plain_senderid: 'M100002', xmlconfig.g4ds_signature_algorithm: 'rsa', 
+            xmlconfig.g4ds_signature_communityid: 'C100001', xmlconfig.g4ds_signature_fingerprint: fingerprint}
+        codec.getSignatureInput(fields, message)
+        fields[xmlconfig.g4ds_envelope_signature] = signature
+        inner = codec.wrapInner(fields, message)
+        xmltext = codec.wrapOuter(zlib.compress(inner), 'rsa')
+        
+        size = len(xmltext)
+        version, supported = codec.getEnvelopeInfo(xmltext)
+        alg, data, sessionKey, sessionKeysSupported = codec.unwrapOuter(xmltext)
+        fields, payload = codec.unwrapInner(zlib.decompress(data))
+        codec.getSignatureInput(fields, payload)
+        return size
+    
+    for name, function in [['original', legacy], ['version 2', version2]]:
+        start = time.clock()
+        for i in range(rounds):
+            size = function()
+        duration = time.clock() - start
+        print "%-10s - payload %d bytes: %d bytes per message, %.3f ms CPU per message" %(name, len(message), 
+            size, duration * 1000 / rounds)
+    
 def checkEndpoints():
     from communicationmanager import getEndpointManager
     print len(getEndpointManager().getEndpointsForMember('M111', 'C12345'))
@@ -359,6 +483,128 @@ def testPermissionStuff():
     for actor, target, action in ata:
         print ("%s -> %s: %s " %(actor, target, action)).ljust(60,'.') + " %d" %getAuthorisationController().validate(actor, target, action)
     
+def testAuthorisationSpeed(couples = 100, rules = 500, decisions = 100000):
+    """
+    Benchmark: access control decisions per second against a large (synthetic) policy set.
+    
+    All the rules apply to the same set of couples of actor / target - each rule with two AND combined parts
+    of three OR combined action strings; most of the rules only hit deep down the action hierarchy. The
+    decisions are taken with a linear walk through the rules applying to the couple (as done before compiling
+    the matrix), with the prefix trees only and with the cache of decisions. Logging is left out.
+    """
+    import time
+    import random
+    import config
+    from authorisationcontroller import AuthorisationController, REACTION_POS, REACTION_NEG, IDSET_IDS, IdSet, ProductCouples
+    from authorisationcontroller import _containsCouple
+    
+    subsystems = ['community', 'member', 'service', 'routing', 'control']
+    actionList = []
+    for s in subsystems:
+        for i in range(40):
+            actionList.append('g4ds.%s.action%d.sub%d' %(s, i, i % 7))
+    ruleList = []
+    for i in range(rules):
+        first = [('action', 'g4ds.%s.action%d' %(random.choice(subsystems), random.randint(0, 39))) for j in range(3)]
+        second = [('action', 'g4ds.%s' %(random.choice(subsystems))) for j in range(3)]
+        ruleList.append(([first, second], random.choice([REACTION_POS, REACTION_NEG])))
+    ruleList.append(([[('action', '*')]], REACTION_POS))
+    
+    controller = AuthorisationController()
+    controller._logEntry = lambda actor, target, action, reaction, reportPolicyError = 0: None
+    pairs = []
+    for i in range(couples):
+        pairs.append(('M%06d' %(i), 'C%06d' %(i % 10)))
+    actors = IdSet(IDSET_IDS, [actor for actor, target in pairs])
+    targets = IdSet(IDSET_IDS, [target for actor, target in pairs])
+    for actionFilters, reaction in ruleList:
+        controller._rules.append(([[ProductCouples(actors, targets)]], actionFilters, reaction))
+    start = time.time()
+    for actor, target in pairs:
+        controller._getCompiledRules(actor, target)
+    print "compiling %d couples with %d rules each: %.3f s" %(couples, len(ruleList), time.time() - start)
+    requests = [random.choice(pairs) + (random.choice(actionList),) for i in range(decisions)]
+    
+    def linear(actor, target, action):
+        for ruleCouples, maction, mreaction in controller._rules:
+            if not _containsCouple(ruleCouples, actor, target):
+                continue
+            for mactionAnd in maction:
+                oneAnd = 0
+                for actionid, mactionOr in mactionAnd:
+                    if controller._checkAgainstOneActionString(action, mactionOr):
+                        oneAnd = 1
+                        break
+                if not oneAnd:
+                    break
+            if oneAnd:
+                return mreaction
+    
+    def trie(actor, target, action):
+        return controller._getCompiledRules(actor, target).lookup(action)
+    
+    cacheSize = config.POLICY_DECISION_CACHE_SIZE
+    for name, function, size in [['linear', linear, 0], ['prefix tree', trie, 0], ['cached', controller.validate, cacheSize]]:
+        config.POLICY_DECISION_CACHE_SIZE = size
+        start = time.time()
+        for actor, target, action in requests:
+            function(actor, target, action)
+        print "%-12s %10.0f decisions/s" %(name, decisions / (time.time() - start))
+    config.POLICY_DECISION_CACHE_SIZE = cacheSize
+    
+def testLoggingSpeed(messages = 100000):
+    """
+    Benchmark: time spent by the caller per log message.
+    
+    Messages are written synchronously and by the background writer; the time for writing the queued messages
+    on closing down is given separately. Finally, messages of a category not logged in the log level are passed
+    formatted by the caller and as format string with arguments. The messages are written to a temporary file.
+    """
+    import os
+    import time
+    import tempfile
+    import config
+    from g4dslogging import FileLogger, COMMUNICATION_INCOMING_ERROR, COMMUNICATION_INCOMING_MSG_DETAILS
+    
+    handle, filename = tempfile.mkstemp()
+    os.close(handle)
+    settings = {'LOGGING_FILENAME': filename, 'ENABLE_SYSLOG': 0, 'SYSLOG_IDENTIFIER': 'g4ds'}
+    for name, value in settings.items():
+        setattr(config, name, value)
+    level = config.LOGGING_LEVEL
+    asynchronous = config.LOGGING_ASYNC
+    queueSize = config.LOGGING_QUEUE_SIZE
+    try:
+        config.LOGGING_LEVEL = 5
+        config.LOGGING_QUEUE_SIZE = messages + 10
+        for name, flag in [['synchronous', 0], ['background', 1]]:
+            config.LOGGING_ASYNC = flag
+            logger = FileLogger()
+            start = time.time()
+            for i in range(messages):
+                logger.newMessage(COMMUNICATION_INCOMING_ERROR, 'Benchmark message number %d' %(i))
+            duration = time.time() - start
+            start = time.time()
+            logger.closedown()
+            print "%-20s %8.2f us per message (closing down: %.3f s)" %(name, duration / messages * 1000000, time.time() - start)
+            
+        config.LOGGING_LEVEL = 0
+        logger = FileLogger()
+        start = time.time()
+        for i in range(messages):
+            logger.newMessage(COMMUNICATION_INCOMING_MSG_DETAILS, '-- Size of msg (brutto | netto): %d | %d Bytes' %(i, i))
+        print "%-20s %8.2f us per message" %('disabled, formatted', (time.time() - start) / messages * 1000000)
+        start = time.time()
+        for i in range(messages):
+            logger.newMessage(COMMUNICATION_INCOMING_MSG_DETAILS, '-- Size of msg (brutto | netto): %d | %d Bytes', i, i)
+        print "%-20s %8.2f us per message" %('disabled, lazy', (time.time() - start) / messages * 1000000)
+        logger.closedown()
+    finally:
+        config.LOGGING_LEVEL = level
+        config.LOGGING_ASYNC = asynchronous
+        config.LOGGING_QUEUE_SIZE = queueSize
+        os.remove(filename)
+    
 if __name__ == "__main__":
     import sys
     if len(sys.argv) > 1:
@@ -28,3 +28,18 @@ def generateId(type = TYPE_COMMUNITY):
     @todo: Implement unique properly - currently just a random mumber between 0 and 1000000
     """
     return type + str(random.randint(0,1000000))
+
+def getKeyFingerprint(key):
+    """
+    Calculates the fingerprint for a public key.
+    
+    White spaces are not taken into account; the key strings are passed through XML documents
+    and the line breaks might not survive.
+    
+    @param key: Public key in string representation
+    @type key: C{String}
+    @return: Hex representation of the SHA-1 digest of the key
+    @rtype: C{String}
+    """
+    from Crypto.Hash import SHA
+    return SHA.new(''.join(str(key).split())).hexdigest()
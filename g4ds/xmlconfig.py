@@ -13,6 +13,15 @@ Modules import that module and may read the settings important to them.
 
 # root element
 g4ds_root_node = 'g4ds'
+g4ds_envelope_version = 'version'           # version of the envelope (missing for the original format)
+g4ds_envelope_versions = 'envelopes'        # highest version of envelopes the sender is able to receive
+
+# inner document of envelopes of version 2 (see envelopecodec)
+g4ds_envelope_inner_node = 'g4dsmsg'
+g4ds_envelope_kind = 'kind'
+g4ds_envelope_id = 'id'
+g4ds_envelope_name = 'name'
+g4ds_envelope_signature = 'signature'
 
 # plain root element
 g4ds_plain_root = 'g4dsplain'
@@ -37,6 +46,8 @@ g4ds_service_data = 'data'
 g4ds_encryption_node = 'enc'
 g4ds_encryption_algorithm = 'algorithm'
 g4ds_encryption_data = 'data'
+g4ds_encryption_sessionkey = 'sessionkey'
+g4ds_encryption_sessionkeys_supported = 'sessionkeys'
 
 # G4DS signature chunks
 g4ds_signature_node = 'signed'
@@ -45,6 +56,7 @@ g4ds_signature_senderid = "senderid"
 g4ds_signature_communityid = "communityid"
 g4ds_signature_data = 'data'
 g4ds_signature_signature = 'signature'
+g4ds_signature_fingerprint = 'fingerprint'
 
 
 #
@@ -39,9 +39,34 @@ LOCAL_COMPUTER_TYPE = 'pc x86'
 ## Data processing options
 ##
 
-# interval between two queue checkings of the data engine
+# maximum time the data engine waits for new items before it checks whether it should shut down
+# (new events wake up the data engine immediately - no polling interval involved here)
 DATA_ENGINE_PROCESSING_INTERVAL = 5     # seconds
 
+# number of worker threads of the data engine; independent events are processed concurrently,
+# the reactions for one event are always carried out in order by one worker
+DATA_ENGINE_WORKERS = 4
+
+# maximum number of items held in memory for each data engine queue (0 for no limit)
+DATA_ENGINE_QUEUE_SIZE = 1000
+
+# what to do if a data engine queue is full
+#   'block' - the producer (e.g. the event trigger) has to wait until there is room again (back-pressure)
+#   'drop_newest' - the new event is discarded
+#   'drop_oldest' - the oldest event in the queue is discarded
+#   'spill' - the new event is written to a spill file in DATA_ENGINE_QUEUE_SPILL_DIRECTORY and read back later
+DATA_ENGINE_QUEUE_OVERFLOW_POLICY = 'block'
+
+# maximum time a producer is blocked for policy 'block' - the event is dropped afterwards (None for no limit)
+DATA_ENGINE_QUEUE_PUT_TIMEOUT = None     # seconds
+
+# maximum time a G4DS dispatch thread is blocked for policy 'block' when handing over an ioids event from a
+# remote node - these threads serve all incoming G4DS traffic, hence they must never wait without a limit
+DATA_ENGINE_REMOTE_QUEUE_PUT_TIMEOUT = 5     # seconds
+
+# directory for the spill files of the data engine queues (policy 'spill' only)
+DATA_ENGINE_QUEUE_SPILL_DIRECTORY = './'
+
 # path of file(s) containing ioids policy rules
 LOCATION_POLICY_FILES = ['descriptions/ioids_policy.xml']
 
@@ -70,6 +95,14 @@ LOGGING_LEVEL = 4
 ENABLE_SYSLOG = 0
 SYSLOG_IDENTIFIER = 'ioids'
 
+# 3) Writing of the log file in a background thread (see ioidslogging.LogWriter) - set to 0 for writing on the 
+# thread of the caller; maximum number of messages queued (further messages are dropped), seconds messages are kept 
+# in the queue at most and number of messages queued for writing them before the interval has passed
+LOGGING_ASYNC = 1
+LOGGING_QUEUE_SIZE = 10000
+LOGGING_FLUSH_INTERVAL = 1
+LOGGING_BATCH_SIZE = 100
+
 ## ########################################
 ##
 ## G4DS Connection options
@@ -106,12 +139,30 @@ DB_POLL_INTERVAL = 5   # 5 seconds - testing purposes
 # location for status file in file system - needed for remembering the latest event ids for trigger mechanism
 LOCATION_EVENT_ID_STATUS_FILE = './event_status.dat'
 
+# maximum number of events requested from the database in one go - a backlog is fetched page by page
+# and the id up to which all events have been processed is written to the status file after each page
+# (None for fetching everything in one request)
+DB_POLL_PAGE_SIZE = 500
+
 # Datatype of the connected database (connected to the XML RPC interface)
 DB_DATA_TYPE = 'Postgresv8.0'
 
+# Let the SOAP database server insert whole event trees in one transaction with bulk statements
+# (requires PostgreSQL 8.2 or higher on the server side because of INSERT ... RETURNING)
+DB_BULK_INSERT = 0
+
+# Ask the SOAP database server for replies in the compact format rather than XML (smaller and
+# cheaper to parse); servers without support for it reply with XML anyway
+DB_COMPACT_REPLIES = 1
+
 # IOIDS Event type
 IOIDS_EVENT_TYPE = 'ioids'
 
+# rows, which are practically never changed (computer types, event types, classifications, ...) are cached in memory;
+# maximum number of cached rows (0 disables the cache) and time to live for a cached row (None for no expiry)
+DB_CACHE_SIZE = 1000
+DB_CACHE_TTL = 3600     # seconds
+
 ## ########################################
 ##
 ## Database extension information
@@ -23,66 +23,218 @@ def getDataEngine():
     return _dataEngine
 
 class DataEngine:
+    """
+    Processes events from the local database as well as ioids events from remote nodes.
+    
+    Incoming items are put into bounded queues (L{eventqueue.EventQueue}); all queues share
+    one condition, hence a worker is woken up as soon as a new item arrives.
+    
+    A pool of workers takes items from the queues; each item is processed completely by one
+    worker, so the reactions for one event are carried out in the order given by the policy engine.
+    """
 
     def __init__(self):
         """
         Sets up the queues for incoming messages.
         """
-        self._localEvents = []
-        self._localIoidsEvents =[]
+        from config import DATA_ENGINE_QUEUE_SIZE, DATA_ENGINE_QUEUE_OVERFLOW_POLICY, DATA_ENGINE_QUEUE_PUT_TIMEOUT, DATA_ENGINE_QUEUE_SPILL_DIRECTORY
+        from config import DATA_ENGINE_REMOTE_QUEUE_PUT_TIMEOUT
+        from eventqueue import EventQueue
+        import threading
+        
+        self._condition = threading.Condition()
+        self._localEvents = EventQueue('local_events', DATA_ENGINE_QUEUE_SIZE, DATA_ENGINE_QUEUE_OVERFLOW_POLICY,
+            DATA_ENGINE_QUEUE_PUT_TIMEOUT, DATA_ENGINE_QUEUE_SPILL_DIRECTORY, self._condition, self._itemDropped)
+        self._localIoidsEvents = EventQueue('local_ioids_events', DATA_ENGINE_QUEUE_SIZE, DATA_ENGINE_QUEUE_OVERFLOW_POLICY,
+            DATA_ENGINE_QUEUE_PUT_TIMEOUT, DATA_ENGINE_QUEUE_SPILL_DIRECTORY, self._condition, self._itemDropped)
+        # remote events are put by the G4DS dispatch threads - never block them without a limit
+        remoteTimeout = DATA_ENGINE_QUEUE_PUT_TIMEOUT
+        if remoteTimeout is None or remoteTimeout > DATA_ENGINE_REMOTE_QUEUE_PUT_TIMEOUT:
+            remoteTimeout = DATA_ENGINE_REMOTE_QUEUE_PUT_TIMEOUT
+        self._remoteIoidsEvents = EventQueue('remote_ioids_events', DATA_ENGINE_QUEUE_SIZE, DATA_ENGINE_QUEUE_OVERFLOW_POLICY,
+            remoteTimeout, DATA_ENGINE_QUEUE_SPILL_DIRECTORY, self._condition)
+        # order matters here - it's the priority of the queues
+        self._queues = [self._localEvents, self._localIoidsEvents, self._remoteIoidsEvents]
         self._remoteEvents = []
         self._running = 0
+        self._workers = 0
+        self._busyWorkers = 0
+        self._processedItems = 0
+        self._statsLock = threading.Lock()
+        self._processedListeners = []
+        self._droppedListeners = []
     
     def startup(self):
         """
-        Start up the data engine in its background thread.
+        Start up the data engine workers in their background threads.
         """
-        from config import DATA_ENGINE_PROCESSING_INTERVAL
+        from config import DATA_ENGINE_PROCESSING_INTERVAL, DATA_ENGINE_WORKERS
         self._interval = DATA_ENGINE_PROCESSING_INTERVAL
+        self._workers = max(1, DATA_ENGINE_WORKERS)
         self._running = 1
         import thread
-        thread.start_new_thread(self.runUntilShutdown, ())
+        for workerId in range(self._workers):
+            thread.start_new_thread(self.runUntilShutdown, (workerId,))
 ##        self.runUntilShutdown()
         
         from ioidslogging import DATAENGINE_STATUS, getDefaultLogger
-        getDefaultLogger().newMessage(DATAENGINE_STATUS, 'Data engine process started')
+        getDefaultLogger().newMessage(DATAENGINE_STATUS, 'Data engine process started (%d workers)' %(self._workers))
         
         
-    def runUntilShutdown(self):
+    def runUntilShutdown(self, workerId = 0):
         """
-        In here, all the queues are checked frequently and appropriate actions are undertaken.
+        In here, one worker waits for new items in any of the queues and undertakes the appropriate actions.
+        
+        The worker is woken up immediately whenever a new item is put into a queue; the processing
+        interval is only the maximum time between two checks, whether the data engine should shut down.
         """
         from ioidslogging import DATAENGINE_PROCESSING_DETAILS, getDefaultLogger, DATAENGINE_ERROR_GENERIC
+        from eventqueue import getNextItem
         
-        import time
-        time.sleep(self._interval)
         while self._running:
+            queue, item = getNextItem(self._queues, self._interval)
+            if not self._running:
+                break
+            if queue is None:
+                getDefaultLogger().newMessage(DATAENGINE_PROCESSING_DETAILS, 'Data engine details (worker %d): no new items within %d seconds', workerId, self._interval)
+                continue
+            self._updateWorkerStatistics(1, 0)
+            # processing may modify the item - hence, get hold of its id first
+            itemId = self._getItemId(queue, item)
             try:
-                getDefaultLogger().newMessage(DATAENGINE_PROCESSING_DETAILS, 'Data engine details: check my lists')
-                counter = 0
-                while len(self._localEvents):
-                    self._processEventFromLocal(self._localEvents[0])
-                    del self._localEvents[0]
-                    counter += 1
-                getDefaultLogger().newMessage(DATAENGINE_PROCESSING_DETAILS, '-- Data engine details: Processed %d local events.' %(counter))
-                counter = 0
-                while len(self._localIoidsEvents):
-                    self._processIoidsEventFromLocal(self._localIoidsEvents[0])
-                    del self._localIoidsEvents[0]
-                    counter += 1
-                getDefaultLogger().newMessage(DATAENGINE_PROCESSING_DETAILS, '-- Data engine details: Processed %d local ioids events.' %(counter))
-##            except Exception, msg:
-            except ValueError, msg:
-                getDefaultLogger().newMessage(DATAENGINE_ERROR_GENERIC, 'Data engine ERROR: %s' %(msg))
-            time.sleep(self._interval)
+                try:
+                    if queue is self._localEvents:
+                        self._processEventFromLocal(item)
+                    elif queue is self._localIoidsEvents:
+                        self._processIoidsEventFromLocal(item)
+                    elif queue is self._remoteIoidsEvents:
+                        self._processIoidsEventFromRemote(item[0], item[1])
+                    getDefaultLogger().newMessage(DATAENGINE_PROCESSING_DETAILS, '-- Data engine details (worker %d): Processed item from queue %s (%d left).', workerId, queue.getName(), len(queue))
+                except Exception, msg:
+                    # a single broken item must not take down the worker
+                    getDefaultLogger().newMessage(DATAENGINE_ERROR_GENERIC, 'Data engine ERROR (worker %d): %s: %s' %(workerId, msg.__class__.__name__, msg))
+            finally:
+                self._updateWorkerStatistics(-1, 1)
+                self._notifyListeners(self._processedListeners, queue, itemId)
+        
+    def _updateWorkerStatistics(self, busyDelta, processedDelta):
+        """
+        Maintains the counters for the worker pool.
+        """
+        self._statsLock.acquire()
+        try:
+            self._busyWorkers += busyDelta
+            self._processedItems += processedDelta
+        finally:
+            self._statsLock.release()
+        
+    def addProcessedListener(self, listener):
+        """
+        Registers a function to be called whenever an item from the local queues has been processed.
+        
+        The listener is passed the name of the queue and the id of the event (or ioids event). It is 
+        called from the worker threads - also if processing the item failed. Items dropped from the 
+        queue are reported to the listeners registered with L{addDroppedListener} instead.
+        
+        @param listener: Function to be called after processing
+        @type listener: C{Function}
+        """
+        self._processedListeners.append(listener)
+        
+    def addDroppedListener(self, listener):
+        """
+        Registers a function to be called whenever an item is dropped from one of the local queues, because it was full.
+        
+        The listener is passed the name of the queue and the id of the event (or ioids event) - the 
+        same way as for L{addProcessedListener}.
+        
+        @param listener: Function to be called for dropped items
+        @type listener: C{Function}
+        """
+        self._droppedListeners.append(listener)
+        
+    def _itemDropped(self, queue, item):
+        """
+        Called by the local queues for each item dropped (see L{eventqueue.EventQueue}).
+        """
+        self._notifyListeners(self._droppedListeners, queue, self._getItemId(queue, item))
+        
+    def _getItemId(self, queue, item):
+        """
+        Determines the id of an item from one of the local queues.
+        
+        @return: Id of the event (or ioids event) or None for items from other queues
+        @rtype: C{String}
+        """
+        if queue is self._localEvents:
+            return item[1].get('event_id')
+        elif queue is self._localIoidsEvents:
+            return item[1].get('ioids_event_id')
+        return None
+        
+    def _notifyListeners(self, listeners, queue, itemId):
+        """
+        Passes the id of an item from one of the local queues to the given listeners.
+        
+        Errors in listeners are logged - they must neither stop a worker nor a producer.
+        """
+        if itemId is None:
+            return
+        for listener in listeners:
+            try:
+                listener(queue.getName(), itemId)
+            except Exception, msg:
+                from ioidslogging import DATAENGINE_ERROR_GENERIC, getDefaultLogger
+                getDefaultLogger().newMessage(DATAENGINE_ERROR_GENERIC, 'Data engine ERROR: listener for queue %s failed - %s: %s' 
+                    %(queue.getName(), msg.__class__.__name__, msg))
+        
+    def getWorkerStatistics(self):
+        """
+        Collects the metrics of the worker pool.
+        
+        @return: Number of workers, number of workers currently processing an item and number of processed items
+        @rtype: C{Dict}
+        """
+        self._statsLock.acquire()
+        try:
+            stats = {}
+            stats['workers'] = self._workers
+            stats['busy'] = self._busyWorkers
+            stats['processed'] = self._processedItems
+            return stats
+        finally:
+            self._statsLock.release()
         
     def shutdown(self):
         """
-        Shutdown the data engine thread.
+        Shutdown the data engine workers.
         """
         self._running = 0
+        self._condition.acquire()
+        self._condition.notifyAll()
+        self._condition.release()
         from ioidslogging import DATAENGINE_STATUS, getDefaultLogger
         getDefaultLogger().newMessage(DATAENGINE_STATUS, 'Data engine process stopped')
+        
+    def getQueueStatistics(self):
+        """
+        Collects the metrics of all data engine queues.
+        
+        @return: Statistics for each queue (see L{eventqueue.EventQueue.getStatistics})
+        @rtype: C{List} of C{Dict}
+        """
+        stats = []
+        for queue in self._queues:
+            stats.append(queue.getStatistics())
+        return stats
+        
+    def _enqueue(self, queue, item):
+        """
+        Puts one item into the given queue and logs, if it had to be dropped.
+        """
+        if not queue.put(item):
+            from ioidslogging import DATAENGINE_ERROR_GENERIC, getDefaultLogger
+            getDefaultLogger().newMessage(DATAENGINE_ERROR_GENERIC, 'Data engine ERROR: queue %s is full - item dropped' %(queue.getName()))
 
     def _executeOneReaction(self, event, reaction):
         """
@@ -259,7 +411,7 @@ class DataEngine:
         Should be called from the ioids event trigger.
         """
         print "Received event (local) with id: %s - put it into event queue." %(event[1]['event_id'])
-        self._localEvents.append(event)
+        self._enqueue(self._localEvents, event)
         
     def newIoidsEventFromLocal(self, ioidsevent):
         """
@@ -268,12 +420,23 @@ class DataEngine:
         Should be called from the ioids event trigger.
         """
         print "Received ioids event (local) with id: %s - put into ioids event queue." %(ioidsevent[1]['ioids_event_id'])
-        self._localIoidsEvents.append(ioidsevent)
+        self._enqueue(self._localIoidsEvents, ioidsevent)
         
     def newIoidsEventFromRemote(self, ioidsevent, relations = []):
+        """
+        Processes the occurence of a new ioids event from a remote node.
+        
+        Should be called from the G4DS connector.
+        """
+        print "I received from remote Event with Relations - put into remote ioids event queue."
+        self._enqueue(self._remoteIoidsEvents, (ioidsevent, relations))
+        
+    def _processIoidsEventFromRemote(self, ioidsevent, relations = []):
+        """
+        Processes one item from the remote ioids event queue.
+        """
         from dbconnector import getDBConnector
 ##        print "I received from remote:\nEvent: %s\nRelations: %s" %(event, relations)
-        print "I received from remote Event with Relations"
         primKey = getDBConnector().insertIoidsEvent(ioidsevent)
         eventId = getDBConnector().getIoidsEvent(primKey, 0)[1]['event_id']
         self._remoteEvents.append(eventId)      # our trigger must not pick up this event
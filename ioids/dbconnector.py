@@ -18,6 +18,9 @@ import soapsytools.dbconnector
 # constant for database type
 DB_CONNECTION_TYPE_XML_RPC = 'xmlrpc'
 
+# relations kept in the row cache - the SoapSy ones plus the ones for IOIDS
+IOIDS_CACHED_RELATIONS = soapsytools.dbconnector.CACHED_RELATIONS + ['ioids_classification', 'ioids_peer', 'ioids_relation_type']
+
 # "singleton"
 _dbConnector = None
 def getDBConnector():
@@ -40,13 +43,13 @@ class IoidsDBConnector(soapsytools.dbconnector.DBConnector):
         
         Most of the settings are taken from the global config file.
         """
-        from config import DATABASE_CONNECTION_TYPE, SOAP_SERVER_URL
+        from config import DATABASE_CONNECTION_TYPE, SOAP_SERVER_URL, DB_CACHE_SIZE, DB_CACHE_TTL
         from errorhandling import IoidsException
             
         if DATABASE_CONNECTION_TYPE !=DB_CONNECTION_TYPE_XML_RPC:
             raise IoidsException('The database type defined in the config file is not supported by IOIDS')
             
-        soapsytools.dbconnector.DBConnector.__init__(self, SOAP_SERVER_URL)
+        soapsytools.dbconnector.DBConnector.__init__(self, SOAP_SERVER_URL, DB_CACHE_SIZE, DB_CACHE_TTL, IOIDS_CACHED_RELATIONS)
                 
     def getIoidsEvents(self, conditions = []):
         """
@@ -66,6 +69,36 @@ class IoidsDBConnector(soapsytools.dbconnector.DBConnector):
         """
         return self.getIoidsEvents([['ioids_event_id', OPERATOR_GREATER_THEN_OR_EQUAL, str(minIoidsEventId)]])
         
+    def iterIoidsEvents(self, conditions = [], orderBy = None, limit = None):
+        """
+        Collects available ioids events from the database and hands them out one by one.
+        
+        Other than L{getIoidsEvents}, the reply is parsed incrementally.
+        
+        @param orderBy: Column to sort the ioids events by (None for no particular order)
+        @type orderBy: C{String}
+        @param limit: Maximum number of ioids events (None for no limit)
+        @type limit: C{int}
+        @return: Generator for the ioids event entries (dictionaries with 'name' and 'attributes')
+        @rtype: C{Generator} of C{Dict}
+        """
+        from messagewrapper import getXMLDBWrapper
+        xml = getXMLDBWrapper().wrapSelect('ioids_event', 'all', conditions, orderBy, limit)
+        result = self._performRequest(xml)
+        for resultId, relation in getXMLDBWrapper().iterSelectReply(result):
+            yield relation
+        
+    def iterIoidsEventsFromEventID(self, minIoidsEventId, limit = None):
+        """
+        Hands out all ioids events with ioids event id greater then the given one one by one.
+        
+        With a limit, only one page of ioids events (sorted by ioids event id) is requested.
+        
+        @param limit: Maximum number of ioids events (None for no limit)
+        @type limit: C{int}
+        """
+        return self.iterIoidsEvents([['ioids_event_id', OPERATOR_GREATER_THEN_OR_EQUAL, str(minIoidsEventId)]], 'ioids_event_id', limit)
+        
         
 ##    def insertIoidsEvent(self, eventDict, relations = []):
     def insertIoidsEvent(self, ioidsEventEntryList):
@@ -83,6 +116,7 @@ class IoidsDBConnector(soapsytools.dbconnector.DBConnector):
         result = self._performRequest(xml)
 ##        print result
         decode = getXMLDBWrapper().parseInsertReply(result)
+        self._invalidateInserted(decode)
 ##        print "Result - primary key: %s " %(decode[0][2])
         return decode[0][2][1:len(decode[0][2])-1]
         
@@ -98,6 +132,7 @@ class IoidsDBConnector(soapsytools.dbconnector.DBConnector):
         result = self._performRequest(xml)
         
         decode = getXMLDBWrapper().parseInsertReply(result)
+        self._invalidateInserted(decode)
 ##        print "Result - primary key: %s " %(decode[0][2])
         return decode[0][2][1:len(decode[0][2])-1]
         
@@ -63,3 +63,13 @@ class IoidsDescriptionException(IoidsException):
         Passes the message to the super constructor.
         """
         IoidsException.__init__(self, message)
+
+class IoidsQueueException(IoidsException):
+    """
+    Exception for problems with the data engine queues.
+    """
+    def __init__(self, message):
+        """
+        Passes the message to the super constructor.
+        """
+        IoidsException.__init__(self, message)
@@ -0,0 +1,352 @@
+"""
+Bounded, thread safe queues for the data engine.
+
+Inter-Organisational Intrusion Detection System (IOIDS)
+
+The data engine used to poll plain lists in a fixed interval. The queues in here are
+based on a deque and a condition; whoever puts an item into a queue, wakes up a waiting
+worker immediately. Several queues may share one condition - this way, one worker can wait
+for new items on all of its queues at the same time.
+
+When a queue is full, the configured overflow policy is applied:
+    - L{QUEUE_POLICY_BLOCK}: the producer is blocked until there is room again (back-pressure)
+    - L{QUEUE_POLICY_DROP_NEWEST}: the new item is discarded
+    - L{QUEUE_POLICY_DROP_OLDEST}: the oldest item in the queue is discarded
+    - L{QUEUE_POLICY_SPILL}: the new item is written to a spill file and read back later
+
+@author: Michael Pilgermann
+@contact: mailto:mpilgerm@glam.ac.uk
+@license: GPL (General Public License)
+"""
+
+import threading
+import time
+import os
+import cPickle
+from collections import deque
+
+QUEUE_POLICY_BLOCK = 'block'
+QUEUE_POLICY_DROP_NEWEST = 'drop_newest'
+QUEUE_POLICY_DROP_OLDEST = 'drop_oldest'
+QUEUE_POLICY_SPILL = 'spill'
+
+QUEUE_POLICIES = [QUEUE_POLICY_BLOCK, QUEUE_POLICY_DROP_NEWEST, QUEUE_POLICY_DROP_OLDEST, QUEUE_POLICY_SPILL]
+
+class EventQueue:
+    """
+    Bounded FIFO queue with back-pressure and overflow policies.
+
+    @ivar _items: The items currently held in memory
+    @type _items: C{collections.deque}
+    @ivar _condition: Condition for waking up consumers and blocked producers (may be shared between queues)
+    @type _condition: C{threading.Condition}
+    @ivar _maxSize: Maximum number of items in memory (0 for unbounded)
+    @type _maxSize: C{int}
+    @ivar _policy: Overflow policy (one out of L{QUEUE_POLICIES})
+    @type _policy: C{String}
+    @ivar _dropListener: Function called with the queue and each item dropped from it (or None)
+    @type _dropListener: C{Function}
+    """
+
+    def __init__(self, name, maxSize = 0, policy = QUEUE_POLICY_BLOCK, putTimeout = None,
+                    spillDirectory = None, condition = None, dropListener = None):
+        """
+        Initialises the queue and its statistics.
+
+        @param name: Name of the queue (used for statistics and the spill file)
+        @type name: C{String}
+        @param maxSize: Maximum number of items held in memory; 0 means no limit
+        @type maxSize: C{int}
+        @param policy: What to do if the queue is full - one out of L{QUEUE_POLICIES}
+        @type policy: C{String}
+        @param putTimeout: Seconds a producer is blocked at most (policy block only) - None for no limit;
+            the item is dropped after the time out
+        @type putTimeout: C{float}
+        @param spillDirectory: Directory for the spill file (policy spill only)
+        @type spillDirectory: C{String}
+        @param condition: Condition to be used for notification; a new one is created if None
+        @type condition: C{threading.Condition}
+        @param dropListener: Function called with the queue and each item dropped due to the overflow 
+            policy - outside the condition
+        @type dropListener: C{Function}
+        """
+        from errorhandling import IoidsQueueException
+        if policy not in QUEUE_POLICIES:
+            raise IoidsQueueException('Unknown overflow policy for queue %s: %s' %(name, policy))
+        if policy == QUEUE_POLICY_SPILL and not spillDirectory:
+            raise IoidsQueueException('No spill directory given for queue %s.' %(name))
+
+        self._name = name
+        self._maxSize = maxSize
+        self._policy = policy
+        self._putTimeout = putTimeout
+        self._dropListener = dropListener
+        self._items = deque()
+        if condition:
+            self._condition = condition
+        else:
+            self._condition = threading.Condition()
+
+        self._spillFileName = None
+        if spillDirectory:
+            self._spillFileName = os.path.join(spillDirectory, 'ioids_queue_%s.spill' %(name))
+        self._spilledItems = 0
+
+        self._enqueued = 0
+        self._dequeued = 0
+        self._dropped = 0
+        self._spilled = 0
+        self._highWaterMark = 0
+        self._blockedTime = 0.0
+
+    def getName(self):
+        """
+        GETTER
+        """
+        return self._name
+
+    def getCondition(self):
+        """
+        GETTER
+        """
+        return self._condition
+
+    def _isFull(self):
+        return self._maxSize and len(self._items) >= self._maxSize
+
+    def isEmpty(self):
+        """
+        Checks, whether there is anything to get from this queue - in memory or spilled.
+
+        The caller must hold the condition.
+        """
+        return not len(self._items) and not self._spilledItems
+
+    def __len__(self):
+        return len(self._items) + self._spilledItems
+
+    def put(self, item):
+        """
+        Puts an item into the queue and wakes up one waiting consumer.
+
+        If the queue is full, the overflow policy is applied.
+
+        @return: Indicates, whether the item was queued (1) or dropped (0)
+        @rtype: C{int}
+        """
+        self._condition.acquire()
+        try:
+            queued, dropped = self._put(item)
+        finally:
+            self._condition.release()
+        if self._dropListener:
+            for droppedItem in dropped:
+                self._dropListener(self, droppedItem)
+        return queued
+
+    def _put(self, item):
+        """
+        Applies the overflow policy and puts the item into the queue.
+
+        The caller must hold the condition.
+
+        @return: Indicates, whether the item was queued (1) or dropped (0) and the list of items dropped
+        @rtype: C{Tuple} of C{int} and C{List}
+        """
+        dropped = []
+        if self._isFull():
+            if self._policy == QUEUE_POLICY_BLOCK:
+                if not self._waitForRoom():
+                    self._dropped += 1
+                    return 0, [item]
+            elif self._policy == QUEUE_POLICY_DROP_NEWEST:
+                self._dropped += 1
+                return 0, [item]
+            elif self._policy == QUEUE_POLICY_DROP_OLDEST:
+                dropped.append(self._items.popleft())
+                self._dropped += 1
+            elif self._policy == QUEUE_POLICY_SPILL:
+                self._spill(item)
+                self._enqueued += 1
+                self._condition.notifyAll()
+                return 1, dropped
+        elif self._spilledItems and self._policy == QUEUE_POLICY_SPILL:
+            # keep the order - as long as there is something on disk, new items have to go there as well
+            self._spill(item)
+            self._enqueued += 1
+            self._condition.notifyAll()
+            return 1, dropped
+
+        self._items.append(item)
+        self._enqueued += 1
+        if len(self._items) > self._highWaterMark:
+            self._highWaterMark = len(self._items)
+        self._condition.notifyAll()
+        return 1, dropped
+
+    def _waitForRoom(self):
+        """
+        Blocks the producer until there is room in the queue or the put timeout elapsed.
+
+        The caller must hold the condition.
+        """
+        start = time.time()
+        while self._isFull():
+            if self._putTimeout is None:
+                self._condition.wait()
+            else:
+                remaining = self._putTimeout - (time.time() - start)
+                if remaining <= 0:
+                    self._blockedTime += time.time() - start
+                    return 0
+                self._condition.wait(remaining)
+        self._blockedTime += time.time() - start
+        return 1
+
+    def getNoWait(self):
+        """
+        Takes the oldest item from the queue without blocking.
+
+        The caller must hold the condition (see L{getNextItem} for the blocking version across several queues).
+
+        @return: The item or None, if the queue is empty
+        """
+        if not len(self._items) and self._spilledItems:
+            self._loadSpilled()
+        if not len(self._items):
+            return None
+        item = self._items.popleft()
+        self._dequeued += 1
+        # there might be blocked producers waiting for room
+        self._condition.notifyAll()
+        return item
+
+    def get(self, timeout = None):
+        """
+        Takes the oldest item from the queue; blocks until an item is available.
+
+        @param timeout: Maximum number of seconds to wait; None for no limit
+        @type timeout: C{float}
+        @return: The item or None, if the time out elapsed
+        """
+        queue, item = getNextItem([self], timeout)
+        return item
+
+    def _spill(self, item):
+        """
+        Appends one item to the spill file.
+
+        The caller must hold the condition.
+        """
+        file = open(self._spillFileName, 'ab')
+        try:
+            cPickle.dump(item, file, cPickle.HIGHEST_PROTOCOL)
+        finally:
+            file.close()
+        self._spilledItems += 1
+        self._spilled += 1
+
+    def _loadSpilled(self):
+        """
+        Reads back spilled items into memory (as many as fit) and rewrites the remainder.
+
+        The caller must hold the condition.
+        """
+        file = open(self._spillFileName, 'rb')
+        items = []
+        try:
+            while 1:
+                try:
+                    items.append(cPickle.load(file))
+                except EOFError:
+                    break
+        finally:
+            file.close()
+
+        if self._maxSize:
+            fit = self._maxSize - len(self._items)
+        else:
+            fit = len(items)
+        self._items.extend(items[:fit])
+        remainder = items[fit:]
+
+        if remainder:
+            file = open(self._spillFileName, 'wb')
+            try:
+                for item in remainder:
+                    cPickle.dump(item, file, cPickle.HIGHEST_PROTOCOL)
+            finally:
+                file.close()
+        else:
+            os.remove(self._spillFileName)
+        self._spilledItems = len(remainder)
+
+        if len(self._items) > self._highWaterMark:
+            self._highWaterMark = len(self._items)
+
+    def getStatistics(self):
+        """
+        Assembles the metrics of this queue.
+
+        @return: Dictionary with the current statistics values
+        @rtype: C{Dict}
+        """
+        self._condition.acquire()
+        try:
+            stats = {}
+            stats['name'] = self._name
+            stats['size'] = len(self._items)
+            stats['max_size'] = self._maxSize
+            stats['policy'] = self._policy
+            stats['high_water_mark'] = self._highWaterMark
+            stats['enqueued'] = self._enqueued
+            stats['dequeued'] = self._dequeued
+            stats['dropped'] = self._dropped
+            stats['spilled'] = self._spilled
+            stats['spilled_pending'] = self._spilledItems
+            stats['blocked_time'] = self._blockedTime
+            return stats
+        finally:
+            self._condition.release()
+
+    def resetHighWaterMark(self):
+        """
+        Sets the high water mark back to the current queue size.
+        """
+        self._condition.acquire()
+        try:
+            self._highWaterMark = len(self._items)
+        finally:
+            self._condition.release()
+
+def getNextItem(queues, timeout = None):
+    """
+    Waits for the next item on any of the given queues.
+
+    All the queues must share the same condition. Queues are checked in the given order;
+    hence, the first queue in the list has the highest priority.
+
+    @param queues: Queues to take the item from
+    @type queues: C{List} of L{EventQueue}
+    @param timeout: Maximum number of seconds to wait; None for no limit
+    @type timeout: C{float}
+    @return: Queue the item was taken from and the item itself - or None, None if the time out elapsed
+    @rtype: C{Tuple} (L{EventQueue}, item)
+    """
+    condition = queues[0].getCondition()
+    condition.acquire()
+    try:
+        start = time.time()
+        while 1:
+            for queue in queues:
+                if not queue.isEmpty():
+                    return queue, queue.getNoWait()
+            if timeout is None:
+                condition.wait()
+            else:
+                remaining = timeout - (time.time() - start)
+                if remaining <= 0:
+                    return None, None
+                condition.wait(remaining)
+    finally:
+        condition.release()
@@ -17,24 +17,52 @@ which will then take further action.
 @license: GPL (General Public License)
 """
 
+# names of the data engine queues the trigger is feeding (see L{dataengine.DataEngine})
+QUEUE_LOCAL_EVENTS = 'local_events'
+QUEUE_LOCAL_IOIDS_EVENTS = 'local_ioids_events'
+
 class EventTrigger:
     """
     Connect against the database frequently in order to receive latest events.
+    
+    Two positions are maintained for events and ioids events each: the id of the latest item passed
+    on to the data engine (where the next request to the database starts) and the checkpoint, the id 
+    up to which all items have been processed by the data engine. Items dropped from a full data engine
+    queue count as processed - they are gone anyway and must not hold the checkpoint back. Only the 
+    checkpoint is written into the status file.
+    
+    @ivar _pending: Ids of the items passed on to the data engine, but not yet processed - in the order they were passed on
+    @type _pending: C{Dict} (C{String} | C{deque} of C{int})
+    @ivar _processed: Ids of items processed out of order, which are still preceded by a pending item
+    @type _processed: C{Dict} (C{String} | C{Dict} (C{int} | C{int}))
+    @ivar _checkpoint: Id up to which all items have been processed
+    @type _checkpoint: C{Dict} (C{String} | C{int})
     """
 
     def __init__(self):
         """
-        Yet empty constructor.
+        Initialises the positions from the status file.
         """
+        import threading
+        from collections import deque
         self._running = 0
+        self._lock = threading.Lock()
+        eventId, ioidsEventId = self._readStatusFile()
+        self._latest = {QUEUE_LOCAL_EVENTS: eventId, QUEUE_LOCAL_IOIDS_EVENTS: ioidsEventId}
+        self._checkpoint = {QUEUE_LOCAL_EVENTS: eventId, QUEUE_LOCAL_IOIDS_EVENTS: ioidsEventId}
+        self._pending = {QUEUE_LOCAL_EVENTS: deque(), QUEUE_LOCAL_IOIDS_EVENTS: deque()}
+        self._processed = {QUEUE_LOCAL_EVENTS: {}, QUEUE_LOCAL_IOIDS_EVENTS: {}}
         
     def startup(self):
         """
         Puts the trigger in the background thread and makes it waiting until it's shutdown.
         """
         from config import DB_POLL_INTERVAL
+        from dataengine import getDataEngine
         self._interval = DB_POLL_INTERVAL
         self._running = 1
+        getDataEngine().addProcessedListener(self._itemProcessed)
+        getDataEngine().addDroppedListener(self._itemProcessed)
         import thread
         thread.start_new_thread(self.runUntilShutdown, ())
         
@@ -57,76 +85,159 @@ class EventTrigger:
     def _triggerEventsNow(self):
         """
         Performs the actual event triggering.
+        
+        Events are requested page by page (sorted by their ids, at most L{config.DB_POLL_PAGE_SIZE}
+        at a time, each page starting after the last id received); the checkpoint is written into the
+        status file after each page. This way, catching up with a large backlog runs in bounded memory
+        and, after a crash, continues with the first event not completely processed by the data engine.
         """
-        from config import LOCATION_EVENT_ID_STATUS_FILE
+        from config import DB_POLL_PAGE_SIZE
         from errorhandling import IoidsFormatException
         from ioidslogging import getDefaultLogger, EVENTTRIGGER_UPDATE_DETAILS
         
-        # in case, we cannot get any information from the status file - we will simply use 0 here 
-        # (event ids are serials - can't be less than 0)
-        line1 = '-1'
-        line2 = '-1'
-        try:
-            file = open(LOCATION_EVENT_ID_STATUS_FILE, 'r')
-            line1 = file.readline()
-            line2 = file.readline()
-            file.close()
-        except Exception, msg:
-            pass
-
-        event_id = int(line1)
-        ioids_event_id = int(line2)
-        
         # get the events first
         from dbconnector import getDBConnector
         from dataengine import getDataEngine
         from dataengine_tools import getPreXMLDictCreator
         creator = getPreXMLDictCreator()
         
-        events = getDBConnector().getEventsFromEventID(event_id + 1)
+        # the events are passed on to the data engine while the reply is still being parsed
         counter = 0
-        latestEventID = str(event_id)
-        for result in events:
-            for relation in result['relations']:
+        while 1:
+            pageCounter = 0
+            for relation in getDBConnector().iterEventsFromEventID(self._latest[QUEUE_LOCAL_EVENTS] + 1, DB_POLL_PAGE_SIZE):
                 if relation['name'] != 'event':
                     # here is something wrong
                     raise IoidsFormatException('Wrong relation name in result set.')
                 dict = relation['attributes']
                 
                 restructured = creator.restructureEventEntry(dict)
+                self._itemPassedOn(QUEUE_LOCAL_EVENTS, dict['event_id'])
                 getDataEngine().newEventFromLocal(restructured)
-                counter += 1
-                latestEventID = dict['event_id']
-        getDefaultLogger().newMessage(EVENTTRIGGER_UPDATE_DETAILS, '-- Event Trigger Details: %d events received.' %(counter))
+                pageCounter += 1
+            counter += pageCounter
+            self._writeCheckpoint()
+            if not DB_POLL_PAGE_SIZE or pageCounter < DB_POLL_PAGE_SIZE or not self._running:
+                break
+        getDefaultLogger().newMessage(EVENTTRIGGER_UPDATE_DETAILS, '-- Event Trigger Details: %d events received.', counter)
 
         
         # and now the ioids events
-        events = getDBConnector().getIoidsEventsFromEventID(ioids_event_id + 1)
         counter = 0
-        latestIoidsEventID = str(ioids_event_id)
-        for result in events:
-            for relation in result['relations']:
+        while 1:
+            pageCounter = 0
+            for relation in getDBConnector().iterIoidsEventsFromEventID(self._latest[QUEUE_LOCAL_IOIDS_EVENTS] + 1, DB_POLL_PAGE_SIZE):
                 if relation['name'] != 'ioids_event':
                     # here is something wrong
                     raise IoidsFormatException('Wrong relation name in result set.')
                 dict = relation['attributes']
 
                 restructured = creator.restructureEventEntry(dict)
+                self._itemPassedOn(QUEUE_LOCAL_IOIDS_EVENTS, dict['ioids_event_id'])
                 getDataEngine().newIoidsEventFromLocal(restructured)
-                counter += 1
-                latestIoidsEventID = dict['ioids_event_id']
-        getDefaultLogger().newMessage(EVENTTRIGGER_UPDATE_DETAILS, '-- Event Trigger Details: %d ioids events received.' %(counter))
+                pageCounter += 1
+            counter += pageCounter
+            self._writeCheckpoint()
+            if not DB_POLL_PAGE_SIZE or pageCounter < DB_POLL_PAGE_SIZE or not self._running:
+                break
+        getDefaultLogger().newMessage(EVENTTRIGGER_UPDATE_DETAILS, '-- Event Trigger Details: %d ioids events received.', counter)
+        
+    def _itemPassedOn(self, queueName, itemId):
+        """
+        Remembers an item as pending before it is passed on to the data engine.
+        """
+        self._lock.acquire()
+        try:
+            itemId = int(itemId)
+            self._latest[queueName] = itemId
+            self._pending[queueName].append(itemId)
+        finally:
+            self._lock.release()
+        
+    def _itemProcessed(self, queueName, itemId):
+        """
+        Moves the checkpoint on, once all items up to the given one have been processed (or dropped).
+        
+        Called by the data engine (see L{dataengine.DataEngine.addProcessedListener} and 
+        L{dataengine.DataEngine.addDroppedListener}).
+        """
+        if not self._pending.has_key(queueName):
+            return
+        self._lock.acquire()
+        try:
+            pending = self._pending[queueName]
+            processed = self._processed[queueName]
+            itemId = int(itemId)
+            if not pending or itemId < pending[0]:
+                return      # not passed on by this trigger
+            processed[itemId] = 1
+            while pending and processed.has_key(pending[0]):
+                self._checkpoint[queueName] = pending.popleft()
+                del processed[self._checkpoint[queueName]]
+        finally:
+            self._lock.release()
         
-        # ok, finally, let's put the new values for latest event ids into the file
-        file = open(LOCATION_EVENT_ID_STATUS_FILE, 'w')
+    def _writeCheckpoint(self):
+        """
+        Puts the current checkpoints into the status file.
+        """
+        self._lock.acquire()
+        try:
+            eventId = self._checkpoint[QUEUE_LOCAL_EVENTS]
+            ioidsEventId = self._checkpoint[QUEUE_LOCAL_IOIDS_EVENTS]
+        finally:
+            self._lock.release()
+        self._writeStatusFile(eventId, ioidsEventId)
+        
+    def _readStatusFile(self):
+        """
+        Reads the checkpoints for events and ioids events from the status file.
+        
+        @return: Id of the latest event and the latest ioids event processed
+        @rtype: C{Tuple} of C{int}
+        """
+        from config import LOCATION_EVENT_ID_STATUS_FILE
+        # in case, we cannot get any information from the status file - we will simply use -1 here 
+        # (event ids are serials - can't be less than 0)
+        line1 = '-1'
+        line2 = '-1'
+        try:
+            file = open(LOCATION_EVENT_ID_STATUS_FILE, 'r')
+            line1 = file.readline()
+            line2 = file.readline()
+            file.close()
+        except Exception, msg:
+            pass
+        return int(line1), int(line2)
+        
+    def _writeStatusFile(self, latestEventID, latestIoidsEventID):
+        """
+        Puts the new values for latest event ids into the status file.
+        
+        The values are written into a temporary file first, which then replaces the status file; 
+        hence, a crash while writing does not leave a broken status file behind.
+        """
+        from config import LOCATION_EVENT_ID_STATUS_FILE
+        import os
+        
+        tmpName = LOCATION_EVENT_ID_STATUS_FILE + '.tmp'
+        file = open(tmpName, 'w')
         file.write('%s\n' %(latestEventID))
         file.write('%s\n' %(latestIoidsEventID))
+        file.close()
+        try:
+            os.rename(tmpName, LOCATION_EVENT_ID_STATUS_FILE)
+        except OSError:
+            # renaming onto an existing file is not possible on all platforms
+            os.remove(LOCATION_EVENT_ID_STATUS_FILE)
+            os.rename(tmpName, LOCATION_EVENT_ID_STATUS_FILE)
         
     def shutdown(self):
         """
         Shutdown the thread.
         """
         self._running = 0
+        self._writeCheckpoint()
         from ioidslogging import EVENTTRIGGER_STATUS, getDefaultLogger
         getDefaultLogger().newMessage(EVENTTRIGGER_STATUS, 'Event Trigger process stopped')
         
@@ -92,6 +92,7 @@ class IOIDS_DBConnector(dbconnector.IoidsDBConnector):
         
         result = self._performRequest(xml)
         decode = getXMLDBWrapper().parseInsertReply(result)
+        self._invalidateInserted(decode)
 ##        print "Result - primary key: %s " %(decode[0][2])
         return decode[0][2][1:len(decode[0][2])-1]
         
@@ -52,8 +52,8 @@ class IoidsXMLDBWrapper(soapsytools.messagewrapper.XMLDBWrapper):
         """
         Yet empty constructor.
         """
-        from config import DB_DATA_TYPE
-        soapsytools.messagewrapper.XMLDBWrapper.__init__(self, DB_DATA_TYPE)
+        from config import DB_DATA_TYPE, DB_BULK_INSERT, DB_COMPACT_REPLIES
+        soapsytools.messagewrapper.XMLDBWrapper.__init__(self, DB_DATA_TYPE, DB_BULK_INSERT, DB_COMPACT_REPLIES)
 
     
 # "singleton"
@@ -13,6 +13,10 @@ def test():
 ##    testSelect()
 ##    testDicts()
     testWrapper2()
+##    testEventCheckpoint()
+##    testInsertReplies()
+##    testBulkInsert()
+##    testRowCacheInvalidation()
     
 def testWrapper():
     from messagewrapper import getXMLDBWrapper
@@ -61,5 +65,142 @@ def testWrapper2():
     print xml
     print getIoidsMessageWrapper().parseKnowledgeRequestMessage(xml)
     
+def testWireFormats(numberEvents = 500, rounds = 5):
+    """
+    Benchmark: XML replies against compact replies of the SOAP database server.
+    
+    A select reply with one row of the event relation per event is assembled in both formats
+    the same way the server does it; bytes on the wire and parse time per event are compared.
+    """
+    import time
+    from messagewrapper import getXMLDBWrapper
+    from soapsytools import compactwire
+    
+    columns = ['event_id', 'obsrv_id', 'rprt_id', 'src_id', 'dstn_id', 'data_id', 'event_type_id', 'event_timestamp', 'event_description']
+    rows = []
+    for i in range(numberEvents):
+        rows.append([str(i), str(i % 7), str(i % 3), str(i * 2), str(i * 2 + 1), str(i), '1', '2006-02-13 11:25:%02d' %(i % 60), 'Event number %d' %(i)])
+    
+    xml = "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<RELATIONS command=\"SELECT_RESULTS\">\n<REL name='RESULTS_ID' value='1'>\n"
+    for row in rows:
+        xml += "<REL name='event'>\n"
+        for j in range(len(columns)):
+            xml += "\t<ATT name='" + columns[j] + "'>" + row[j] + "</ATT>\n"
+        xml += "</REL>\n"
+    xml += "<REL name=\"TOTAL_RECORDS\">%d</REL>\n</REL>\n<REL name=\"TOTAL_RESULTS\">1</REL>\n</RELATIONS>\n" %(numberEvents)
+    compact = compactwire.encode(['SELECT_RESULTS', 1, [[1, 'event', columns, rows]]])
+    
+    for name, reply in [['xml', xml], ['compact', compact]]:
+        start = time.time()
+        for i in range(rounds):
+            total, results = getXMLDBWrapper().parseSelectReply(reply)
+        duration = (time.time() - start) / rounds
+        print "%-8s %8d bytes (%6.1f per event) - parse %8.3f ms (%7.4f ms per event) - %d records" %(name, len(reply), 
+            float(len(reply)) / numberEvents, duration * 1000, duration * 1000 / numberEvents, results[0]['number_records'])
+    
+def testEventCheckpoint(numberEvents = 20, queueSize = 5):
+    """
+    Test: the checkpoint of the event trigger moves on for processed as well as for dropped events.
+    
+    The events are passed on to a data engine with a small queue dropping the newest items; processing
+    removes the event id from the item (like the reaction NewLocalEvent does).
+    """
+    import time
+    import config
+    config.DATA_ENGINE_QUEUE_SIZE = queueSize
+    config.DATA_ENGINE_QUEUE_OVERFLOW_POLICY = 'drop_newest'
+    from dataengine import DataEngine
+    from eventtrigger import EventTrigger, QUEUE_LOCAL_EVENTS
+    
+    engine = DataEngine()
+    def process(event):
+        del event[1]['event_id']
+    engine._processEventFromLocal = process
+    trigger = EventTrigger()
+    engine.addProcessedListener(trigger._itemProcessed)
+    engine.addDroppedListener(trigger._itemProcessed)
+    start = trigger._checkpoint[QUEUE_LOCAL_EVENTS] + 1
+    
+    for i in range(start, start + numberEvents):
+        trigger._itemPassedOn(QUEUE_LOCAL_EVENTS, str(i))
+        engine.newEventFromLocal(('event', {'event_id': str(i)}))
+    print "Queued: %d - pending: %d - processed out of order: %d - checkpoint: %d" %(len(engine._localEvents), 
+        len(trigger._pending[QUEUE_LOCAL_EVENTS]), len(trigger._processed[QUEUE_LOCAL_EVENTS]), trigger._checkpoint[QUEUE_LOCAL_EVENTS])
+    assert len(trigger._processed[QUEUE_LOCAL_EVENTS]) == numberEvents - queueSize
+    
+    engine.startup()
+    deadline = time.time() + 10
+    while trigger._checkpoint[QUEUE_LOCAL_EVENTS] < start + numberEvents - 1 and time.time() < deadline:
+        time.sleep(0.1)
+    engine.shutdown()
+    print "Queued: %d - pending: %d - processed out of order: %d - checkpoint: %d" %(len(engine._localEvents), 
+        len(trigger._pending[QUEUE_LOCAL_EVENTS]), len(trigger._processed[QUEUE_LOCAL_EVENTS]), trigger._checkpoint[QUEUE_LOCAL_EVENTS])
+    assert trigger._checkpoint[QUEUE_LOCAL_EVENTS] == start + numberEvents - 1
+    assert not trigger._pending[QUEUE_LOCAL_EVENTS] and not trigger._processed[QUEUE_LOCAL_EVENTS]
+    
+def testInsertReplies(key = '12345'):
+    """
+    Test: insert replies of the SOAP database server give the same primary keys in XML and in the compact format.
+    
+    Both replies are assembled by the server for the keys as returned by its finder (within quotes); the
+    clients remove the first and the last character of the key.
+    """
+    import sys
+    sys.path.insert(0, 'thirdparty/soap_db/soap_server')
+    import XSM
+    from messagewrapper import getXMLDBWrapper
+    XSM.debugProg = {'flag': 0, 'print': 0}
+    
+    results = ["'%s'" %(key), "'7'"]
+    xml = XSM.makeXMLReply(['event_id', 'ioids_event_id'], results, ['event', 'ioids_event'])
+    compact = XSM.makeCompactInsertReply(['event_id', 'ioids_event_id'], results, ['event', 'ioids_event'])
+    fromXml = getXMLDBWrapper().parseInsertReply(xml)
+    fromCompact = getXMLDBWrapper().parseInsertReply(compact)
+    print "XML: %s\nCompact: %s" %(fromXml, fromCompact)
+    assert fromXml == fromCompact
+    assert fromCompact[0][2][1:-1] == key
+    
+def testBulkInsert(fileName = 'thirdparty/soap_db/testdata/insert3.xml'):
+    """
+    Test: bulk inserts of the SOAP database server reply the same primary keys as classic inserts.
+    
+    Requires the database of the SOAP server (see its configuration file). The document gets a new time
+    stamp, so the event is inserted by the bulk insert; the classic insert of the same document then finds
+    the rows just inserted - both replies must be identical.
+    """
+    import sys
+    import time
+    sys.path.insert(0, 'thirdparty/soap_db/soap_server')
+    import XSM
+    
+    document = open(fileName).read()
+    timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
+    document = document.replace('>now<', '>%s<' %(timestamp))
+    bulkReply = XSM.getDocument(document.replace('command="INSERT"', 'command="INSERT" mode="bulk"'))
+    classicReply = XSM.getDocument(document)
+    print "Bulk:\n%s\nClassic:\n%s" %(bulkReply, classicReply)
+    assert bulkReply == classicReply
+    
+def testRowCacheInvalidation(key = '123'):
+    """
+    Test: an insert reply removes the rows with the primary keys given in it from the row cache.
+    
+    The reply is assembled by the SOAP database server in XML and in the compact format.
+    """
+    import sys
+    sys.path.insert(0, 'thirdparty/soap_db/soap_server')
+    import XSM
+    from messagewrapper import getXMLDBWrapper
+    from soapsytools.dbconnector import DBConnector
+    XSM.debugProg = {'flag': 0, 'print': 0}
+    
+    connector = DBConnector('http://localhost:8000')
+    for reply in [XSM.makeXMLReply(['comp_id'], ["'%s'" %(key)], ['computer']),
+            XSM.makeCompactInsertReply(['comp_id'], ["'%s'" %(key)], ['computer'])]:
+        connector._cache.put('computer', 'comp_id', key, {'comp_id': key, 'hostname': 'stale'})
+        connector._invalidateInserted(getXMLDBWrapper().parseInsertReply(reply))
+        print "Cached row after insert: %s" %(connector._cache.get('computer', 'comp_id', key))
+        assert connector._cache.get('computer', 'comp_id', key) is None
+    
 if __name__ == "__main__":
     test()
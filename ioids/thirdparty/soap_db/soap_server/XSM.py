@@ -23,6 +23,7 @@
 # Imported libraries
 
 import sys # system library
+import os # file modification times (schema catalogue)
 import string # string manipulation
 import cElementTree as ElementTree # xml document parser / Fast C implementation
 from SOAPpy import * # SOAP server library
@@ -30,6 +31,8 @@ from StringIO import StringIO # required to read and manipulate a stream
 from time import gmtime, strftime # time library
 
 import pgdb # new PostgreSQL adapter - Pygresql - DB API v2.0
+import threading # connection pool shared between the SOAP server threads
+import time # connection pool health checks
 sys.path.insert(1, "..")
 
 
@@ -41,7 +44,9 @@ CONF_FILE = '/etc/XSM-configuration.xml'
 # writefile(incom_data,output_file)
 # getSettings()
 # valueConcat(aValue,connStr,nodeValue)
+# getSchemaCatalogue()
 # getPrimaryKey(dbTable)
+# ConnectionPool (class) / getConnectionPool()
 # dbChecker(dbTable,dbWhere)
 # insertToDatabase(aQuery,dbTable)
 # selectDatabase(aQuery)
@@ -49,14 +54,19 @@ CONF_FILE = '/etc/XSM-configuration.xml'
 # dbSchemaChecker(XMLFile)
 # columnChecker(dbTable,tableColumn,columnType)
 # finder(doc)
+# finderBulk(doc) / collectInsertNode(node,allNodes) / insertBulkLevel(cu,dbTable,entries)
 # makeXMLReply(tableIdDesc,results,dbtable)
+# compactEncode(data) / makeCompactInsertReply(tableIdDesc,results,dbtable)
 # goInsert(doc)
 # goSelect(doc)
+# goSelectCompact(doc)
 # finderSelect(doc)
+# makeSelectWhere(node)
+# makeSelectWindow(node)
 # getOperator(strOp,comparisonValue)
 # getTableFields(dbTable)
 # getTableRec(fieldsDB,recs,dbtable)
-# makeTheSelect(dbtable,rowWhere)
+# makeTheSelect(dbtable,rowWhere,rowWindow) / runTheSelect(dbtable,rowWhere,rowWindow)
 # getDocument(s)
 # startSoapServer()
 #
@@ -100,6 +110,10 @@ def getSettings():
         debugProg["file"]=""
         debugProg["print"]=0
         db_Settings={}
+        # defaults for the connection pool - may be overwritten in the configuration file
+        db_Settings["dbPoolMin"]=1
+        db_Settings["dbPoolMax"]=10
+        db_Settings["dbPoolHealthCheck"]=60
         Soap_Server_Settings={}
         
     ##    aXMLfile='XSM-configuration.xml'
@@ -131,6 +145,10 @@ def getSettings():
                 if(nodeSet.get('name')=="dbunicod" and nodeSet.get('value')!=""): db_Settings["dbunicod"]=nodeSet.get('value')
                 
                 if(nodeSet.get('name')=="databaseSchema" and nodeSet.get('value')!=""): db_Settings["databaseSchema"]=nodeSet.get('value')
+
+                if(nodeSet.get('name')=="dbPoolMin" and nodeSet.get('value')!=""): db_Settings["dbPoolMin"]=int(nodeSet.get('value'))
+                if(nodeSet.get('name')=="dbPoolMax" and nodeSet.get('value')!=""): db_Settings["dbPoolMax"]=int(nodeSet.get('value'))
+                if(nodeSet.get('name')=="dbPoolHealthCheck" and nodeSet.get('value')!=""): db_Settings["dbPoolHealthCheck"]=int(nodeSet.get('value'))
     
                 if(nodeSet.get('name')=="Soap_Server_IP" and nodeSet.get('value')!=""): Soap_Server_Settings["Soap_Server_IP"]=nodeSet.get('value')
                 if(nodeSet.get('name')=="Soap_Server_Port" and nodeSet.get('value')!=""): Soap_Server_Settings["Soap_Server_Port"]=nodeSet.get('value')
@@ -164,6 +182,87 @@ def valueConcat(aValue,connStr,nodeValue):
     return aValue
 #------ def end
 
+# Function - Details
+# 
+# getSchemaCatalogue() - Returns the in-memory catalogue of the database schema. The
+#                       schema XML file is only parsed, if it has not been parsed before
+#                       or if its modification time has changed since.
+#                       The catalogue is a dictionary:
+#                         "datatype" - the datatype attribute of the schema
+#                         "tables" - table name : dictionary with
+#                             "columns" - list of all column names (in schema order)
+#                             "columnsNoPrimaryKey" - list of column names without primary key columns
+#                             "columnTypes" - column name : list of types given for the column
+#                             "primaryKey" - name of the primary key column ("" if none)
+#                             "foreignKeys" - list of [column, refTable, refColumn]
+#
+# returns - the catalogue dictionary
+schemaCatalogue = None
+schemaCatalogueLock = threading.Lock()
+
+def getSchemaCatalogue():
+    global schemaCatalogue
+    aXMLfile=db_Settings["databaseSchema"]
+    mtime=os.path.getmtime(aXMLfile)
+    catalogue=schemaCatalogue
+    if (catalogue and catalogue["file"]==aXMLfile and catalogue["mtime"]==mtime):
+        return catalogue
+
+    schemaCatalogueLock.acquire()
+    try:
+        if (schemaCatalogue and schemaCatalogue["file"]==aXMLfile and schemaCatalogue["mtime"]==mtime):
+            return schemaCatalogue
+
+        if(debugProg["flag"]==1):
+            debug_Info= "Database schema XML file that will be processed... [%s]\n" %(aXMLfile)
+            if(debugProg["print"]==1): print debug_Info
+            writefile(debug_Info,debugProg["file"])
+            debug_Info=""
+
+        doc = ElementTree.parse(aXMLfile).getroot()
+        catalogue={}
+        catalogue["file"]=aXMLfile
+        catalogue["mtime"]=mtime
+        catalogue["datatype"]=doc.get('datatype')
+        catalogue["tables"]={}
+        for node in doc.findall('TABLE'):
+            table={}
+            table["columns"]=[]
+            table["columnsNoPrimaryKey"]=[]
+            table["columnTypes"]={}
+            table["primaryKey"]=""
+            table["foreignKeys"]=[]
+            for columnsNode in node.findall('COLUMNS'):
+                for columnNode in columnsNode.findall("COLUMN"):
+                    columnName=columnNode.text
+                    table["columns"].append(columnName)
+                    if (columnNode.get('primary_key')=="true"):
+                        table["primaryKey"]=columnName
+                    if not (columnNode.get('primary_key')=="true" or columnNode.get('primary_key')=="True"):
+                        table["columnsNoPrimaryKey"].append(columnName)
+                    if not table["columnTypes"].has_key(columnName):
+                        table["columnTypes"][columnName]=[]
+                    table["columnTypes"][columnName].append(columnNode.get('type'))
+                    if (columnNode.get('foreign_key')=="true"):
+                        table["foreignKeys"].append([columnName,columnNode.get('refTable'),columnNode.get('refColumn')])
+            catalogue["tables"][node.get('name')]=table
+        schemaCatalogue=catalogue
+        return catalogue
+    finally:
+        schemaCatalogueLock.release()
+#------ def end
+
+# Function - Details
+# 
+# getSchemaTable(dbTable) - Returns the catalogue entry for one table (see getSchemaCatalogue);
+#                       None if the table is not in the schema.
+def getSchemaTable(dbTable):
+    tables=getSchemaCatalogue()["tables"]
+    if tables.has_key(dbTable):
+        return tables[dbTable]
+    return None
+#------ def end
+
 # Function - Details
 # 
 # getPrimaryKey(dbTable) - The table is given and based on the database schema specified the 
@@ -172,24 +271,125 @@ def valueConcat(aValue,connStr,nodeValue):
 #
 # returns primaryKey - the primary key column that has been found from the database schema file.
 def getPrimaryKey(dbTable):
-    primaryKey=""
-    aXMLfile=db_Settings["databaseSchema"]
-    if(debugProg["flag"]==1):
-        debug_Info= "Database schema XML file that will be processed... [%s]\n" %(aXMLfile)
-        if(debugProg["print"]==1): print debug_Info
-        writefile(debug_Info,debugProg["file"])
-        debug_Info=""
+    table=getSchemaTable(dbTable)
+    if table is None:
+        return ""
+    return table["primaryKey"]
+#------ def end
 
-    doc = ElementTree.parse(aXMLfile).getroot()
-    # Find the table and go through the columns till the primary key is found
-    for node in doc.findall('TABLE'):
-      if(dbTable==node.get('name')):
-        for columnsNode in node.findall('COLUMNS'):
-         for columnNode in columnsNode.findall("COLUMN"):
-            if (columnNode.get('primary_key')=="true"):
-                primaryKey=columnNode.text
+# Class - Details
+# 
+# ConnectionPool(minSize,maxSize,healthCheckInterval) - Keeps database connections open and
+#                       shares them between the threads of the SOAP server. A connection
+#                       is checked out for one request and checked in afterwards; this
+#                       way, connection setup (TCP + authentication) is not required for
+#                       each and every select or insert any more.
+# minSize - number of connections opened in advance and kept open
+# maxSize - maximum number of connections; further requests have to wait for a free one
+# healthCheckInterval - connections idle for longer than this (seconds) are tested before use
+#
+class ConnectionPool:
+
+    def __init__(self,minSize,maxSize,healthCheckInterval):
+        self._minSize=minSize
+        self._maxSize=max(minSize,maxSize,1)
+        self._healthCheckInterval=healthCheckInterval
+        self._idle=[]       # list of [connection, time of last use]
+        self._size=0
+        self._condition=threading.Condition()
+        for n in range(self._minSize):
+            self._idle.append([self._connect(),time.time()])
+            self._size+=1
+
+    def _connect(self):
+        return pgdb.connect(host=db_Settings["dbip"],user=db_Settings["dbuser"],
+                            password=db_Settings["dbpass"],database=db_Settings["dbnm"])
+
+    def _isHealthy(self,DBconnection):
+        try:
+            cu = DBconnection.cursor()
+            cu.execute("SELECT 1")
+            cu.fetchall()
+            DBconnection.rollback()
+            return 1
+        except:
+            return 0
+
+    def _close(self,DBconnection):
+        try:
+            DBconnection.close()
+        except:
+            pass
+
+    # checkout() - returns a connection for exclusive use by the calling thread
+    def checkout(self):
+        self._condition.acquire()
+        try:
+            while not self._idle and self._size>=self._maxSize:
+                self._condition.wait()
+            if self._idle:
+                DBconnection,lastUsed=self._idle.pop()
+            else:
+                DBconnection=None
+                self._size+=1
+        finally:
+            self._condition.release()
+
+        try:
+            if DBconnection is None:
+                return self._connect()
+            if (time.time()-lastUsed>self._healthCheckInterval and not self._isHealthy(DBconnection)):
+                if(debugProg["flag"]==1):
+                    writefile("Connection pool: stale connection replaced.\n",debugProg["file"])
+                self._close(DBconnection)
+                return self._connect()
+            return DBconnection
+        except:
+            # could not connect - give the slot back
+            self._condition.acquire()
+            self._size-=1
+            self._condition.notify()
+            self._condition.release()
+            raise
+
+    # checkin(DBconnection,broken) - returns the connection to the pool; broken connections
+    #                       (an error occured while in use) are closed and dropped
+    def checkin(self,DBconnection,broken=0):
+        self._condition.acquire()
+        try:
+            if broken:
+                self._close(DBconnection)
+                self._size-=1
+            else:
+                self._idle.append([DBconnection,time.time()])
+            self._condition.notify()
+        finally:
+            self._condition.release()
+
+    def getStatistics(self):
+        self._condition.acquire()
+        try:
+            return {"size":self._size,"idle":len(self._idle),"min":self._minSize,"max":self._maxSize}
+        finally:
+            self._condition.release()
 
-    return primaryKey
+dbPool = None
+dbPoolLock = threading.Lock()
+
+# Function - Details
+# 
+# getConnectionPool() - Returns the connection pool (it is created with the first call).
+#
+def getConnectionPool():
+    global dbPool
+    if dbPool is None:
+        dbPoolLock.acquire()
+        try:
+            if dbPool is None:
+                dbPool = ConnectionPool(db_Settings["dbPoolMin"],db_Settings["dbPoolMax"],db_Settings["dbPoolHealthCheck"])
+        finally:
+            dbPoolLock.release()
+    return dbPool
 #------ def end
 
 # Function - Details
@@ -233,21 +433,17 @@ def dbChecker(dbTable,dbWhere):
 #
 # returns - The table key (primary key) from the record that has just being inserted.
 def insertToDatabase(aQuery,dbTable):
-    dbip=db_Settings["dbip"]
-    dbnm=db_Settings["dbnm"]
-    dbuser=db_Settings["dbuser"]
-    dbpass=db_Settings["dbpass"]
-    dbencod=db_Settings["dbencod"]
-    dbunicod=db_Settings["dbunicod"]
-
-    DBconnection = pgdb.connect(host=dbip,user=dbuser, password=dbpass,
-                             database=dbnm)
-    cu = DBconnection.cursor()
-    cu.execute(aQuery)
-    result = cu.lastrowid
-    
-    DBconnection.commit()
-    DBconnection.close()
+    pool = getConnectionPool()
+    DBconnection = pool.checkout()
+    try:
+        cu = DBconnection.cursor()
+        cu.execute(aQuery)
+        result = cu.lastrowid
+        DBconnection.commit()
+    except:
+        pool.checkin(DBconnection,1)
+        raise
+    pool.checkin(DBconnection)
 
     table_key =getPrimaryKey(dbTable)
     # Use the OID value(SelectQuery) to get and return the primary key
@@ -283,27 +479,25 @@ def insertToDatabase(aQuery,dbTable):
 # returns results - results from the select query given.
 def selectDatabase(aQuery):
     
-    dbip=db_Settings["dbip"]
-    dbnm=db_Settings["dbnm"]
-    dbuser=db_Settings["dbuser"]
-    dbpass=db_Settings["dbpass"]
-    dbencod=db_Settings["dbencod"]
-    dbunicod=db_Settings["dbunicod"]
-
-    DBconnection = pgdb.connect(host=dbip,user=dbuser, password=dbpass,
-                             database=dbnm)
-    cu = DBconnection.cursor()
-    
     if(debugProg["flag"]==1):
         debug_Info= "The select query executed is: " + str(aQuery)
         if(debugProg["print"]==1): print debug_Info
         writefile(debug_Info,debugProg["file"])
         debug_Info=""
 
-    cu.execute(aQuery)
-    results=''
-    results=cu.fetchall()
-    DBconnection.close()
+    pool = getConnectionPool()
+    DBconnection = pool.checkout()
+    try:
+        cu = DBconnection.cursor()
+        cu.execute(aQuery)
+        results=''
+        results=cu.fetchall()
+        # finish the transaction - the connection goes back into the pool
+        DBconnection.rollback()
+    except:
+        pool.checkin(DBconnection,1)
+        raise
+    pool.checkin(DBconnection)
     
     results2=[]
     results3=[]
@@ -371,18 +565,10 @@ def doInsert(dbTable,dbCell,dbValues,idExistsStr):
 # returns - Returns 1 if the data types match, other wise 0 if they do not.
 def dbSchemaChecker(XMLFile):
 
-    aDbSchema=db_Settings["databaseSchema"]
-
-    if(debugProg["flag"]==1):
-        debug_Info= "The Database schema XML that will be processed... [%s]\n" %(aDbSchema) + "\n"
-        if(debugProg["print"]==1): print debug_Info
-        writefile(debug_Info,debugProg["file"])
-        debug_Info=""
-
-    dbSchema = ElementTree.parse(aDbSchema).getroot()
+    schemaDatatype=getSchemaCatalogue()["datatype"]
 
-    if(dbSchema.get('datatype') and XMLFile.get('datatype')):
-       if (dbSchema.get('datatype')==XMLFile.get('datatype')):
+    if(schemaDatatype and XMLFile.get('datatype')):
+       if (schemaDatatype==XMLFile.get('datatype')):
           return 1
     return 0
 #------ def end
@@ -399,24 +585,16 @@ def dbSchemaChecker(XMLFile):
 # returns Returns 1 if the column name and type match, other wise 0 if they do not.
 def columnChecker(dbTable,tableColumn,columnType):
 
-    aDbSchema=db_Settings["databaseSchema"]
-
-    if(debugProg["flag"]==1): debug_Info= "The Database schema XML that will be processed... [%s]\n" %(aDbSchema) + "\n"
-
-    #XMLFile = ElementTree.parse(aXMLFile).getroot()
-    dbSchema = ElementTree.parse(aDbSchema).getroot()
+    if(debugProg["flag"]==1): debug_Info= "Column check for table " + str(dbTable) + "\n"
 
     found_type=0
     found_column=0
-    # Find the table and go through the columns till the column and type are found and match.
-    for node in dbSchema.findall('TABLE'):
-       if(dbTable==node.get('name')):
-          for columnsNode in node.findall('COLUMNS'):
-             for columnNode in columnsNode.findall("COLUMN"):
-                if (columnNode.text==tableColumn):
-                   found_column=1
-                   if (columnNode.get('type')==columnType):
-                      found_type=1
+    # Look up the column in the catalogue and check its type.
+    table=getSchemaTable(dbTable)
+    if (table is not None and table["columnTypes"].has_key(tableColumn)):
+        found_column=1
+        if (columnType in table["columnTypes"][tableColumn]):
+            found_type=1
                 
     if (found_type==0):
         if(debugProg["flag"]==1):
@@ -573,6 +751,175 @@ def finder(doc):
     return table_relations, table_values, table_name
 #------ def end
 
+# Function - Details
+# 
+# collectInsertNode(node,allNodes) - Collects the information for one 'REL' element of an
+#                       insert document (and recursively for its nested 'REL' elements)
+#                       into a dictionary. Used by finderBulk.
+# node - the 'REL' element
+# allNodes - list, every collected entry is appended to
+#
+# returns - the entry for the node or None, if column and type mismatch with the database schema
+def collectInsertNode(node,allNodes):
+    entry={}
+    entry["table"]=node.get('name')
+    entry["cells"]=[]
+    entry["values"]=[]
+    entry["conditions"]=[]
+    entry["children"]=[]
+    entry["height"]=0
+    entry["key"]=""
+    entry["keyName"]=""
+
+    for node2 in node.findall('ATT'):
+        #Stopper here if column and type mismatch with that from the database schema
+        if (columnChecker(entry["table"],node2.get('name'),node2.get('type'))==0):
+            return None
+        value="\'" + node2.text + "\'"
+        entry["cells"].append(node2.get('name'))
+        entry["values"].append(value)
+        entry["conditions"].append(node2.get('name') + "=" + value)
+
+    for childNode in node.findall('REL'):
+        child=collectInsertNode(childNode,allNodes)
+        if child is None:
+            return None
+        entry["children"].append(child)
+        if (child["height"]+1>entry["height"]):
+            entry["height"]=child["height"]+1
+
+    allNodes.append(entry)
+    return entry
+#------ def end
+
+# Function - Details
+# 
+# insertBulkLevel(cu,dbTable,entries) - Processes all entries of one table on one level
+#                       of the tree (all their nested relations have been processed
+#                       already). The existence of all the entries is checked with one
+#                       select; the missing ones are inserted with INSERT ... RETURNING
+#                       (PostgreSQL 8.2 or later), hence no OID lookup is required.
+#                       Identical entries are only inserted once. The keys are kept in the
+#                       same form as finder returns them (within single quotes).
+# cu - the cursor (all statements of one document run in one transaction)
+# dbTable - the table name
+# entries - the entries as collected by collectInsertNode
+def insertBulkLevel(cu,dbTable,entries):
+    table_key=getPrimaryKey(dbTable)
+    tableFields=getTableFields(dbTable,"true")
+    unique={}
+    order=[]
+    for entry in entries:
+        rowCell=entry["cells"][:]
+        rowValues=entry["values"][:]
+        conditions=entry["conditions"][:]
+        for child in entry["children"]:
+            rowCell.append(child["keyName"])
+            rowValues.append(child["key"])
+            conditions.append(child["keyName"] + "=" + child["key"])
+        # all the other fields have to be NULL
+        for column in tableFields:
+            if (column not in rowCell):
+                conditions.append(column + " is NULL")
+        rowWhere=string.join(conditions," AND ")
+        entry["insert"]=[rowCell,rowValues]
+        if not unique.has_key(rowWhere):
+            unique[rowWhere]=[]
+            order.append(rowWhere)
+        unique[rowWhere].append(entry)
+
+    # check the existence of all entries in one go
+    selects=[]
+    for n in range(len(order)):
+        selects.append("(SELECT " + str(n) + " AS xsm_idx, " + table_key + " FROM " + dbTable + " WHERE " + order[n] + " LIMIT 1)")
+    SelectQuery=string.join(selects," UNION ALL ")
+    cu.execute(SelectQuery)
+    found={}
+    for row in cu.fetchall():
+        found[int(row[0])]="\'" + str(row[1]) + "\'"
+
+    if(debugProg["flag"]==1):
+        debug_Info= "Bulk check for table " + str(dbTable) + ": " + str(len(order)) + " distinct entries, " + str(len(found)) + " found.\n"
+        if(debugProg["print"]==1): print debug_Info
+        writefile(debug_Info,debugProg["file"])
+        debug_Info=""
+
+    # and insert the missing ones
+    for n in range(len(order)):
+        if found.has_key(n):
+            tabID=found[n]
+        else:
+            rowCell,rowValues=unique[order[n]][0]["insert"]
+            dbInsert="INSERT INTO " + dbTable + " (" + string.join(rowCell,",") + ") VALUES (" + string.join(rowValues,",") + ") RETURNING " + table_key
+            if(debugProg["flag"]==1): writefile("The insert command executed: " + str(dbInsert) + "\n",debugProg["file"])
+            cu.execute(dbInsert)
+            tabID="\'" + str(cu.fetchone()[0]) + "\'"
+        for entry in unique[order[n]]:
+            entry["key"]=tabID
+            entry["keyName"]=table_key
+#------ def end
+
+# Function - Details
+# 
+# finderBulk(doc) - Alternative to finder for insert documents with mode="bulk". The whole
+#                   tree is processed in one transaction on one connection. The tree is
+#                   processed bottom up, level by level; on each level, the entries are
+#                   grouped by table and handled by insertBulkLevel. This way, the number
+#                   of statements depends on the depth of the tree and the number of tables
+#                   rather than on the number of nodes; and there is only one commit.
+# doc - the XML document the has to be parsed
+#
+# returns - table_relations, table_values, table_name, lists for storing columns, thier values and the table name
+#           (for the top level relations, the same as finder)
+def finderBulk(doc):
+    topNodes=[]
+    allNodes=[]
+    for node in doc.findall('REL'):
+        entry=collectInsertNode(node,allNodes)
+        if entry is None:
+            return "-","-","-"
+        topNodes.append(entry)
+
+    maxHeight=0
+    for entry in allNodes:
+        if (entry["height"]>maxHeight):
+            maxHeight=entry["height"]
+
+    pool = getConnectionPool()
+    DBconnection = pool.checkout()
+    try:
+        cu = DBconnection.cursor()
+        for height in range(maxHeight+1):
+            byTable={}
+            tables=[]
+            for entry in allNodes:
+                if (entry["height"]==height):
+                    if not byTable.has_key(entry["table"]):
+                        byTable[entry["table"]]=[]
+                        tables.append(entry["table"])
+                    byTable[entry["table"]].append(entry)
+            for dbTable in tables:
+                insertBulkLevel(cu,dbTable,byTable[dbTable])
+        DBconnection.commit()
+    except:
+        try:
+            DBconnection.rollback()
+        except:
+            pass
+        pool.checkin(DBconnection,1)
+        raise
+    pool.checkin(DBconnection)
+
+    table_relations=[]
+    table_values=[]
+    table_name=[]
+    for entry in topNodes:
+        table_relations.append(entry["keyName"])
+        table_values.append(entry["key"])
+        table_name.append(entry["table"])
+    return table_relations, table_values, table_name
+#------ def end
+
 # Function - Details
 # 
 # makeXMLReply(tableIdDesc,results,dbtable)) - Create the reply for the Insert. It processes
@@ -619,11 +966,63 @@ def makeXMLReply(tableIdDesc,results,dbtable):
     return myDoc
 #------ def end
 
+# Function - Details
+# 
+# compactEncode(data) - Encodes the given structure in the compact reply format. This
+#                       format is used instead of XML if the client asks for it with the
+#                       attribute reply="compact" in the request. The reply starts with
+#                       "XSMC1"; strings are given as <number of characters>:<characters>,
+#                       None as ~ and lists are enclosed in [ and ]. The reply is UTF-8
+#                       encoded; the lengths are counted in unicode characters.
+# data - nested lists of values (anything else than a list or None is converted with str)
+#
+# returns - the compact reply as string
+def compactEncode(data):
+    parts=[u'XSMC1']
+    compactEncodeItem(data,parts)
+    return u''.join(parts).encode('utf-8')
+
+def compactEncodeItem(item,parts):
+    if item is None:
+        parts.append(u'~')
+    elif type(item) in [type([]),type(())]:
+        parts.append(u'[')
+        for subItem in item:
+            compactEncodeItem(subItem,parts)
+        parts.append(u']')
+    else:
+        if type(item)!=type(u''):
+            item=unicode(str(item),'utf-8','replace')
+        parts.append(u'%d:' %(len(item)))
+        parts.append(item)
+#------ def end
+
+# Function - Details
+# 
+# makeCompactInsertReply(tableIdDesc,results,dbtable) - Create the reply for the Insert in
+#                       the compact format: ['INSERT_RESULTS',[[table,column,key],...]]
+#                       The key is given in the same form as in makeXMLReply (within double
+#                       quotes), the clients remove the first and the last character.
+# tableIdDesc - The column names.
+# results - The results from the Select query
+# dbtable - The name of the table
+#
+# returns - the compact reply that will be sent over to the SOAP client.
+def makeCompactInsertReply(tableIdDesc,results,dbtable):
+    rows=[]
+    for n in range(len(tableIdDesc)):
+        rows.append([str(dbtable[n]),str(tableIdDesc[n]),str([results[n]]).replace('\'',"")[1:-1]])
+    return compactEncode(['INSERT_RESULTS',rows])
+#------ def end
+
 # Function - Details
 # 
 # goInsert(doc) - The first function which calls the finder function to find and create 
 #                 the insert statement and then formats the results and returns them 
-#                 to be sent to the client.
+#                 to be sent to the client. Documents with the attribute mode="bulk" are
+#                 processed by finderBulk (one transaction for the whole document).
+#                 With reply="compact" the results are sent in the compact format;
+#                 errors are always reported in XML.
 # doc - the XML document that will be processed
 #
 # returns - the XML results to be sent to the client.
@@ -639,13 +1038,18 @@ def goInsert(doc):
             if(debugProg["print"]==1): print debug_Info
             writefile(debug_Info,debugProg["file"])
             debug_Info=""
-        tableIdDesc,results,dbtable= finder(doc)
+        if(doc.get('mode')=="bulk"):
+            tableIdDesc,results,dbtable= finderBulk(doc)
+        else:
+            tableIdDesc,results,dbtable= finder(doc)
 
         # Specific Errors which are returned to the client
         if(tableIdDesc=="-" and results=="-" and dbtable=="-"):
             xmlDocResults="<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
             xmlDocResults=xmlDocResults + "<RELATIONS name=\"ERROR\">\n\t<REL name=\"ERROR_1\">\n\t\t<ATT name=\"error_message\">Column or Type mismatch in XML and Schema file."
             xmlDocResults=xmlDocResults + "</ATT>\n\t</REL>\n</RELATIONS>\n"
+        elif(doc.get('reply')=="compact"):
+            xmlDocResults = makeCompactInsertReply(tableIdDesc,results,dbtable)
         else:
             xmlDocResults = makeXMLReply(tableIdDesc,results,dbtable)
     else:
@@ -688,6 +1092,39 @@ def goSelect(doc):
     return myDoc        
 #------ def end
 
+# Function - Details
+# 
+# goSelectCompact(doc) - Same as goSelect, but the results are returned in the compact
+#                     format (see compactEncode):
+#                     ['SELECT_RESULTS',total results,[[results id,table,[columns],[[values],...]],...]]
+#                     The column names are only sent once per result instead of once per
+#                     value. If the operator or the window is invalid, the table is None.
+#
+# doc - the XML document that will be processed
+#
+# returns - the compact results to be sent to the client.
+def goSelectCompact(doc):
+    if(debugProg["flag"]==1):
+        debug_Info= "The XML document is " + ElementTree.tostring(doc)+"\n"
+        if(debugProg["print"]==1): print debug_Info
+        writefile(debug_Info,debugProg["file"])
+        debug_Info=""
+
+    resultsIdCounter=0
+    results=[]
+    for node in doc.findall('REL'):
+        resultsIdCounter+=1
+        dbTable,rowWhere,replacedOp=makeSelectWhere(node)
+        rowWindow=makeSelectWindow(node)
+        if (replacedOp!="none" and rowWindow!="none"):
+            tableFields,rows=runTheSelect(dbTable,rowWhere,rowWindow)
+            results.append([resultsIdCounter,dbTable,tableFields,rows])
+        else:
+            results.append([resultsIdCounter,None,[],[]])
+
+    return compactEncode(['SELECT_RESULTS',resultsIdCounter,results])
+#------ def end
+
 # Function - Details
 # 
 # finderSelect(doc) - The function goes through the document and constructs the
@@ -697,72 +1134,108 @@ def goSelect(doc):
 #
 
 def finderSelect(doc,myDoc):
-    rowValues=''
-    dbTable=''
-    rowCell=''
-    rowWhere=''
-    replacedOp=''
-    #global myDoc
-
     resultsIdCounter=0
 
     for node in doc.findall('REL'):
-        rowValues=''
-        dbTable=''
-        rowCell=''
-        rowWhere=''
-
         resultsIdCounter+=1
         myDoc=myDoc+"<REL name=\'RESULTS_ID\' value=\'" + str(resultsIdCounter) + "\'>\n"
 
-        dbTable=node.get('name')
+        dbTable,rowWhere,replacedOp=makeSelectWhere(node)
+        rowWindow=makeSelectWindow(node)
+        
+        if (replacedOp!="none" and rowWindow!="none"): myDoc=makeTheSelect(dbTable,rowWhere,myDoc,rowWindow)
+        
+        myDoc=myDoc+"</REL>\n"
+    myDoc=myDoc+"<REL name=\"TOTAL_RESULTS\">" + str(resultsIdCounter)
+    myDoc=myDoc+"</REL>\n"
+    return myDoc
 
-        if(debugProg["flag"]==1):
-            debug_Info= "Relation name: %s" %(node.get('name')) + "\n -----Attributes------ " + "\n"
+#------ def end
 
-        for node2 in node.findall('ATT'):
-                                             
-            # add the values to the dbValues string required for the insert
-            rowValues=valueConcat(rowValues,",",node2.text)
-            if(debugProg["flag"]==1):
-                debug_Info=debug_Info + "Attribute Value: %s " %(node2.text) + "\n"
-                                  
-            # add the values to the dbCell string required for the insert
-            rowCell=valueConcat(rowCell,",",node2.get('name'))
-            if(debugProg["flag"]==1):
-                debug_Info=debug_Info + "name: %s " %(node2.get('name')) + "\n"
-               
-            if(debugProg["flag"]==1):
-                debug_Info=debug_Info +  "type: %s" %(node2.get('type')) + "\n"
+# Function - Details
+# 
+# makeSelectWhere(node) - Constructs the where clause of the select for one 'REL' element
+#                     of the document. Used by finderSelect and goSelectCompact.
+# node - the 'REL' element
+#
+# returns - dbTable, rowWhere, replacedOp; the table name, the where clause and the last
+#           replaced operator ("none" if an unknown operator was found)
+def makeSelectWhere(node):
+    rowValues=''
+    rowCell=''
+    rowWhere=''
+    replacedOp=''
 
-            # replace operator to create statement
-            if node2.get('op'):
-                replacedOp=getOperator(node2.get('op'),node2.text.strip().replace('\n',''))
-                if (replacedOp=="none"):
-                    if(debugProg["print"]==1): print "Error in operator"
-                    if(debugProg["flag"]==1):
-                        debug_Info=debug_Info + "Error in operator" + "\n"
+    dbTable=node.get('name')
 
-                rowWhere=valueConcat(rowWhere," AND ",node2.get('name') + replacedOp)
-            else:
-                rowWhere=valueConcat(rowWhere," AND ",node2.get('name') + "= \'" + node2.text.strip().replace('\n','') + "\'")
+    if(debugProg["flag"]==1):
+        debug_Info= "Relation name: %s" %(node.get('name')) + "\n -----Attributes------ " + "\n"
 
+    for node2 in node.findall('ATT'):
+                                         
+        # add the values to the dbValues string required for the insert
+        rowValues=valueConcat(rowValues,",",node2.text)
         if(debugProg["flag"]==1):
-            debug_Info=debug_Info + str(rowWhere) + "\n"
-        
+            debug_Info=debug_Info + "Attribute Value: %s " %(node2.text) + "\n"
+                              
+        # add the values to the dbCell string required for the insert
+        rowCell=valueConcat(rowCell,",",node2.get('name'))
         if(debugProg["flag"]==1):
-            debug_Info=debug_Info +  " --------------------- \n"
-            if(debugProg["print"]==1): print debug_Info
-            writefile(debug_Info,debugProg["file"])
-            debug_Info=""
-        
-        if (replacedOp!="none"): myDoc=makeTheSelect(dbTable,rowWhere,myDoc)
-        
-        myDoc=myDoc+"</REL>\n"
-    myDoc=myDoc+"<REL name=\"TOTAL_RESULTS\">" + str(resultsIdCounter)
-    myDoc=myDoc+"</REL>\n"
-    return myDoc
+            debug_Info=debug_Info + "name: %s " %(node2.get('name')) + "\n"
+           
+        if(debugProg["flag"]==1):
+            debug_Info=debug_Info +  "type: %s" %(node2.get('type')) + "\n"
+
+        # replace operator to create statement
+        if node2.get('op'):
+            replacedOp=getOperator(node2.get('op'),node2.text.strip().replace('\n',''))
+            if (replacedOp=="none"):
+                if(debugProg["print"]==1): print "Error in operator"
+                if(debugProg["flag"]==1):
+                    debug_Info=debug_Info + "Error in operator" + "\n"
+
+            rowWhere=valueConcat(rowWhere," AND ",node2.get('name') + replacedOp)
+        else:
+            rowWhere=valueConcat(rowWhere," AND ",node2.get('name') + "= \'" + node2.text.strip().replace('\n','') + "\'")
+
+    if(debugProg["flag"]==1):
+        debug_Info=debug_Info + str(rowWhere) + "\n"
+    
+    if(debugProg["flag"]==1):
+        debug_Info=debug_Info +  " --------------------- \n"
+        if(debugProg["print"]==1): print debug_Info
+        writefile(debug_Info,debugProg["file"])
+        debug_Info=""
 
+    return dbTable,rowWhere,replacedOp
+#------ def end
+
+# Function - Details
+# 
+# makeSelectWindow(node) - Constructs the ORDER BY and LIMIT part of the select for one
+#                     'REL' element of the document from its attributes 'orderby' (a column
+#                     of the table) and 'limit' (maximum number of records). Together with a
+#                     condition on the ordered column (e.g. event_id gt the last one received)
+#                     this allows clients to fetch large result sets page by page.
+# node - the 'REL' element
+#
+# returns - rowWindow, the ORDER BY / LIMIT clause ("" if not requested, "none" if invalid)
+def makeSelectWindow(node):
+    rowWindow=""
+    if node.get('orderby'):
+        table=getSchemaTable(node.get('name'))
+        if (table is None or node.get('orderby') not in table["columns"]):
+            if(debugProg["print"]==1): print "Error in order column"
+            return "none"
+        rowWindow=rowWindow + " ORDER BY " + node.get('orderby')
+    if node.get('limit'):
+        try:
+            limit=int(node.get('limit'))
+        except ValueError:
+            if(debugProg["print"]==1): print "Error in limit"
+            return "none"
+        rowWindow=rowWindow + " LIMIT " + str(limit)
+    return rowWindow
 #------ def end
 
 # Function - Details
@@ -773,13 +1246,21 @@ def finderSelect(doc,myDoc):
 # strOp - the value provided by the user,extracted from the XML document.
 # comparisonValue - the value that will be used in the SQL statement.
 #
+#                     The operator "in" takes a comma seperated list of values and is
+#                     used for fetching many records (e.g. by primary key) in one go.
+#
 # return - newString, which is the value after the one to one replacement with the value
 
 def getOperator(strOp,comparisonValue):
     strOperators={"lt":"<","ltq":"<=","gt":">","gtq":">=","eq":"=","neq":"<>","lk":"like \'%","slk":"like \'","elk":"like \'%","nlk":"not like '%","nslk":"not like '","nelk":"not like '%"}
     newString=""
 
-    if (strOperators.has_key(strOp)):
+    if (strOp=="in"):
+        inValues=[]
+        for aValue in comparisonValue.split(','):
+            inValues.append("\'" + aValue.strip().replace("\'","\'\'") + "\'")
+        newString=" in (" + string.join(inValues,",") + ")"
+    elif (strOperators.has_key(strOp)):
         if(strOp=="lk" or strOp=="slk" or strOp=="nlk" or strOp=="nslk" ):
             newString=newString + " " + strOperators[strOp] + comparisonValue + "%\'"
         else:
@@ -811,18 +1292,13 @@ def getOperator(strOp,comparisonValue):
 
 def getTableFields(dbTable,noPrimaryKey):
     tableFields=[]
-    aXMLfile=db_Settings["databaseSchema"]
-    
-    doc = ElementTree.parse(aXMLfile).getroot()
-    # Find the table and go through the columns and save them to a list.
-    for node in doc.findall('TABLE'):
-      if(dbTable==node.get('name')):
-        for columnsNode in node.findall('COLUMNS'):
-         for columnNode in columnsNode.findall("COLUMN"):
-            if(noPrimaryKey=='true' and (columnNode.get('primary_key')=="true" or columnNode.get('primary_key')=="True") ):
-                pass
-            else:
-                tableFields.append(columnNode.text)
+    table=getSchemaTable(dbTable)
+    # Take the columns from the catalogue - a copy, the callers modify the list.
+    if table is not None:
+        if(noPrimaryKey=='true'):
+            tableFields=table["columnsNoPrimaryKey"][:]
+        else:
+            tableFields=table["columns"][:]
 
     if(debugProg["flag"]==1):
             debug_Info= "Table columns "+ str(tableFields) + "\n"
@@ -858,12 +1334,29 @@ def getTableRec(fieldsDB,recs,dbtable,myDoc):
 
 # Function - Details
 # 
-# makeTheSelect(dbtable,rowWhere) - Gets the columns names and makes the select requests.
+# makeTheSelect(dbtable,rowWhere,rowWindow) - Gets the columns names and makes the select requests.
 #                       The results are then sent to getTableRec to format the results. 
 # dbtable - the table name.
 # rowWhere - the where clause constructed base on the values given by the user(XML document)
+# rowWindow - ORDER BY / LIMIT clause (see makeSelectWindow)
+
+def makeTheSelect(dbtable,rowWhere,myDoc,rowWindow=""):
+    tableFields,result=runTheSelect(dbtable,rowWhere,rowWindow)
+    myDoc=getTableRec(tableFields,result,dbtable,myDoc)
+    return myDoc
+#------ def end
+
+# Function - Details
+# 
+# runTheSelect(dbtable,rowWhere,rowWindow) - Gets the columns names and makes the select requests.
+#                       Used by makeTheSelect and goSelectCompact.
+# dbtable - the table name.
+# rowWhere - the where clause constructed base on the values given by the user(XML document)
+# rowWindow - ORDER BY / LIMIT clause (see makeSelectWindow)
+#
+# returns - tableFields, result; the column names and the records
 
-def makeTheSelect(dbtable,rowWhere,myDoc):
+def runTheSelect(dbtable,rowWhere,rowWindow=""):
     tableFields=[]
     # get the names of the table's columns
     tableFields=getTableFields(dbtable,"false")
@@ -875,25 +1368,23 @@ def makeTheSelect(dbtable,rowWhere,myDoc):
 
     if (rowWhere):
 
-        result=selectDatabase("select "+ fieldsDB +" from "+ dbtable +" WHERE "+ rowWhere)
+        result=selectDatabase("select "+ fieldsDB +" from "+ dbtable +" WHERE "+ rowWhere + rowWindow)
 
         if(debugProg["flag"]==1):
-            debug_Info= "SELECT comamnd: select "+ str(fieldsDB) +" from "+ str(dbtable) +" WHERE "+ str(rowWhere) + "\nSelect results: \n" + str(result) + "\n"
+            debug_Info= "SELECT comamnd: select "+ str(fieldsDB) +" from "+ str(dbtable) +" WHERE "+ str(rowWhere) + str(rowWindow) + "\nSelect results: \n" + str(result) + "\n"
             if(debugProg["print"]==1): print debug_Info
             writefile(debug_Info,debugProg["file"])
             debug_Info=""
     else:
-        "select "+ fieldsDB +" from "+ dbtable
-        result=selectDatabase("select "+ fieldsDB +" from "+ dbtable)
+        result=selectDatabase("select "+ fieldsDB +" from "+ dbtable + rowWindow)
 
         if(debugProg["flag"]==1):
-            debug_Info= "SELECT comamnd: select "+ str(fieldsDB) +" from "+ str(dbtable) + "\nSelect results: \n" + str(result) + "\n"
+            debug_Info= "SELECT comamnd: select "+ str(fieldsDB) +" from "+ str(dbtable) + str(rowWindow) + "\nSelect results: \n" + str(result) + "\n"
             if(debugProg["print"]==1): print debug_Info
             writefile(debug_Info,debugProg["file"])
             debug_Info=""
 
-    myDoc=getTableRec(tableFields,result,dbtable,myDoc)
-    return myDoc
+    return tableFields,result
 #------ def end
 
 #------ 
@@ -1076,16 +1567,12 @@ def finderJoin(doc,recursion,topTable):
 # tableFields - a list with the columns of the table
 
 def getTableForgnKeys(fkT,dbTable):
-    aXMLfile=db_Settings["databaseSchema"]
-    
-    doc = ElementTree.parse(aXMLfile).getroot()
-    # Find the table and go through the columns and save them to a list.
-    for node in doc.findall('TABLE'):
-      if(dbTable==node.get('name')):
-        for columnsNode in node.findall('COLUMNS'):
-         for columnNode in columnsNode.findall("COLUMN"):
-             if (columnNode.get('foreign_key')=="true" and fkT==columnNode.get('refTable')):
-                 tableFKeys.append(columnNode.get('refTable')+ "." + columnNode.get('refColumn')+ "=" + dbTable + "." + columnNode.text)
+    table=getSchemaTable(dbTable)
+    # Go through the foreign keys of the table in the catalogue.
+    if table is not None:
+        for columnName,refTable,refColumn in table["foreignKeys"]:
+            if (fkT==refTable):
+                tableFKeys.append(refTable+ "." + refColumn+ "=" + dbTable + "." + columnName)
 
     if(debugProg["flag"]==1):
             debug_Info= "Table foreign keys "+ str(tableFKeys) + "\n"
@@ -1137,6 +1624,8 @@ Config.simplify_objects = 1
 #                  on the command the goInsert or goSelect function is called. In the
 #                  end the formatted XML document is returned to be sent to the client.
 #                  It also includes error reporting. All errors are traced back here.
+#                  Clients may ask for the compact reply format with reply="compact"
+#                  (SELECT and INSERT only; JOIN and errors are always replied in XML).
 # s - the XML document that will be processed
 #
 # return - xmlDocResults, returns the formatted XML document to the SOAP server
@@ -1155,7 +1644,10 @@ def getDocument(s):
             if(doc.get('command')=="INSERT"):
                 xmlDocResults=goInsert(doc)
             if(doc.get('command')=="SELECT"):
-                xmlDocResults=goSelect(doc)
+                if(doc.get('reply')=="compact"):
+                    xmlDocResults=goSelectCompact(doc)
+                else:
+                    xmlDocResults=goSelect(doc)
             if(doc.get('command')=="JOIN"):
                 xmlDocResults=goJoin(doc)
         else:
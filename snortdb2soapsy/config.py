@@ -62,6 +62,14 @@ SOAP_SERVER_URL = 'http://' + SOAP_DB_ADDRESS + ':' + SOAP_DB_PORT
 # Datatype of the connected database (connected to the XML RPC interface)
 DB_DATA_TYPE = 'Postgresv8.0'
 
+# Let the SOAP database server insert whole event trees in one transaction with bulk statements
+# (requires PostgreSQL 8.2 or higher on the server side because of INSERT ... RETURNING)
+DB_BULK_INSERT = 0
+
+# Ask the SOAP database server for replies in the compact format rather than XML (smaller and
+# cheaper to parse); servers without support for it reply with XML anyway
+DB_COMPACT_REPLIES = 1
+
 ## ########################################
 ##
 ## SoapSy naming options
@@ -50,6 +50,7 @@ class SnDB2SoapsyDBConnector(soapsytools.dbconnector.DBConnector):
         
         result = self._performRequest(xml)
         decode = getXMLDBWrapper().parseInsertReply(result)
+        self._invalidateInserted(decode)
 ##        print "Result - primary key: %s " %(decode[0][2])
         return decode[0][2][1:len(decode[0][2])-1]
         
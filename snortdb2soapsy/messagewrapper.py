@@ -52,6 +52,6 @@ class SnDB2SoapsyXMLDBWrapper(soapsytools.messagewrapper.XMLDBWrapper):
         """
         Yet empty constructor.
         """
-        from config import DB_DATA_TYPE
-        soapsytools.messagewrapper.XMLDBWrapper.__init__(self, DB_DATA_TYPE)
+        from config import DB_DATA_TYPE, DB_BULK_INSERT, DB_COMPACT_REPLIES
+        soapsytools.messagewrapper.XMLDBWrapper.__init__(self, DB_DATA_TYPE, DB_BULK_INSERT, DB_COMPACT_REPLIES)
         
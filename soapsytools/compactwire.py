@@ -0,0 +1,111 @@
+"""
+Compact wire format for replies of the XML SOAP database server.
+
+Tools for SoapSy
+
+Replies of the database server used to be XML documents only; they are large and parsing them
+with a DOM builder is expensive. If the client asks for it (attribute C{reply="compact"} in the
+request), the server may answer in the compact format instead. Servers, which do not know about
+it, simply ignore the attribute and reply with XML; hence, the client has to check each reply
+with L{isCompact} and fall back to the XML parser if required.
+
+The format is text only (it has to be transmitted as SOAP string) and starts with L{MAGIC}. The
+following items are supported:
+    - strings: C{<number of characters>:<characters>}
+    - None: C{~}
+    - lists: C{[} followed by the items followed by C{]}
+
+Lengths are given in characters of the unicode string; the document is transmitted UTF-8 encoded.
+
+@author: Michael Pilgermann
+@contact: mailto:mpilgerm@glam.ac.uk
+@license: GPL (General Public License)
+"""
+
+MAGIC = 'XSMC1'
+
+# attribute for the request and its value to ask the server for the compact reply format
+REPLY_FORMAT_ATTRIBUTE = 'reply'
+REPLY_FORMAT_COMPACT = 'compact'
+
+def isCompact(reply):
+    """
+    Checks, whether the given reply is in the compact format (rather than XML).
+
+    @rtype: C{Boolean}
+    """
+    return reply[:len(MAGIC)] == MAGIC
+
+def _encodeItem(item, parts):
+    if item is None:
+        parts.append(u'~')
+    elif type(item) in [type([]), type(())]:
+        parts.append(u'[')
+        for subItem in item:
+            _encodeItem(subItem, parts)
+        parts.append(u']')
+    else:
+        if type(item) != type(u''):
+            item = unicode(str(item), 'utf-8', 'replace')
+        parts.append(u'%d:' %(len(item)))
+        parts.append(item)
+
+def encode(data):
+    """
+    Encodes the given structure into the compact format.
+
+    Any item, which is neither None nor a list / tuple is converted into a string.
+
+    @param data: Nested lists of strings
+    @type data: C{List}
+    @return: UTF-8 encoded representation including the L{MAGIC}
+    @rtype: C{String}
+    """
+    parts = [unicode(MAGIC)]
+    _encodeItem(data, parts)
+    return u''.join(parts).encode('utf-8')
+
+def decode(reply):
+    """
+    Decodes a reply in the compact format.
+
+    @param reply: Compact representation including the L{MAGIC}
+    @type reply: C{String}
+    @return: Nested lists of unicode strings (and None)
+    @rtype: C{List}
+    """
+    from errorhandling import SoapsyToolsFormatException
+
+    if type(reply) != type(u''):
+        reply = unicode(reply, 'utf-8')
+    if not isCompact(reply):
+        raise SoapsyToolsFormatException('This is not a reply in the compact format.')
+
+    stack = [[]]
+    pos = len(MAGIC)
+    end = len(reply)
+    try:
+        while pos < end:
+            char = reply[pos]
+            if char == '[':
+                stack.append([])
+                pos += 1
+            elif char == ']':
+                item = stack.pop()
+                stack[-1].append(item)
+                pos += 1
+            elif char == '~':
+                stack[-1].append(None)
+                pos += 1
+            else:
+                colon = reply.index(':', pos)
+                start = colon + 1
+                pos = start + int(reply[pos:colon])
+                if pos > end:
+                    raise ValueError('string exceeds the end of the reply')
+                stack[-1].append(reply[start:pos])
+    except (ValueError, IndexError), msg:
+        raise SoapsyToolsFormatException('Compact format error at position %d: %s' %(pos, msg))
+    if len(stack) != 1 or len(stack[0]) != 1:
+        raise SoapsyToolsFormatException('Compact format error: unbalanced lists.')
+    return stack[0][0]
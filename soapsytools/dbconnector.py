@@ -27,22 +27,73 @@ OPERATOR_ENDING_LIKE = 'elk'
 OPERATOR_NOT_LIKE = 'nlk'
 OPERATOR_NOT_STARTING_LIKE = 'nslk'
 OPERATOR_NOT_ENDING_LIKE = 'nelk'
+OPERATOR_IN = 'in'      # value is a comma seperated list
+
+# maximum number of values for one IN condition - larger lists are split into several conditions
+BULK_SELECT_CHUNK_SIZE = 500
+
+##
+## References between the SoapSy relations - used for fetching whole event graphs in bulk.
+##
+## RELATION_REFERENCES['$RELATION'] = ['$PRIMARY_KEY_COLUMN', [['$FOREIGN_KEY_COLUMN', '$REFERENCED_RELATION'], ...], '$CREATOR_FUNCTION']
+##
+## The order of the references must match the order of the relation parameters of the creator 
+## function in the PreXMLDictCreator.
+##
+RELATION_REFERENCES = {}
+RELATION_REFERENCES['event'] = ['event_id', [['obsrv_id', 'observer'], ['rprt_id', 'reporter'], ['src_id', 'source'], 
+    ['dstn_id', 'destination'], ['data_id', 'data'], ['event_type_id', 'event_type']], 'createEventEntry']
+RELATION_REFERENCES['observer'] = ['obsrv_id', [['agent_id', 'agent']], 'createObserverEntry']
+RELATION_REFERENCES['reporter'] = ['rprt_id', [['agent_id', 'agent']], 'createReporterEntry']
+RELATION_REFERENCES['source'] = ['src_id', [['agent_id', 'agent']], 'createSourceEntry']
+RELATION_REFERENCES['destination'] = ['dstn_id', [['agent_id', 'agent']], 'createDestinationEntry']
+RELATION_REFERENCES['agent'] = ['agent_id', [['agent_class_id', 'agent_class'], ['comp_id', 'computer'], ['prcss_id', 'process']], 'createAgentEntry']
+RELATION_REFERENCES['agent_class'] = ['agent_class_id', [], 'createAgentClassEntry']
+RELATION_REFERENCES['computer'] = ['comp_id', [['comp_type_id', 'comp_type']], 'createComputerEntry']
+RELATION_REFERENCES['comp_type'] = ['comp_type_id', [], 'createComputerTypeEntry']
+RELATION_REFERENCES['process'] = ['prcss_id', [['prcss_type_id', 'prcss_type'], ['prcss_name_id', 'prcss_name'], ['usr_id', 'usr']], 'createProcessEntry']
+RELATION_REFERENCES['prcss_type'] = ['prcss_type_id', [], 'createProcessTypeEntry']
+RELATION_REFERENCES['prcss_name'] = ['prcss_name_id', [], 'createProcessNameEntry']
+RELATION_REFERENCES['usr'] = ['usr_id', [['usr_group_id', 'usr_group']], 'createUserEntry']
+RELATION_REFERENCES['usr_group'] = ['usr_group_id', [], 'createUserGroupEntry']
+RELATION_REFERENCES['data'] = ['data_id', [['encoding_id', 'encoding']], 'createDataEntry']
+RELATION_REFERENCES['encoding'] = ['encoding_id', [], 'createEncodingEntry']
+RELATION_REFERENCES['event_type'] = ['event_type_id', [], 'createEventTypeEntry']
+
+# relations, which rows are (practically) never changed after insertion - rows of those are kept in the row cache
+CACHED_RELATIONS = ['comp_type', 'agent_class', 'event_type', 'encoding', 'prcss_type', 'prcss_name', 'usr_group',
+    'computer', 'agent', 'reporter', 'observer']
 
 class DBConnector:
     """
     Standard DB connector - work on XML RPC database.
     """
 
-    def __init__(self, soapServerUrl):
+    def __init__(self, soapServerUrl, cacheSize = 1000, cacheTtl = None, cachedRelations = CACHED_RELATIONS):
         """
         Sets the parameters for the later db connections.
         
         Most of the settings are taken from the global config file.
+        
+        @param cacheSize: Maximum number of rows in the row cache (0 disables the cache)
+        @type cacheSize: C{int}
+        @param cacheTtl: Time to live for rows in the cache in seconds (None for no expiry)
+        @type cacheTtl: C{float}
+        @param cachedRelations: Names of the relations, which rows are kept in the cache
+        @type cachedRelations: C{List} of C{String}
         """
         from errorhandling import SoapsyToolsException
+        from rowcache import RowCache
                         
         self._serverUrl = soapServerUrl
         self._server = None
+        self._cachedRelations = {}
+        if cacheSize:
+            self._cache = RowCache(cacheSize, cacheTtl)
+            for relationName in cachedRelations:
+                self._cachedRelations[relationName] = 1
+        else:
+            self._cache = None
         
     def connect(self):
         """
@@ -107,6 +158,37 @@ class DBConnector:
         Returns all events with event id greater then the given one.
         """
         return self.getEvents([['event_id', OPERATOR_GREATER_THEN_OR_EQUAL, str(minEventId)]])
+        
+    def iterEvents(self, conditions = [], orderBy = None, limit = None):
+        """
+        Collects available events from the database and hands them out one by one.
+        
+        Other than L{getEvents}, the reply is parsed incrementally (see L{messagewrapper.XMLDBWrapper.iterSelectReply}).
+        
+        @param orderBy: Column to sort the events by (None for no particular order)
+        @type orderBy: C{String}
+        @param limit: Maximum number of events (None for no limit)
+        @type limit: C{int}
+        @return: Generator for the event entries (dictionaries with 'name' and 'attributes')
+        @rtype: C{Generator} of C{Dict}
+        """
+        from messagewrapper import getXMLDBWrapper
+        xml = getXMLDBWrapper().wrapSelect('event', 'all', conditions, orderBy, limit)
+        result = self._performRequest(xml)
+        for resultId, relation in getXMLDBWrapper().iterSelectReply(result):
+            yield relation
+        
+    def iterEventsFromEventID(self, minEventId, limit = None):
+        """
+        Hands out all events with event id greater then the given one one by one.
+        
+        With a limit, only one page of events (sorted by event id) is requested; the next page
+        starts after the highest event id received (keyset pagination).
+        
+        @param limit: Maximum number of events (None for no limit)
+        @type limit: C{int}
+        """
+        return self.iterEvents([['event_id', OPERATOR_GREATER_THEN_OR_EQUAL, str(minEventId)]], 'event_id', limit)
                 
     def insertEvent(self, event):
         """
@@ -117,9 +199,48 @@ class DBConnector:
         result = self._performRequest(xml)
 ##        print result
         decode = getXMLDBWrapper().parseInsertReply(result)
+        self._invalidateInserted(decode)
 ##        print "Result - primary key: %s " %(decode[0][2])
         return decode[0][2][1:len(decode[0][2])-1]  # don't ask  -hehe - it's removing the apostrophes ;) nice, isn't it??? 
 
+    ##
+    ## Row cache
+    ##
+    def _isCached(self, relationName):
+        return self._cache and self._cachedRelations.has_key(relationName)
+        
+    def _invalidateInserted(self, insertReply):
+        """
+        Invalidation hook for inserts - removes the rows touched by an insert from the row cache.
+        
+        @param insertReply: Primary keys as returned by L{messagewrapper.XMLDBWrapper.parseInsertReply}
+        @type insertReply: C{List} of C{List}
+        """
+        if not self._cache:
+            return
+        for relationName, primKeyName, primKey in insertReply:
+            if self._cachedRelations.has_key(relationName) and primKey:
+                # the keys come within quotes (see L{insertEvent})
+                self._cache.invalidate(relationName, primKeyName, primKey.strip('\'"'))
+                
+    def invalidateCache(self, relationName = None):
+        """
+        Removes all rows of the given relation (or all rows, if no relation is given) from the row cache.
+        """
+        if self._cache:
+            self._cache.invalidate(relationName)
+            
+    def getCacheStatistics(self):
+        """
+        Returns the hit / miss counters of the row cache.
+        
+        @return: Statistics (see L{rowcache.RowCache.getStatistics}) or None, if the cache is disabled
+        @rtype: C{Dict}
+        """
+        if not self._cache:
+            return None
+        return self._cache.getStatistics()
+
         
     ##
     ## Functions for getting all the details of events
@@ -127,13 +248,142 @@ class DBConnector:
     def _getSomething(self, relationName, primKeyName, primKey):
         from dataengine_tools import getPreXMLDictCreator
         from messagewrapper import getXMLDBWrapper
+        cached = self._isCached(relationName)
+        if cached:
+            myEntry = self._cache.get(relationName, primKeyName, primKey)
+            if myEntry is not None:
+                return myEntry.copy()
         xml = getXMLDBWrapper().wrapSelect(relationName, 'all', [[primKeyName, OPERATOR_EQUAL, primKey]])
         result = self._performRequest(xml)
         no, resolved = getXMLDBWrapper().parseSelectReply(result)
         myEntry = resolved[0]['relations'][0]['attributes']
+        if cached:
+            self._cache.put(relationName, primKeyName, primKey, myEntry.copy())
         return myEntry
     
 
+    def _getSomethingBulk(self, keys):
+        """
+        Fetches the rows for many primary keys of several relations with one request.
+        
+        For each relation, one select with an IN condition on the primary key column is put 
+        into the request (split up, if there are more keys than L{BULK_SELECT_CHUNK_SIZE}).
+        Rows available in the row cache are not requested at all.
+        
+        @param keys: Primary key values to fetch for each relation (relation name : list of primary keys)
+        @type keys: C{Dict} (C{String} : C{List} of C{String})
+        @return: The rows found for each relation (relation name : (primary key : attributes))
+        @rtype: C{Dict} (C{String} : C{Dict})
+        """
+        from messagewrapper import getXMLDBWrapper
+        selects = []
+        rows = {}
+        for relationName in keys.keys():
+            primKeyName = RELATION_REFERENCES[relationName][0]
+            primKeys = keys[relationName]
+            if self._isCached(relationName):
+                missing = []
+                for primKey in primKeys:
+                    myEntry = self._cache.get(relationName, primKeyName, primKey)
+                    if myEntry is None:
+                        missing.append(primKey)
+                    else:
+                        if not rows.has_key(relationName):
+                            rows[relationName] = {}
+                        rows[relationName][primKey] = myEntry.copy()
+                primKeys = missing
+            for i in range(0, len(primKeys), BULK_SELECT_CHUNK_SIZE):
+                chunk = primKeys[i:i + BULK_SELECT_CHUNK_SIZE]
+                selects.append([relationName, 'all', [[primKeyName, OPERATOR_IN, ','.join(chunk)]]])
+        if not selects:
+            return rows
+        
+        xml = getXMLDBWrapper().wrapMultiSelect(selects)
+        result = self._performRequest(xml)
+        no, resolved = getXMLDBWrapper().parseSelectReply(result)
+        for oneResult in resolved:
+            for relation in oneResult['relations']:
+                relationName = relation['name']
+                primKeyName = RELATION_REFERENCES[relationName][0]
+                if not rows.has_key(relationName):
+                    rows[relationName] = {}
+                primKey = relation['attributes'][primKeyName]
+                rows[relationName][primKey] = relation['attributes']
+                if self._isCached(relationName):
+                    self._cache.put(relationName, primKeyName, primKey, relation['attributes'].copy())
+        return rows
+        
+    def _assembleEntry(self, relationName, primKey, rows, level, depth):
+        """
+        Assembles the nested list for one row and its (already fetched) references.
+        """
+        from dataengine_tools import getPreXMLDictCreator
+        primKeyName, references, creatorName = RELATION_REFERENCES[relationName]
+        myEntry = rows[relationName][primKey]
+        
+        subEntries = []
+        for fkName, refRelationName in references:
+            subEntry = None
+            refKey = myEntry.get(fkName)
+            if (depth is None or level < depth) and refKey and refKey != 'None':
+                if rows.has_key(refRelationName) and rows[refRelationName].has_key(refKey):
+                    subEntry = self._assembleEntry(refRelationName, refKey, rows, level + 1, depth)
+            subEntries.append(subEntry)
+        creator = getattr(getPreXMLDictCreator(), creatorName)
+        return creator(myEntry, *subEntries)
+        
+    def getFullEvents(self, eventIds, depth = None):
+        """
+        Fetches many events together with all their references in bulk.
+        
+        Instead of one request for each row (as L{getEvent} used to do), all the primary keys
+        needed on one level of the event graph are collected and fetched with one request. 
+        Hence, the number of requests only depends on the depth of the graph, not on the number
+        of events and references.
+        
+        @param eventIds: IDs of the events to fetch
+        @type eventIds: C{List} of C{String}
+        @param depth: Number of reference levels to resolve; None for all levels, 0 for the plain event rows
+        @type depth: C{int}
+        @return: The events in the same order as the given IDs (unknown IDs are skipped)
+        @rtype: C{List} of C{List}
+        """
+        eventIds = map(str, eventIds)
+        rows = {}
+        pending = {'event': eventIds}
+        level = 0
+        while pending:
+            fetched = self._getSomethingBulk(pending)
+            pending = {}
+            for relationName in fetched.keys():
+                if not rows.has_key(relationName):
+                    rows[relationName] = {}
+                rows[relationName].update(fetched[relationName])
+            if depth is not None and level >= depth:
+                break
+            for relationName in fetched.keys():
+                for fkName, refRelationName in RELATION_REFERENCES[relationName][1]:
+                    for myEntry in fetched[relationName].values():
+                        refKey = myEntry.get(fkName)
+                        if not refKey or refKey == 'None':
+                            continue
+                        if rows.has_key(refRelationName) and rows[refRelationName].has_key(refKey):
+                            continue
+                        if not pending.has_key(refRelationName):
+                            pending[refRelationName] = {}
+                        pending[refRelationName][refKey] = 1
+            for relationName in pending.keys():
+                pending[relationName] = pending[relationName].keys()
+            level += 1
+        
+        events = []
+        if not rows.has_key('event'):
+            return events
+        for eventId in eventIds:
+            if rows['event'].has_key(eventId):
+                events.append(self._assembleEntry('event', eventId, rows, 0, depth))
+        return events
+
     def getComputerType(self, computer_type_id, full =1):
         from dataengine_tools import getPreXMLDictCreator
         myEntry = self._getSomething('comp_type', 'comp_type_id', computer_type_id)
@@ -272,29 +522,15 @@ class DBConnector:
         return getPreXMLDictCreator().createEventTypeEntry(myEntry)
         
     def getEvent(self, event_id, full = 1):
-        from dataengine_tools import getPreXMLDictCreator
-        myEntry = self._getSomething('event', 'event_id', event_id)
-        
-        observer = None
-        reporter = None
-        source = None
-        destination = None
-        data = None
-        eventType = None
+        """
+        Fetches one event - with all its references, if full is set.
+        
+        The event graph is fetched in bulk (see L{getFullEvents}).
+        """
         if full:
-            if myEntry['obsrv_id'] != 'None':
-                observer = self.getObserver(myEntry['obsrv_id'],1)
-            if myEntry['rprt_id'] != 'None':
-                reporter = self.getReporter(myEntry['rprt_id'],1)
-            if myEntry['src_id'] != 'None':
-                source = self.getSource(myEntry['src_id'],1)
-            if myEntry['dstn_id'] != 'None':
-                destination = self.getDestination(myEntry['dstn_id'],1)
-            if myEntry['data_id'] != 'None':
-                data = self.getData(myEntry['data_id'],1)
-            if myEntry['event_type_id'] != 'None':
-                eventType = self.getEventType(myEntry['event_type_id'])
-            
-        return getPreXMLDictCreator().createEventEntry(myEntry, observer, reporter, source, destination, data, eventType)
+            depth = None
+        else:
+            depth = 0
+        return self.getFullEvents([event_id], depth)[0]
         
         
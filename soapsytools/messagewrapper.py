@@ -13,8 +13,14 @@ from xml.dom import Node
 import xml.dom.ext.reader.Sax2
 from StringIO import StringIO
 import xml.dom.ext
+import xml.sax
+import xml.sax.handler
 
 from xmldb_infos import DATATYPES
+import compactwire
+
+# number of characters passed to the SAX parser in one go when iterating over a select reply
+SAX_FEED_CHUNK_SIZE = 65536
 
 # "singleton"
 _genericWrapper = None
@@ -68,13 +74,22 @@ class XMLDBWrapper(GenericWrapper):
     """
     Wrapper / Parser for XML database queries / replies.
     """
-    def __init__(self, dbDataType = 'Postgresv8.0'):
+    def __init__(self, dbDataType = 'Postgresv8.0', bulkInsert = 0, compactReplies = 0):
         """
         Yet empty constructor.
+        
+        @param dbDataType: Datatype of the connected database
+        @type dbDataType: C{String}
+        @param bulkInsert: Indicates, whether inserts shall be processed by the server in bulk mode (one transaction per request)
+        @type bulkInsert: C{Boolean}
+        @param compactReplies: Indicates, whether the server shall be asked for replies in the compact format (see L{compactwire})
+        @type compactReplies: C{Boolean}
         """
         self._dbDataType = dbDataType
+        self._bulkInsert = bulkInsert
+        self._compactReplies = compactReplies
         
-    def wrapSelect(self, relation, value = 'all' , attributes = []):
+    def wrapSelect(self, relation, value = 'all' , attributes = [], orderBy = None, limit = None):
         """
         Wraps a SQL select into the appropriate XML representation.
         
@@ -84,26 +99,54 @@ class XMLDBWrapper(GenericWrapper):
         @type value: C{String}
         @param attirbutes: List of attributes (the where bit of a select) - each entry is a list of [Attribute name | operation | Value]
         @type attributes: C{List} of C{List} of C{String}
+        @param orderBy: Column to sort the result set by (None for no particular order)
+        @type orderBy: C{String}
+        @param limit: Maximum number of records in the result set (None for no limit)
+        @type limit: C{int}
         @return: The xml representation of the query
         @rtype: C{String}
         """
+        return self.wrapMultiSelect([[relation, value, attributes, orderBy, limit]])
+        
+    def wrapMultiSelect(self, selects):
+        """
+        Wraps several SQL selects into one XML document.
+        
+        The database server processes each relation in the document on its own and replies 
+        with one result set (RESULTS_ID) per relation in the given order. This way, several
+        selects only cost one request.
+        
+        @param selects: List of selects - each entry is a list of [relation | value | attributes] and optionally
+            [orderBy | limit] (see L{wrapSelect})
+        @type selects: C{List} of C{List}
+        @return: The xml representation of the queries
+        @rtype: C{String}
+        """
         impl = xml.dom.getDOMImplementation()
         doc = impl.createDocument(None, 'RELATIONS', None)
         elementRoot = doc.documentElement
         elementRoot.setAttribute('command', 'SELECT')
+        if self._compactReplies:
+            elementRoot.setAttribute(compactwire.REPLY_FORMAT_ATTRIBUTE, compactwire.REPLY_FORMAT_COMPACT)
         
-        elementRelation = doc.createElement('REL')
-        elementRoot.appendChild(elementRelation)
-        elementRelation.setAttribute('name', relation)
-        elementRelation.setAttribute('val', value)
-        
-        for att in attributes:
-            elementAttribute = doc.createElement('ATT')
-            elementRelation.appendChild(elementAttribute)
-            elementAttribute.setAttribute('name', att[0])
-            elementAttribute.setAttribute('op', att[1])
-            attValue = doc.createTextNode(att[2])
-            elementAttribute.appendChild(attValue)            
+        for select in selects:
+            relation, value, attributes = select[:3]
+            elementRelation = doc.createElement('REL')
+            elementRoot.appendChild(elementRelation)
+            elementRelation.setAttribute('name', relation)
+            elementRelation.setAttribute('val', value)
+            if len(select) > 3 and select[3]:
+                elementRelation.setAttribute('orderby', select[3])
+            if len(select) > 4 and select[4]:
+                elementRelation.setAttribute('limit', str(select[4]))
+            
+            for att in attributes:
+                elementAttribute = doc.createElement('ATT')
+                elementRelation.appendChild(elementAttribute)
+                elementAttribute.setAttribute('name', att[0])
+                elementAttribute.setAttribute('op', att[1])
+                attValue = doc.createTextNode(att[2])
+                elementAttribute.appendChild(attValue)            
 
         return self._toXml(doc)
 
@@ -156,6 +199,10 @@ class XMLDBWrapper(GenericWrapper):
         elementRoot.setAttribute('command', 'INSERT')
         
         elementRoot.setAttribute('datatype', self._dbDataType)
+        if self._bulkInsert:
+            elementRoot.setAttribute('mode', 'bulk')
+        if self._compactReplies:
+            elementRoot.setAttribute(compactwire.REPLY_FORMAT_ATTRIBUTE, compactwire.REPLY_FORMAT_COMPACT)
 
         self._wrapInsertRecursive(relation, attributes, elementRoot, doc, references)
         return self._toXml(doc)
@@ -164,11 +211,15 @@ class XMLDBWrapper(GenericWrapper):
         """
         Parses the XML reply to an insert requests and extracts the primary keys.
         
+        Replies in the compact format are passed on to L{_parseCompactInsertReply}.
+        
         @return: List of primary keys together with their relation names and column names for the primary key (relation | column name | primary key entry)
         @rtype: C{List} of C{List}
         """
         from errorhandling import SoapsyToolsFormatException
         
+        if compactwire.isCompact(xmlString):
+            return self._parseCompactInsertReply(xmlString)
         try:
             root = xml.dom.ext.reader.Sax2.FromXml(xmlString)
         except Exception, msg:
@@ -215,6 +266,8 @@ class XMLDBWrapper(GenericWrapper):
         """
         Parses the XML string and extracts the dataset information into dictionaries.
         
+        Replies in the compact format are passed on to L{_parseCompactSelectReply}.
+        
         @param xmlString: XML representation of the select query result
         @type xmlString: C{String}
         @return: List of entries
@@ -222,6 +275,8 @@ class XMLDBWrapper(GenericWrapper):
         """
         from errorhandling import SoapsyToolsFormatException
         
+        if compactwire.isCompact(xmlString):
+            return self._parseCompactSelectReply(xmlString)
         try:
             root = xml.dom.ext.reader.Sax2.FromXml(xmlString)
         except Exception, msg:
@@ -298,6 +353,176 @@ class XMLDBWrapper(GenericWrapper):
                     
         return totalResults, results
 
+    def iterSelectReply(self, xmlString, chunkSize = SAX_FEED_CHUNK_SIZE):
+        """
+        Parses a select reply incrementally and yields the entries one after another.
+        
+        Other than L{parseSelectReply}, no DOM tree is assembled for the whole reply; the reply is
+        fed into a SAX parser chunk by chunk and each complete entry is handed out right away.
+        Hence, the memory consumption does not depend on the size of the result set and processing
+        may start before the whole reply is parsed. Since one select results in one single result
+        set (RESULTS_ID), the entries are yielded one by one rather than one result set at a time.
+        
+        Replies in the compact format are decoded as a whole and yielded the same way.
+        
+        @param xmlString: XML representation of the select query result
+        @type xmlString: C{String}
+        @param chunkSize: Number of characters fed into the parser in one go
+        @type chunkSize: C{int}
+        @return: Generator for the entries - tuples of the result id and the entry (dictionary with 
+            'name' and 'attributes' - as in the list 'relations' of the L{parseSelectReply} results)
+        @rtype: C{Generator} of C{Tuple} (C{String}, C{Dict})
+        """
+        from errorhandling import SoapsyToolsFormatException
+        
+        if compactwire.isCompact(xmlString):
+            total, results = self._parseCompactSelectReply(xmlString)
+            for result in results:
+                for relation in result['relations']:
+                    yield result['result_id'], relation
+            return
+            
+        handler = _SelectReplyHandler()
+        parser = xml.sax.make_parser()
+        parser.setContentHandler(handler)
+        pos = 0
+        try:
+            while pos < len(xmlString):
+                chunk = xmlString[pos:pos + chunkSize]
+                pos += chunkSize
+                if type(chunk) == type(u''):
+                    chunk = chunk.encode('utf-8')
+                parser.feed(chunk)
+                while handler.entries:
+                    yield handler.entries.pop(0)
+            parser.close()
+        except xml.sax.SAXException, msg:
+            raise SoapsyToolsFormatException("XML Format string error: %s" %(msg))
+        while handler.entries:
+            yield handler.entries.pop(0)
+
+    def _parseCompactInsertReply(self, reply):
+        """
+        Parses the reply to an insert request in the compact format.
+        
+        The structure of the reply is C{['INSERT_RESULTS', [[relation, column name, primary key], ...]]}.
+        
+        @return: Same as L{parseInsertReply}
+        @rtype: C{List} of C{List}
+        """
+        from errorhandling import SoapsyToolsFormatException
+        
+        data = compactwire.decode(reply)
+        if not data or data[0] != 'INSERT_RESULTS':
+            raise SoapsyToolsFormatException('This is not a reply from the xml rpc server for an insert request.')
+        results = []
+        for name, attName, value in data[1]:
+            results.append([name, attName, value])
+        return results
+        
+    def _parseCompactSelectReply(self, reply):
+        """
+        Parses the reply to a select request in the compact format.
+        
+        The structure of the reply is C{['SELECT_RESULTS', total results, [result, ...]]}, each
+        result being C{[result id, relation, [column names], [[values], ...]]}. The relation is
+        None if the server could not process the select (the number of records is missing then).
+        
+        @return: Same as L{parseSelectReply}
+        @rtype: C{Tuple} (C{int}, C{List} of C{Dict})
+        """
+        from errorhandling import SoapsyToolsFormatException
+        
+        data = compactwire.decode(reply)
+        if not data or data[0] != 'SELECT_RESULTS':
+            raise SoapsyToolsFormatException('This is not a reply from the xml rpc server for a select request.')
+        totalResults = int(data[1])
+        results = []
+        for resultId, tableName, columns, rows in data[2]:
+            result = {}
+            result['result_id'] = resultId
+            result['relations'] = []
+            if tableName is not None:
+                for row in rows:
+                    attributes = {}
+                    for i in range(len(columns)):
+                        # an empty text node in the XML reply is parsed into None as well
+                        if row[i] == '':
+                            attributes[columns[i]] = None
+                        else:
+                            attributes[columns[i]] = row[i]
+                    result['relations'].append({'name': tableName, 'attributes': attributes})
+                result['number_records'] = len(rows)
+            results.append(result)
+        return totalResults, results
+
+        
+class _SelectReplyHandler(xml.sax.handler.ContentHandler):
+    """
+    SAX handler for select replies - used by L{XMLDBWrapper.iterSelectReply}.
+    
+    Completed entries are appended to L{entries}; the consumer is supposed to take them out.
+    
+    @ivar entries: Completed entries - tuples of result id and entry dictionary
+    @type entries: C{List} of C{Tuple}
+    """
+    def __init__(self):
+        """
+        Initialises the state of the handler.
+        """
+        xml.sax.handler.ContentHandler.__init__(self)
+        self.entries = []
+        self._depth = 0
+        self._resultId = None
+        self._entry = None
+        self._attName = None
+        self._text = None
+        
+    def startElement(self, name, attrs):
+        from errorhandling import SoapsyToolsFormatException
+        self._depth += 1
+        if self._depth == 1:
+            if name != 'RELATIONS':
+                raise SoapsyToolsFormatException('This is not a reply from the xml rpc server at all.')
+            if attrs.get('command') != 'SELECT_RESULTS':
+                raise SoapsyToolsFormatException('This is not a reply from the xml rpc server for a select request.')
+        elif name == 'REL':
+            relName = attrs.get('name')
+            if not relName:
+                raise SoapsyToolsFormatException('No result ID provided for select query result.')
+            if self._depth == 2:
+                if relName == 'RESULTS_ID':
+                    self._resultId = attrs.get('value')
+                    if not self._resultId:
+                        raise SoapsyToolsFormatException('No ID provided for the result!')
+                elif relName != 'TOTAL_RESULTS':
+                    raise SoapsyToolsFormatException('Unknown value for name: %s.' %(relName))
+            elif self._depth == 3 and relName != 'TOTAL_RECORDS':
+                self._entry = {'name': relName, 'attributes': {}}
+        elif name == 'ATT' and self._depth == 4 and self._entry is not None:
+            self._attName = attrs.get('name')
+            if not self._attName:
+                raise SoapsyToolsFormatException('Name for attribute no specified.')
+            self._text = []
+        else:
+            raise SoapsyToolsFormatException('Unrecognised tag in xml select query result: %s.' %(name))
+            
+    def characters(self, content):
+        if self._text is not None:
+            self._text.append(content)
+        
+    def endElement(self, name):
+        if name == 'ATT' and self._text is not None:
+            value = ''.join(self._text)
+            if not value:
+                value = None
+            self._entry['attributes'][self._attName] = value
+            self._text = None
+        elif name == 'REL' and self._depth == 3 and self._entry is not None:
+            self.entries.append((self._resultId, self._entry))
+            self._entry = None
+        self._depth -= 1
+
         
 class EventMessageWrapper(GenericWrapper):
 
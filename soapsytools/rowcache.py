@@ -0,0 +1,167 @@
+"""
+Read-through cache for database rows.
+
+Tools for SoapSy
+
+Many rows in the SoapSy database are practically never changed once they are inserted
+(computer types, agent classes, event types, encodings, ...). Still, they used to be fetched
+over SOAP for every single event. The cache in here keeps such rows in memory; it is bounded
+in size (least recently used entries are evicted first) and entries may expire after a
+time to live.
+
+@author: Michael Pilgermann
+@contact: mailto:mpilgerm@glam.ac.uk
+@license: GPL (General Public License)
+"""
+
+import threading
+import time
+
+# positions in the list for one entry of the linked list
+_PREV = 0
+_NEXT = 1
+_KEY = 2
+_VALUE = 3
+_TIMESTAMP = 4
+
+class RowCache:
+    """
+    Size bounded LRU cache with optional time to live.
+
+    Keys are tuples of (relation name, key column name, key value).
+
+    @ivar _entries: Lookup of the list entries by key
+    @type _entries: C{Dict}
+    @ivar _root: Root of the doubly linked list (most recently used follows the root)
+    @type _root: C{List}
+    """
+
+    def __init__(self, maxSize = 1000, ttl = None):
+        """
+        Initialises the empty cache and its statistics.
+
+        @param maxSize: Maximum number of entries
+        @type maxSize: C{int}
+        @param ttl: Time to live for entries in seconds; None for no expiry
+        @type ttl: C{float}
+        """
+        self._maxSize = maxSize
+        self._ttl = ttl
+        self._entries = {}
+        self._root = []
+        self._root[:] = [self._root, self._root, None, None, None]
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def _unlink(self, entry):
+        entry[_PREV][_NEXT] = entry[_NEXT]
+        entry[_NEXT][_PREV] = entry[_PREV]
+
+    def _linkFront(self, entry):
+        entry[_PREV] = self._root
+        entry[_NEXT] = self._root[_NEXT]
+        self._root[_NEXT][_PREV] = entry
+        self._root[_NEXT] = entry
+
+    def get(self, relationName, keyName, keyValue):
+        """
+        Looks up one row.
+
+        @return: The row (dictionary of attributes) or None, if not in the cache
+        @rtype: C{Dict}
+        """
+        key = (relationName, keyName, str(keyValue))
+        self._lock.acquire()
+        try:
+            if not self._entries.has_key(key):
+                self._misses += 1
+                return None
+            entry = self._entries[key]
+            if self._ttl is not None and time.time() - entry[_TIMESTAMP] > self._ttl:
+                self._unlink(entry)
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._unlink(entry)
+            self._linkFront(entry)
+            self._hits += 1
+            return entry[_VALUE]
+        finally:
+            self._lock.release()
+
+    def put(self, relationName, keyName, keyValue, row):
+        """
+        Puts one row into the cache; the least recently used entry is evicted if the cache is full.
+        """
+        key = (relationName, keyName, str(keyValue))
+        self._lock.acquire()
+        try:
+            if self._entries.has_key(key):
+                entry = self._entries[key]
+                self._unlink(entry)
+                entry[_VALUE] = row
+                entry[_TIMESTAMP] = time.time()
+            else:
+                if len(self._entries) >= self._maxSize:
+                    oldest = self._root[_PREV]
+                    self._unlink(oldest)
+                    del self._entries[oldest[_KEY]]
+                    self._evictions += 1
+                entry = [None, None, key, row, time.time()]
+                self._entries[key] = entry
+            self._linkFront(entry)
+        finally:
+            self._lock.release()
+
+    def invalidate(self, relationName = None, keyName = None, keyValue = None):
+        """
+        Removes entries from the cache.
+
+        If all parameters are given, only this one entry is removed; if only the relation name
+        is given, all entries for this relation are removed; without any parameter the whole
+        cache is flushed.
+        """
+        self._lock.acquire()
+        try:
+            if relationName is not None and keyName is not None and keyValue is not None:
+                keys = [(relationName, keyName, str(keyValue))]
+            else:
+                keys = []
+                for key in self._entries.keys():
+                    if relationName is None or key[0] == relationName:
+                        keys.append(key)
+            for key in keys:
+                if self._entries.has_key(key):
+                    self._unlink(self._entries[key])
+                    del self._entries[key]
+                    self._invalidations += 1
+        finally:
+            self._lock.release()
+
+    def getStatistics(self):
+        """
+        Assembles the metrics of the cache.
+
+        @return: Dictionary with the current statistics values
+        @rtype: C{Dict}
+        """
+        self._lock.acquire()
+        try:
+            stats = {}
+            stats['size'] = len(self._entries)
+            stats['max_size'] = self._maxSize
+            stats['ttl'] = self._ttl
+            stats['hits'] = self._hits
+            stats['misses'] = self._misses
+            stats['evictions'] = self._evictions
+            stats['expirations'] = self._expirations
+            stats['invalidations'] = self._invalidations
+            return stats
+        finally:
+            self._lock.release()